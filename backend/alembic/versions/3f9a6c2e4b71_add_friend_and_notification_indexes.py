@@ -0,0 +1,40 @@
+"""add_friend_and_notification_indexes
+
+Revision ID: 3f9a6c2e4b71
+Revises: 8e41c0d7a2b9
+Create Date: 2026-10-18 12:20:41.512377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a6c2e4b71'
+down_revision: Union[str, Sequence[str], None] = '8e41c0d7a2b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the user1_id side of friendship is already covered by the unique_friendship constraint
+INDEXES = [
+    ('ix_friendship_user2_id_user1_id', 'friendship', ['user2_id', 'user1_id']),
+    ('ix_friend_requests_receiver_id_status', 'friend_requests', ['receiver_id', 'status']),
+    ('ix_friend_requests_sender_id_status', 'friend_requests', ['sender_id', 'status']),
+    ('ix_notifications_user_id_created_at', 'notifications', ['user_id', 'created_at']),
+    ('ix_friend_request_history_user1_id_created_at', 'friend_request_history', ['user1_id', 'created_at']),
+    ('ix_friend_request_history_user2_id_created_at', 'friend_request_history', ['user2_id', 'created_at']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
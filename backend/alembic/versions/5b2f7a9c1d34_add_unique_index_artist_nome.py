@@ -0,0 +1,39 @@
+"""add_unique_index_artist_nome
+
+Revision ID: 5b2f7a9c1d34
+Revises: c06d7c238d3d
+Create Date: 2026-10-18 10:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2f7a9c1d34'
+down_revision: Union[str, Sequence[str], None] = 'c06d7c238d3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # sync_top_artists used to create one row per call for the same name, keep the oldest
+    # row of each name and move the albums of the duplicates to it before adding the index
+    op.execute("""
+        UPDATE album SET artist_id = (
+            SELECT MIN(a2.id) FROM artist a1 JOIN artist a2 ON a1.nome = a2.nome WHERE a1.id = album.artist_id
+        )
+        WHERE artist_id IN (
+            SELECT id FROM artist WHERE nome IS NOT NULL AND id NOT IN (SELECT MIN(id) FROM artist GROUP BY nome)
+        )
+    """)
+    op.execute("DELETE FROM artist WHERE nome IS NOT NULL AND id NOT IN (SELECT MIN(id) FROM artist GROUP BY nome)")
+    op.create_index(op.f('ix_artist_nome'), 'artist', ['nome'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_artist_nome'), table_name='artist')
@@ -0,0 +1,32 @@
+"""add_column_artist_spotify_id
+
+Revision ID: 8e41c0d7a2b9
+Revises: 5b2f7a9c1d34
+Create Date: 2026-10-18 11:03:27.918346
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e41c0d7a2b9'
+down_revision: Union[str, Sequence[str], None] = '5b2f7a9c1d34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # existing rows are filled by: python -m app.jobs.backfill_artist_spotify_ids
+    op.add_column('artist', sa.Column('spotify_id', sa.String(), nullable=True))
+    op.create_index(op.f('ix_artist_spotify_id'), 'artist', ['spotify_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('artist', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_artist_spotify_id'))
+        batch_op.drop_column('spotify_id')
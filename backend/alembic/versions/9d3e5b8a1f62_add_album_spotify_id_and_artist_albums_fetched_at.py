@@ -0,0 +1,34 @@
+"""add_album_spotify_id_and_artist_albums_fetched_at
+
+Revision ID: 9d3e5b8a1f62
+Revises: 3f9a6c2e4b71
+Create Date: 2026-10-18 16:42:09.208113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3e5b8a1f62'
+down_revision: Union[str, Sequence[str], None] = '3f9a6c2e4b71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('album', sa.Column('spotify_id', sa.String(), nullable=True))
+    op.create_index(op.f('ix_album_spotify_id'), 'album', ['spotify_id'], unique=False)
+    op.add_column('artist', sa.Column('albums_fetched_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('artist', schema=None) as batch_op:
+        batch_op.drop_column('albums_fetched_at')
+    with op.batch_alter_table('album', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_album_spotify_id'))
+        batch_op.drop_column('spotify_id')
@@ -8,6 +8,19 @@ SECRET_KEY = os.getenv("SECRET_KEY", "development_secret_key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# version of the claims carried by the access token:
+# 1 - {"sub": email}
+# 2 - {"sub": email, "uid": SQL user id, "mid": Users_cache ObjectId, "ver": 2}
+# tokens without "ver" are version 1 and still accepted until they expire
+TOKEN_CLAIMS_VERSION = 2
+
+
+def user_claims(email: str, user_id: int, mongo_id: str | None = None) -> dict:
+    claims = {"sub": email, "uid": user_id, "ver": TOKEN_CLAIMS_VERSION}
+    if mongo_id:
+        claims["mid"] = mongo_id
+    return claims
+
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
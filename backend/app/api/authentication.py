@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from app import schemas, database, models_sql, JWT_token
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..core.security import Hash
 from ..core.mongo import get_mongo_db_with_check
-from ..repositories.users_cache_repository import UserCacheRepo
+from ..repositories.users_cache_repository import UserCacheRepo, UserCacheNotFoundError
 from ..models.mongo_users import UserCache
 from datetime import timedelta, datetime
 from fastapi.security import OAuth2PasswordRequestForm
@@ -13,24 +14,25 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
 @router.post("/login")
 async def login(
     request: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     mongo = Depends(get_mongo_db_with_check)
 ):
     if "@" in request.username:
         # Login por email
-        user = db.query(models_sql.User).filter(models_sql.User.email == request.username).first()
+        query = select(models_sql.User).where(models_sql.User.email == request.username)
     else:
         # Login por username
-        user = db.query(models_sql.User).filter(models_sql.User.username == request.username).first()
+        query = select(models_sql.User).where(models_sql.User.username == request.username)
+    user = (await db.execute(query)).scalars().first()
     
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario não encontrado ou incorreto")
-    if not Hash.verify(request.password, user.senha):
+    if not await Hash.verify_async(request.password, user.senha):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario não encontrado ou incorreto")
 
     # Atualizar cache do usuário no MongoDB
     cache_repo = UserCacheRepo(mongo)
-    await cache_repo.upsert_user_cache(
+    mongo_id = await cache_repo.upsert_user_cache(
         user=UserCache(
             id="",  # Será mantido o existente ou gerado novo
             sql_user_id=user.id,
@@ -40,9 +42,16 @@ async def login(
         )
     )
 
+    # resolve the mongo id once here so it travels in the token instead of being looked up per request
+    if mongo_id is None:
+        try:
+            mongo_id = await cache_repo.get_mongo_id_by_sql_id(user.id)
+        except UserCacheNotFoundError:
+            mongo_id = None
+
     access_token_expires = timedelta(minutes=JWT_token.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = JWT_token.create_access_token(
-        data={"sub": user.email},
+        data=JWT_token.user_claims(user.email, user.id, str(mongo_id) if mongo_id else None),
         expires_delta=access_token_expires,
     )
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
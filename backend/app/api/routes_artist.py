@@ -2,9 +2,10 @@ from fastapi import APIRouter, Depends, status, Response, HTTPException
 from typing import Optional
 from .. import models_sql, schemas
 from sqlalchemy.orm import Session
-from ..database import get_db
+from ..database import get_db, get_read_db
 from typing import List
 from ..core.permissions import require_system_script_for_artist_creation
+from ..repositories import artist
 
 router = APIRouter(
     tags=['Artist'],
@@ -18,22 +19,15 @@ def createArtist(
     _: None = Depends(require_system_script_for_artist_creation)
 ):
     # Esta rota só será executada se a verificação de permissão passar
-    new_artist = models_sql.Artist(
-        nome=request.nome,
-        music_genre=request.music_genre
-    )
-    db.add(new_artist)
-    db.commit()
-    db.refresh(new_artist)
-    return new_artist
+    return artist.create_artist(request, db)
 
 @router.get("/all",response_model=List[schemas.Artist])
-def showAllArtists(db:Session=Depends(get_db)):
+def showAllArtists(db:Session=Depends(get_read_db)):
     artists = db.query(models_sql.Artist).all()
     return artists
 
 @router.get("/{nome}", status_code=status.HTTP_200_OK, response_model=List[schemas.ShowArtist])
-def showArtist(nome, response:Response, limit: Optional[int] = None, db:Session=Depends(get_db)):
+def showArtist(nome, response:Response, limit: Optional[int] = None, db:Session=Depends(get_read_db)):
     query = db.query(models_sql.Artist).filter(models_sql.Artist.nome==nome)
     if limit:
         query = query.limit(limit)
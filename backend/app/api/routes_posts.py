@@ -1,29 +1,142 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from app.models.mongo_posts import PostCreate, PostDB, CommentCreate, CommentDB
 from app.core.mongo import get_mongo_db_with_check
-from app.repositories.posts_repository import PostsRepo, PostNotFoundError
+from app.repositories.posts_repository import PostsRepo, PostNotFoundError, InvalidFieldsError, parse_fields
 from app.repositories.comments_repository import CommentsRepo, CommentNotFoundError
 from app.repositories.users_cache_repository import UserCacheRepo, UserCacheNotFoundError
+from app.repositories.timeline_repository import TimelineRepo
+from app.repositories.likes_repository import LikesRepo
+from app.repositories.author_loader import AuthorLoader, get_author_loader
+from app.repositories import friends
+from app.core.uploads import save_uploads
+from app.core.image_variants import image_variants
+from functools import partial
+from app.core.pagination import InvalidCursorError, next_cursor, NEXT_CURSOR_HEADER
+from app.database import get_async_db
 from app import oauth2
+from sqlalchemy.ext.asyncio import AsyncSession
 from bson.errors import InvalidId
-import os
-import uuid
 from typing import Optional, List
 
 router = APIRouter(prefix='/posts', tags=['Posts'])
 
+def invalid_cursor_exception():
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail='Invalid pagination cursor'
+    )
+
+# expose the cursor of the next page to the client, if there is one
+def set_next_cursor(response: Response, items: list, pagination: int):
+    cursor = next_cursor(items, pagination)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+
+def selected_fields(fields: Optional[str] = None):
+    """?fields=content,author,likes limita os campos de cada post do feed"""
+    try:
+        return parse_fields(fields)
+    except InvalidFieldsError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Invalid fields: {", ".join(e.fields)}'
+        )
+
+# a partial post does not fit PostDB, so a field selection is sent as it came from the pipeline
+def posts_response(response: Response, posts: list, fields: Optional[set]):
+    if fields is None:
+        return posts
+    headers = {NEXT_CURSOR_HEADER: response.headers[NEXT_CURSOR_HEADER]} if NEXT_CURSOR_HEADER in response.headers else None
+    return JSONResponse(jsonable_encoder(posts), headers=headers)
+
+# fills liked_by_me for a page of posts or comments with a single query to Likes
+async def mark_liked_by_me(db, items: list, current_user, fields: Optional[set] = None):
+    if fields is not None and 'liked_by_me' not in fields:
+        return
+    liked = set()
+    if current_user is not None and items:
+        try:
+            mongo_user_id = await UserCacheRepo(db).resolve_mongo_id(current_user)
+        except UserCacheNotFoundError:
+            mongo_user_id = None
+        if mongo_user_id:
+            liked = await LikesRepo(db).liked_by_user(mongo_user_id, [item['_id'] for item in items])
+    for item in items:
+        item['liked_by_me'] = item['_id'] in liked
+
 @router.get('/', response_model=list[PostDB])
-async def get_last_posts(pagination: int = 20, db = Depends(get_mongo_db_with_check)):
-    repo = PostsRepo(db)
-    posts = await repo.get_post_list(pagination)
-    return posts
+async def get_last_posts(
+    response: Response,
+    pagination: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[set] = Depends(selected_fields),
+    current_user = Depends(oauth2.get_optional_current_user),
+    db = Depends(get_mongo_db_with_check),
+    authors: AuthorLoader = Depends(get_author_loader)
+):
+    """Busca os posts mais recentes; o cursor da próxima página é enviado no header X-Next-Cursor"""
+    repo = PostsRepo(db, authors)
+    try:
+        posts = await repo.get_post_list(pagination, cursor, fields)
+    except InvalidCursorError:
+        raise invalid_cursor_exception()
+    await mark_liked_by_me(db, posts, current_user, fields)
+    set_next_cursor(response, posts, pagination)
+    return posts_response(response, posts, fields)
 
 @router.get('/artist/{artist_id}', response_model=list[PostDB])
-async def get_posts_by_artist(artist_id: str, pagination: int = 20, db = Depends(get_mongo_db_with_check)):
+async def get_posts_by_artist(
+    artist_id: str,
+    response: Response,
+    pagination: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[set] = Depends(selected_fields),
+    current_user = Depends(oauth2.get_optional_current_user),
+    db = Depends(get_mongo_db_with_check),
+    authors: AuthorLoader = Depends(get_author_loader)
+):
     """Busca todos os posts de um artista específico"""
-    repo = PostsRepo(db)
-    posts = await repo.get_posts_by_artist(artist_id, pagination)
-    return posts
+    repo = PostsRepo(db, authors)
+    try:
+        posts = await repo.get_posts_by_artist(artist_id, pagination, cursor, fields)
+    except InvalidCursorError:
+        raise invalid_cursor_exception()
+    await mark_liked_by_me(db, posts, current_user, fields)
+    set_next_cursor(response, posts, pagination)
+    return posts_response(response, posts, fields)
+
+@router.get('/feed', response_model=list[PostDB])
+async def get_friends_feed(
+    response: Response,
+    pagination: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[set] = Depends(selected_fields),
+    current_user = Depends(oauth2.get_current_user),
+    sql_db: AsyncSession = Depends(get_async_db),
+    db = Depends(get_mongo_db_with_check),
+    authors: AuthorLoader = Depends(get_author_loader)
+):
+    """Feed com os posts dos amigos do usuário, lido do inbox de timeline"""
+    posts_repo = PostsRepo(db, authors)
+    timeline_repo = TimelineRepo(db)
+
+    # authors above the fan-out limit are merged on read, only if the user is friends with them
+    pull_author_ids = []
+    fanout_on_read_authors = await timeline_repo.get_fanout_on_read_authors()
+    if fanout_on_read_authors:
+        friend_ids = (await friends.get_friend_ids(current_user.id, sql_db)) + [current_user.id]
+        pull_author_ids = [fanout_on_read_authors[i] for i in friend_ids if i in fanout_on_read_authors]
+
+    try:
+        post_ids = await timeline_repo.get_timeline_post_ids(current_user.id, pagination, cursor, pull_author_ids)
+    except InvalidCursorError:
+        raise invalid_cursor_exception()
+    posts = await posts_repo.get_posts_by_ids(post_ids, fields)
+    await mark_liked_by_me(db, posts, current_user, fields)
+    set_next_cursor(response, posts, pagination)
+    return posts_response(response, posts, fields)
 
 
 @router.post('/create')
@@ -32,40 +145,24 @@ async def create_post(
     content: str = Form(...),
     images: Optional[List[UploadFile]] = File(None),
     current_user = Depends(oauth2.get_current_user),
+    sql_db: AsyncSession = Depends(get_async_db),
     db = Depends(get_mongo_db_with_check)
 ):
     repo = PostsRepo(db)
     user_cache_repo = UserCacheRepo(db)
     
-    # Buscar o ObjectId do MongoDB usando o ID do SQL
+    # ObjectId do MongoDB vem do token, tokens antigos buscam pelo ID do SQL
     try:
-        mongo_user_id = await user_cache_repo.get_mongo_id_by_sql_id(current_user.id)
+        mongo_user_id = await user_cache_repo.resolve_mongo_id(current_user)
     except UserCacheNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='Usuário não encontrado no cache. Faça login novamente.'
         )
     
-    # Processar upload de imagens
-    image_paths = []
-    if images:
-        # Criar diretório se não existir
-        upload_dir = "images/posts"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        for image in images:
-            if image:
-                # Gerar nome único para o arquivo
-                file_extension = os.path.splitext(image.filename)[1]
-                unique_filename = f"{uuid.uuid4()}{file_extension}"
-                file_path = os.path.join(upload_dir, unique_filename)
-                
-                # Salvar arquivo
-                with open(file_path, "wb") as buffer:
-                    content_file = await image.read()
-                    buffer.write(content_file)
-                
-                image_paths.append(file_path)
+    # images are streamed to disk in chunks, the limits and the type check abort the upload early
+    # identical images share one file of the content addressed store
+    image_paths = await save_uploads(images or [])
     
     # Criar post
     post_data = PostCreate(
@@ -75,17 +172,26 @@ async def create_post(
         images=image_paths
     )
     
+    # the post is delivered to the author's own timeline and to every friend's timeline
+    audience = [current_user.id] + (await friends.get_friend_ids(current_user.id, sql_db))
+    
     try:
-        created = await repo.create_post(post_data)
+        created = await repo.create_post(post_data, audience)
     except InvalidId:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail='Invalid ID format'
         )
+    # smaller copies for the feed are generated after the response, the originals are served meanwhile
+    image_variants.schedule(image_paths, partial(repo.set_image_variants, created))
     return {"post_id": created, "message": "Post criado com sucesso!"}
 
 @router.get('/{post_id}', response_model=PostDB)
-async def get_post(post_id: str, db = Depends(get_mongo_db_with_check)):
+async def get_post(
+    post_id: str,
+    current_user = Depends(oauth2.get_optional_current_user),
+    db = Depends(get_mongo_db_with_check)
+):
     repo = PostsRepo(db)
     try:
         post = await repo.get_post_by_id(post_id)
@@ -100,6 +206,7 @@ async def get_post(post_id: str, db = Depends(get_mongo_db_with_check)):
             detail='Post not found'
         )
 
+    await mark_liked_by_me(db, [post], current_user)
     return post
 
 @router.post('/{post_id}/like')
@@ -111,9 +218,9 @@ async def like_post(
     repo = PostsRepo(db)
     user_cache_repo = UserCacheRepo(db)
     
-    # Buscar o ObjectId do MongoDB usando o ID do SQL
+    # ObjectId do MongoDB vem do token, tokens antigos buscam pelo ID do SQL
     try:
-        mongo_user_id = await user_cache_repo.get_mongo_id_by_sql_id(current_user.id)
+        mongo_user_id = await user_cache_repo.resolve_mongo_id(current_user)
     except UserCacheNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -121,7 +228,7 @@ async def like_post(
         )
     
     try:
-        liked = await repo.toggle_like_post(post_id, mongo_user_id)
+        like_state = await repo.toggle_like_post(post_id, mongo_user_id)
     except InvalidId:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -135,17 +242,24 @@ async def like_post(
     
     return {
         'message': 'Like toggled successfully',
-        'liked': liked
+        'liked': like_state['liked'],
+        'likes': like_state['likes']
     }
 
 @router.delete('/delete/{post_id}', status_code=204)
 async def delete_post(post_id: str, db = Depends(get_mongo_db_with_check)):
     repo = PostsRepo(db)
     comments_repo = CommentsRepo(db)
+    timeline_repo = TimelineRepo(db)
+    likes_repo = LikesRepo(db)
     try:
         result = await repo.delete_post(post_id)
+        # likes of the post and of its comments, before the comments are gone
+        await likes_repo.on_post_deleted(post_id)
         # delete every comment associated with this post
         deleted_comments = await comments_repo.on_post_deleted(post_id)
+        # remove the post from the timelines it was delivered to
+        await timeline_repo.on_post_deleted(post_id)
     except InvalidId:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -210,15 +324,27 @@ async def like_post(comment_id: str, current_user: dict, db = Depends(get_mongo_
     return {'message': 'Comment liked successfully'}
 
 @router.get('/{post_id}/comments', response_model=list[CommentDB])
-async def get_post_comments(post_id: str, pagination: int = 20, db = Depends(get_mongo_db_with_check)):
-    repo = CommentsRepo(db)
+async def get_post_comments(
+    post_id: str,
+    response: Response,
+    pagination: int = 20,
+    cursor: Optional[str] = None,
+    current_user = Depends(oauth2.get_optional_current_user),
+    db = Depends(get_mongo_db_with_check),
+    authors: AuthorLoader = Depends(get_author_loader)
+):
+    repo = CommentsRepo(db, authors)
     try:
-        comments = await repo.get_post_comments(post_id, pagination)
+        comments = await repo.get_post_comments(post_id, pagination, cursor)
     except InvalidId:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail='Invalid ID format'
         )
+    except InvalidCursorError:
+        raise invalid_cursor_exception()
+    await mark_liked_by_me(db, comments, current_user)
+    set_next_cursor(response, comments, pagination)
     return comments
 
 @router.delete('/delete/comment/{comment_id}', status_code=204)
@@ -226,6 +352,7 @@ async def delete_post(comment_id: str, db = Depends(get_mongo_db_with_check)):
     repo = CommentsRepo(db)
     try:
         result = await repo.delete_comment(comment_id)
+        await LikesRepo(db).on_targets_deleted([comment_id])
     except InvalidId:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -1,16 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, requests, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from .. import database, oauth2
 from ..services.spotify_auth_service import SpotifyAuthService
+from ..services.spotify_token_manager import spotify_token_manager, SpotifyTokenError
 from ..repositories.spotify_artists_repository import sync_top_artists
 from ..repositories.artist import show_all_artists
-from ..repositories.user import update_spotify_tokens, get_user_spotify_tokens
+from ..repositories.user import update_spotify_tokens
 from ..repositories.spotify_albums_repository import get_all_albums_from_artists
-from datetime import datetime
+from ..core.permissions import require_system_script_for_album_creation
 import json
 import base64
-import requests
 
 router = APIRouter(prefix="/spotify", tags=["spotify"])
 
@@ -66,7 +66,7 @@ async def spotify_callback(
             )
         
         auth_service = SpotifyAuthService()
-        token_data = auth_service.get_access_token(code)
+        token_data = await auth_service.get_access_token(code)
         
         if not token_data or not token_data.get("access_token"):
             raise HTTPException(
@@ -108,49 +108,13 @@ async def get_top_artists(
 ):
     try:
         auth_service = SpotifyAuthService()
-        
-        user_tokens = get_user_spotify_tokens(current_user.id, db)
-        
-        if not user_tokens or not user_tokens.get("access_token"):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Usuário não autenticado com Spotify. Faça login primeiro."
-            )
-        
-        access_token = user_tokens["access_token"]
-        refresh_token = user_tokens["refresh_token"]
-        expires_at = user_tokens["expires_at"]
-        
-        token_valid = True
-        if expires_at and expires_at <= datetime.now():
-            token_valid = False
-        
-        if not token_valid or not auth_service.validate_token(access_token):
-            if not refresh_token:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Token expirado e refresh token não disponível. Faça login novamente."
-                )
-            
-            new_token_data = auth_service.refresh_access_token(refresh_token)
-            
-            if not new_token_data:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Falha ao renovar token. Faça login novamente com o Spotify."
-                )
-            
-            update_spotify_tokens(
-                user_id=current_user.id,
-                access_token=new_token_data["access_token"],
-                refresh_token=None,  
-                expires_at=new_token_data["expires_at"],
-                db=db
-            )
-            
-            access_token = new_token_data["access_token"]
-        
-        top_artists_data = auth_service.get_top_artists(access_token, limit=50)
+
+        # trusts the stored expiry, the token is only refreshed when expired or rejected with 401
+        top_artists_data = await spotify_token_manager.call(
+            current_user.id,
+            db,
+            lambda access_token: auth_service.get_top_artists(access_token, limit=50)
+        )
         
         # Sincronizar artistas no banco (para manter histórico)
         sync_top_artists(top_artists_data, db)
@@ -169,6 +133,11 @@ async def get_top_artists(
                 })
         
         return formatted_artists
+    except SpotifyTokenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -177,10 +146,15 @@ async def get_top_artists(
 
 @router.get("/albums")
 async def get_all_albums(
+    refresh: bool = Query(default=False),
     db: Session = Depends(database.get_db),
 ):
+    if refresh:
+        # rewrites the stored albums with one Spotify call per artist, reserved to the import script
+        require_system_script_for_album_creation()
     try:
-        albums = get_all_albums_from_artists(db)
+        # refresh=true fetches the albums of every artist again from Spotify
+        albums = await get_all_albums_from_artists(db, refresh=refresh)
         
         if not albums:
             return {
@@ -206,7 +180,7 @@ async def search_spotify_artists(
 ):
     try:
         auth_service = SpotifyAuthService()
-        artists = auth_service.search_artists(query=query)
+        artists = await auth_service.search_artists(query=query)
 
         formatted_artists = []
         for artist in artists:
@@ -236,23 +210,14 @@ async def get_artist_by_id(
     """Busca informações de um artista específico pelo ID do Spotify"""
     try:
         auth_service = SpotifyAuthService()
-        token = auth_service.get_app_access_token()
-        
-        headers = {"Authorization": f"Bearer {token}"}
-        response = requests.get(
-            f"https://api.spotify.com/v1/artists/{artist_id}",
-            headers=headers
-        )
-        
-        if response.status_code == 404:
+        artist = await auth_service.get_artist(artist_id)
+
+        if artist is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Artista não encontrado no Spotify"
             )
-        
-        response.raise_for_status()
-        artist = response.json()
-        
+
         return {
             "id": artist.get("id"),
             "name": artist.get("name"),
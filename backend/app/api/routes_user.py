@@ -1,14 +1,22 @@
 from fastapi import APIRouter, Depends, status, Response, HTTPException, File, UploadFile
 from .. import schemas
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from ..database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db, get_read_db
 from ..core.mongo import get_mongo_db_with_check
 from typing import List, Annotated
 from ..repositories import user
-from ..oauth2 import get_current_user
+from ..oauth2 import get_current_user, invalidate_current_user
 from ..services.spotify_service import spotify_service
+from ..core.uploads import save_upload
+from ..core.image_variants import image_variants
+from ..core.mongo import get_mongo_db, is_mongo_connected
+from ..repositories.users_cache_repository import UserCacheRepo
+from ..repositories.images_repository import ImagesRepo
 from .. import models_sql
 import os
+from functools import partial
 
 
 router = APIRouter(
@@ -18,20 +26,20 @@ router = APIRouter(
 
 
 @router.post('/', status_code=status.HTTP_201_CREATED, response_model=schemas.ShowUser)
-async def createUser(request_user:schemas.User, db:Session = Depends(get_db), mongo = Depends(get_mongo_db_with_check)):
+async def createUser(request_user:schemas.User, db:AsyncSession = Depends(get_async_db), mongo = Depends(get_mongo_db_with_check)):
     return await user.create_user(request_user, db, mongo)
 
 @router.delete('/{username}/delete', status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(username, db:Session=Depends(get_db), current_user=Depends(get_current_user)):
+async def delete_user(username, db:AsyncSession=Depends(get_async_db), current_user=Depends(get_current_user)):
     if current_user.username != username:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Você só pode deletar sua própria conta, animal"
         )
-    return user.delete_user(username, db)
+    return await user.delete_user(username, db)
 
 @router.put('/{username}/update', status_code=status.HTTP_202_ACCEPTED)
-async def update_user(username, request:schemas.User, db:Session=Depends(get_db), mongo = Depends(get_mongo_db_with_check), current_user=Depends(get_current_user)):
+async def update_user(username, request:schemas.User, db:AsyncSession=Depends(get_async_db), mongo = Depends(get_mongo_db_with_check), current_user=Depends(get_current_user)):
     if current_user.username != username:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -40,7 +48,7 @@ async def update_user(username, request:schemas.User, db:Session=Depends(get_db)
     return await user.update_user(username, request, db, mongo)
 
 @router.get('/', response_model=List[schemas.ShowUser])
-def get_all_users(db:Session = Depends(get_db), current_user=Depends(get_current_user)):
+def get_all_users(db:Session = Depends(get_read_db), current_user=Depends(get_current_user)):
     return user.get_all_users(db)
 
 @router.get('/me', status_code=200, response_model=schemas.ShowUser)
@@ -50,10 +58,10 @@ async def get_current_user_info(
 ):
     from ..repositories.users_cache_repository import UserCacheRepo
     
-    # Buscar mongo_id do usuário
+    # Buscar mongo_id do usuário (vem do token, tokens antigos consultam o cache)
     cache_repo = UserCacheRepo(mongo)
     try:
-        mongo_id = await cache_repo.get_mongo_id_by_sql_id(current_user.id)
+        mongo_id = await cache_repo.resolve_mongo_id(current_user)
     except:
         mongo_id = None
     
@@ -72,9 +80,9 @@ async def get_current_user_info(
     return user_dict
 
 @router.put('/me/favorite-artist', status_code=200, response_model=schemas.ShowUser)
-def set_favorite_artist(
+async def set_favorite_artist(
     artist_data: schemas.FavoriteArtist,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """Define o artista favorito do usuário usando o nome ou ID do Spotify"""
@@ -86,8 +94,14 @@ def set_favorite_artist(
         artist_name = artist_data.artist_name
     # Caso contrário, tenta buscar pelo ID do Spotify
     elif artist_data.artist_id:
+        # artists synced from Spotify already have their id stored, no request needed
+        result = await db.execute(select(models_sql.Artist).where(models_sql.Artist.spotify_id == artist_data.artist_id))
+        stored_artist = result.scalars().first()
+        if stored_artist:
+            artist_name = stored_artist.nome
+    if not artist_name and artist_data.artist_id:
         try:
-            artist_info = spotify_service.get_artist_info(artist_data.artist_id)
+            artist_info = await spotify_service.get_artist_info(artist_data.artist_id)
             if artist_info:
                 artist_name = artist_info["name"]
         except:
@@ -100,7 +114,7 @@ def set_favorite_artist(
         )
     
     # Atualiza o artista favorito do usuário
-    updated_user = user.update_favorite_artist(
+    updated_user = await user.update_favorite_artist(
         username=current_user.username,
         artist_name=artist_name,
         db=db
@@ -109,45 +123,53 @@ def set_favorite_artist(
     return updated_user
 
 @router.get('/id/{user_id}', status_code=200, response_model=schemas.ShowUser)
-def get_user_by_id(user_id: int, db: Session = Depends(get_db)):
+def get_user_by_id(user_id: int, db: Session = Depends(get_read_db)):
     user_data = user.get_user_by_id(user_id, db)
     if not user_data:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     return user_data
 
 @router.get('/{username}', status_code=200, response_model=schemas.ShowUser)
-def show_user(username,response:Response, db:Session=Depends(get_db)):
+def show_user(username,response:Response, db:Session=Depends(get_read_db)):
     return user.show_user(username, db)
 
+async def save_photo_variants(sql_user_id: int, photo_url: str, variants: list):
+    # the variants are rendered with the author of posts and comments, which come from Users_cache
+    if is_mongo_connected():
+        await UserCacheRepo(get_mongo_db()).set_photo_variants(
+            sql_user_id, photo_url, {width: f'backend/{path}' for width, path in variants[0].items()}
+        )
+
 @router.post('/upload-photo', status_code=200)
 async def upload_profile_picture(
     file: Annotated[UploadFile, File()],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     
-    filename = file.filename
     content_type = file.content_type
 
-    contents = await file.read()
-
-    if not os.path.exists(f'images/pfp/{current_user.username}'):
-        os.makedirs(f'images/pfp/{current_user.username}')
-
-    with open(f'images/pfp/{current_user.username}/{filename}', 'wb') as f:
-        f.write(contents)
-
+    # stored by the hash of its content, the client filename is never used as a path
+    path = await save_upload(file)
+    filename = os.path.basename(path)
 
-    file_url = f'backend/images/pfp/{current_user.username}/{filename}'
+    file_url = f'backend/{path}'
     # Atualiza a URL da foto do usuário no banco de dados
-    user_record = db.query(models_sql.User).filter(models_sql.User.id == current_user.id).first()
+    user_record = await db.get(models_sql.User, current_user.id)
+    previous_url = user_record.user_photo_url
     user_record.user_photo_url = file_url  # Aqui você pode usar uma URL pública se estiver usando um serviço de armazenamento
-    db.commit()
-    db.refresh(user_record)
+    await db.commit()
+    invalidate_current_user(current_user.id)
+    # without mongoDB there is no counter, gc_images also keeps the photos referenced by the SQL users
+    if is_mongo_connected():
+        await ImagesRepo(get_mongo_db()).replace(previous_url, file_url)
+        # authors of posts and comments are rendered from Users_cache
+        await UserCacheRepo(get_mongo_db()).set_photo(current_user.id, file_url)
+    image_variants.schedule([path], partial(save_photo_variants, current_user.id, file_url))
 
     return {"filename": filename, "content_type": content_type, "message": "Upload successful"}
 
 @router.get('/pesquisar/{input}', status_code=200, response_model=List[schemas.ShowUser])
-def search_users(input: str, db:Session=Depends(get_db)):
+def search_users(input: str, db:Session=Depends(get_read_db)):
     users = db.query(models_sql.User).filter(models_sql.User.username.ilike(f"{input}%")).all()
     return users
\ No newline at end of file
@@ -0,0 +1,128 @@
+import asyncio
+import importlib.util
+import logging
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Smaller copies of the uploaded images (e.g. 160/640/1080 px wide), saved next to the original as
+# <name>_w<width>.webp. Resizing is CPU bound, so it runs in a process pool after the upload returns.
+# Pillow is a dependency of the project; the check only keeps a bare install serving the originals.
+PILLOW_AVAILABLE = importlib.util.find_spec("PIL") is not None
+IMAGE_VARIANTS_ENABLED = os.getenv("IMAGE_VARIANTS_ENABLED", "true").lower() == "true"
+IMAGE_VARIANT_WIDTHS = [int(width) for width in os.getenv("IMAGE_VARIANT_WIDTHS", "160,640,1080").split(",")]
+IMAGE_VARIANT_FORMAT = os.getenv("IMAGE_VARIANT_FORMAT", "webp").lower()  # webp or jpeg
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", "80"))
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", "2"))
+
+EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg"}
+
+def variant_path(path: str, width: int, fmt: str = IMAGE_VARIANT_FORMAT) -> str:
+    stem, _ = os.path.splitext(path)
+    return f"{stem}_w{width}{EXTENSIONS[fmt]}"
+
+def _save_variant(image, output: str, fmt: str, quality: int):
+    # written to a .part file and renamed, a worker dying mid-save never leaves a truncated
+    # variant in the store (it is served as immutable); gc_images removes the stale .part files
+    partial_path = os.path.join(os.path.dirname(output), f".{uuid.uuid4()}.part")
+    try:
+        image.save(partial_path, format=fmt.upper(), quality=quality)
+        os.replace(partial_path, output)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+def make_variants(path: str, widths: List[int], fmt: str, quality: int) -> Dict[str, str]:
+    """Gera as variantes menores que a imagem original, devolve {largura: caminho}. Roda no processo do pool."""
+    from PIL import Image, ImageOps
+
+    variants = {}
+    with Image.open(path) as original:
+        # phone photos are stored sideways with an EXIF orientation
+        image = ImageOps.exif_transpose(original)
+        if fmt == "jpeg" and image.mode != "RGB":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            # palette PNG/GIF (only the first frame of an animation is kept)
+            image = image.convert("RGBA")
+
+        for width in sorted(widths):
+            if width >= image.width:
+                break
+            height = max(1, round(image.height * width / image.width))
+            output = variant_path(path, width, fmt)
+            # the same content uploaded again already has its variants in the store
+            if not os.path.exists(output):
+                resized = image.resize((width, height), Image.Resampling.LANCZOS)
+                _save_variant(resized, output, fmt, quality)
+            variants[str(width)] = output
+    return variants
+
+class ImageVariantsWorker:
+    """Agenda a geração das variantes em segundo plano e chama on_done com o resultado"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.generated = 0
+        self.failed = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # keeps a reference to the running tasks, the event loop only holds weak ones
+        self._tasks = set()
+
+    @property
+    def enabled(self) -> bool:
+        return IMAGE_VARIANTS_ENABLED and PILLOW_AVAILABLE
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that already runs threads (logging, uploads) is not safe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def generate(self, path: str) -> Dict[str, str]:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._pool(), make_variants, path, IMAGE_VARIANT_WIDTHS, IMAGE_VARIANT_FORMAT, IMAGE_VARIANT_QUALITY
+        )
+
+    def schedule(self, paths: List[str], on_done: Callable[[List[Dict[str, str]]], Awaitable]) -> Optional[asyncio.Task]:
+        """Gera as variantes de paths e chama on_done(variantes, na mesma ordem); None se está desabilitado"""
+        if not self.enabled or not paths:
+            return None
+        task = asyncio.ensure_future(self._run(paths, on_done))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, paths: List[str], on_done):
+        try:
+            variants = await asyncio.gather(*[self.generate(path) for path in paths])
+            await on_done(list(variants))
+            self.generated += len(paths)
+        except Exception:
+            self.failed += 1
+            logger.exception("Erro ao gerar variantes das imagens %s", paths)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._tasks),
+            "generated": self.generated,
+            "failed": self.failed,
+        }
+
+    async def stop(self):
+        # lets the images of the last uploads finish before the pool goes away
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=10)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+image_variants = ImageVariantsWorker(IMAGE_VARIANT_WORKERS)
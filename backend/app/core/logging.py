@@ -0,0 +1,127 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from typing import Dict, Optional
+
+# Logging setup of the app: records are put on a queue by the caller and written to stdout by a
+# listener thread, so a slow terminal or pipe never blocks the event loop.
+#   LOG_LEVEL          root level (default INFO)
+#   LOG_LEVELS         per module levels, e.g. "app.repositories=DEBUG,app.services.spotify_auth_service=WARNING"
+#   LOG_SAMPLE_RATES   fraction of the DEBUG/INFO records kept per module, e.g. "app.repositories.posts_repository=0.01"
+#   LOG_FORMAT         "text" or "json" (one JSON object per line, with the extra= fields of the record)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "app.repositories.posts_repository=0.01")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# attributes every LogRecord has, anything else came from extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+_sampled_loggers: Dict[str, logging.Filter] = {}
+
+def parse_module_settings(value: str) -> Dict[str, str]:
+    """'modulo=valor,modulo=valor' -> {modulo: valor}"""
+    settings = {}
+    for item in value.split(","):
+        if "=" in item:
+            module, setting = item.split("=", 1)
+            settings[module.strip()] = setting.strip()
+    return settings
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        extra = {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+        if extra:
+            message += " " + " ".join(f"{key}={value}" for key, value in extra.items())
+        return message
+
+class SamplingFilter(logging.Filter):
+    """Mantém 1 a cada N registros abaixo de WARNING; avisos e erros sempre passam"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if not self.every:
+            return False
+        with self._lock:
+            self._count += 1
+            return (self._count - 1) % self.every == 0
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    # a full queue drops the record instead of blocking the caller
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+def setup_logging(stream=None):
+    """Configura o logging do app (pode ser chamada de novo, ex.: nos testes)"""
+    global _listener, _queue_handler
+    stop_logging()
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _queue_handler = DroppingQueueHandler(log_queue)
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(LOG_LEVEL)
+    for module, level in parse_module_settings(LOG_LEVELS).items():
+        logging.getLogger(module).setLevel(level.upper())
+
+    for name, sampling in _sampled_loggers.items():
+        logging.getLogger(name).removeFilter(sampling)
+    _sampled_loggers.clear()
+    for module, rate in parse_module_settings(LOG_SAMPLE_RATES).items():
+        sampling = SamplingFilter(float(rate))
+        logging.getLogger(module).addFilter(sampling)
+        _sampled_loggers[module] = sampling
+
+    _listener.start()
+
+def stop_logging():
+    """Escreve os registros que ainda estão na fila e remove o handler"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+atexit.register(stop_logging)
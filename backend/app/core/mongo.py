@@ -1,11 +1,17 @@
 import json
+import logging
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
 from fastapi import HTTPException, status
+from app.core.mongo_indexes import managed_indexes, reconcile_indexes
+
+logger = logging.getLogger(__name__)
 
 class MongoSettings():
     MONGO_URI: str = "mongodb://localhost:27017"
     MONGO_DB_NAME: str = 'SocialJAM'
+    # enforce one Users_cache document per SQL user (fails to build if there are duplicates)
+    MONGO_UNIQUE_USER_CACHE: bool = os.getenv("MONGO_UNIQUE_USER_CACHE", "false").lower() == "true"
 
 settings = MongoSettings()
 
@@ -23,8 +29,8 @@ async def connect_mongo():
         mongo_connected = True
         return True
     except Exception as e:
-        print(f"Aviso: Não foi possível conectar ao MongoDB: {e}")
-        print("Servidor iniciará sem funcionalidade MongoDB")
+        logger.warning("Não foi possível conectar ao MongoDB: %s", e)
+        logger.warning("Servidor iniciará sem funcionalidade MongoDB")
         mongo_connected = False
         client = None
         db = None
@@ -55,7 +61,7 @@ def get_mongo_db_with_check():
 
 async def apply_schemas():
     if not mongo_connected or db is None:
-        print("Aviso: Schemas do MongoDB não aplicados - MongoDB não conectado")
+        logger.warning("Schemas do MongoDB não aplicados - MongoDB não conectado")
         return
     
     try:
@@ -73,6 +79,25 @@ async def apply_schemas():
             'validationLevel': 'strict'
         })
 
-        print('Schemas aplicados ao mongoDB')
+        logger.info('Schemas aplicados ao mongoDB')
+    except Exception as e:
+        logger.warning("Erro ao aplicar schemas: %s", e)
+
+async def ensure_indexes():
+    if not mongo_connected or db is None:
+        logger.warning("Índices do MongoDB não criados - MongoDB não conectado")
+        return
+
+    try:
+        report = await reconcile_indexes(db, managed_indexes(settings.MONGO_UNIQUE_USER_CACHE))
+        for index in report['created']:
+            logger.info('Índice criado no mongoDB: %s', index)
+        for index in report['drifted']:
+            logger.warning('Índice divergente do registro: %s', index)
+        for index in report['unmanaged']:
+            logger.warning('Índice não gerenciado pelo registro: %s', index)
+        for index in report['failed']:
+            logger.error('Erro ao criar índice: %s', index)
+        logger.info('Índices aplicados ao mongoDB')
     except Exception as e:
-        print(f"Aviso: Erro ao aplicar schemas: {e}")
\ No newline at end of file
+        logger.warning("Erro ao criar índices: %s", e)
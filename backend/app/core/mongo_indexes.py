@@ -0,0 +1,76 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure
+
+# Declarative set of the indexes the app relies on, per collection.
+# Indexes are matched by their keys, so the default names generated by mongoDB are kept
+# and indexes created by older versions of the app are recognized.
+
+def managed_indexes(unique_user_cache: bool = False) -> dict:
+    return {
+        'Posts': [
+            # get_post_list and the keyset cursor
+            {'keys': [('created_at', -1), ('_id', -1)]},
+            # get_posts_by_artist
+            {'keys': [('artist_id', 1), ('created_at', -1), ('_id', -1)]},
+            # posts of the fan-out on read authors pulled into the friends feed
+            {'keys': [('author_id', 1), ('created_at', -1), ('_id', -1)]},
+        ],
+        'Comments': [
+            # get_post_comments and on_post_deleted
+            {'keys': [('post_id', 1), ('created_at', -1), ('_id', -1)]},
+        ],
+        'Users_cache': [
+            # get_mongo_id_by_sql_id, get_user_cache_by_id and upsert_user_cache
+            {'keys': [('sql_user_id', 1)], 'unique': unique_user_cache},
+            # get_fanout_on_read_authors, read on every friends feed
+            {'keys': [('timeline_fanout', 1)]},
+        ],
+        'Timelines': [
+            # friends feed inbox
+            {'keys': [('user_id', 1), ('created_at', -1), ('post_id', -1)]},
+            # removal of deleted posts from the inboxes
+            {'keys': [('post_id', 1)]},
+        ],
+        'Likes': [
+            # one like per user and target, also serves on_targets_deleted
+            {'keys': [('target_id', 1), ('user_id', 1)], 'unique': True},
+            # liked_by_user for a page of the feed
+            {'keys': [('user_id', 1), ('target_id', 1)]},
+        ],
+    }
+
+async def reconcile_indexes(db: AsyncIOMotorDatabase, registry: dict) -> dict:
+    """
+    Cria os índices do registro que ainda não existem e reporta as divergências.
+    Índices divergentes ou não gerenciados nunca são removidos automaticamente.
+    """
+    report = {'created': [], 'drifted': [], 'unmanaged': [], 'failed': []}
+
+    for collection, specs in registry.items():
+        existing = await db[collection].index_information()
+        by_keys = {tuple(info['key']): (name, info) for name, info in existing.items()}
+        managed_names = set()
+
+        for spec in specs:
+            keys = tuple(spec['keys'])
+            unique = spec.get('unique', False)
+
+            if keys not in by_keys:
+                try:
+                    name = await db[collection].create_index(list(keys), unique=unique)
+                    report['created'].append(f'{collection}.{name}')
+                except OperationFailure as e:
+                    # e.g. an unique index over duplicated data
+                    report['failed'].append(f'{collection}.{list(keys)}: {e}')
+                continue
+
+            name, info = by_keys[keys]
+            managed_names.add(name)
+            if info.get('unique', False) != unique:
+                report['drifted'].append(f'{collection}.{name}: unique={info.get("unique", False)}, esperado unique={unique}')
+
+        for name in existing:
+            if name != '_id_' and name not in managed_names:
+                report['unmanaged'].append(f'{collection}.{name}')
+
+    return report
@@ -0,0 +1,55 @@
+import base64
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Keyset (cursor) pagination helpers shared by the feed repositories.
+# The cursor is an opaque token encoding the (created_at, _id) pair of the last
+# item of a page, so the next page is an index range scan on {created_at: -1, _id: -1}
+# instead of a skip over every previous item.
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+SORT_KEYS = [('created_at', -1), ('_id', -1)]
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+def encode_cursor(created_at: datetime, doc_id) -> str:
+    if created_at.tzinfo is None:
+        # mongoDB returns naive datetimes in UTC
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    # mongoDB dates have millisecond precision, keep the cursor exact
+    millis = (created_at - EPOCH) // timedelta(milliseconds=1)
+    raw = f'{millis}:{ObjectId(doc_id)}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        millis, doc_id = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        return EPOCH + timedelta(milliseconds=int(millis)), ObjectId(doc_id)
+    except (ValueError, InvalidId, UnicodeDecodeError):
+        raise InvalidCursorError(cursor)
+
+def keyset_filter(cursor: Optional[str], sort_field: str = 'created_at', id_field: str = '_id') -> dict:
+    """Filtro que retorna apenas os itens depois do cursor na ordenação (sort_field desc, id desc)"""
+    if not cursor:
+        return {}
+    created_at, doc_id = decode_cursor(cursor)
+    return {
+        '$or': [
+            {sort_field: {'$lt': created_at}},
+            {sort_field: created_at, id_field: {'$lt': doc_id}},
+        ]
+    }
+
+def next_cursor(items: list, limit: int, id_field: str = '_id') -> Optional[str]:
+    """Cursor para a próxima página, ou None quando esta página é a última"""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(last['created_at'], last[id_field])
+
+class InvalidCursorError(Exception):
+    # Throws this error when a pagination cursor can't be decoded
+    def __init__(self, cursor: str):
+        super().__init__(f'Cursor de paginação inválido: {cursor}')
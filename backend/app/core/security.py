@@ -1,11 +1,65 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 
 pwd_cxt = CryptContext(schemes=['bcrypt'], deprecated="auto")
 
+# bcrypt is CPU bound and releases the GIL, so it runs on a small dedicated thread pool
+# instead of the event loop. Requests above PASSWORD_HASH_MAX_PENDING (running + queued)
+# are rejected with 503, so a login burst degrades instead of freezing the worker.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+class PasswordHashPool:
+    def __init__(self, workers: int, max_pending: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        # only touched from the event loop, no lock needed
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HashPoolSaturatedError(self.pending)
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "queue_depth": max(self.pending - self.workers, 0),
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+hash_pool = PasswordHashPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
 class Hash():
     def hashPWD(password:str):
         hashed_pwd = pwd_cxt.hash(password)
         return hashed_pwd
-    
+
     def verify(plain_pwd, hashed_pwd):
-        return pwd_cxt.verify(plain_pwd, hashed_pwd)
\ No newline at end of file
+        return pwd_cxt.verify(plain_pwd, hashed_pwd)
+
+    # versions for async routes, run on the password hash pool
+    async def hash_async(password: str):
+        return await hash_pool.run(Hash.hashPWD, password)
+
+    async def verify_async(plain_pwd, hashed_pwd):
+        return await hash_pool.run(Hash.verify, plain_pwd, hashed_pwd)
+
+class HashPoolSaturatedError(Exception):
+    # Throws this error when too many passwords are already waiting to be hashed
+    def __init__(self, pending: int):
+        super().__init__(f'Fila de hash de senhas cheia ({pending} pendentes).')
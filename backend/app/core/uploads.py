@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from fastapi import UploadFile
+from fastapi.staticfiles import StaticFiles
+
+# Image uploads are copied to disk in chunks on a dedicated thread pool, so a large file never
+# sits whole in memory nor blocks the event loop with file I/O. Limits are in bytes.
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(30 * 1024 * 1024)))
+UPLOAD_IO_WORKERS = int(os.getenv("UPLOAD_IO_WORKERS", "4"))
+# content addressed store: files are named by the sha256 of their content and sharded in
+# <ab>/<cd>/ subdirectories, so an image uploaded twice is stored once and never changes
+IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", "images/store")
+
+# room for the multipart boundaries and the form fields when checking Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+
+_executor = ThreadPoolExecutor(max_workers=UPLOAD_IO_WORKERS, thread_name_prefix="upload-io")
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Extensão da imagem pelos primeiros bytes (magic bytes), None se não é um formato aceito"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return ".gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+class UploadMetrics:
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.rejected = 0
+        self.deduplicated = 0
+
+    def record(self, size: int, seconds: float):
+        # only touched from the event loop, no lock needed
+        self.files += 1
+        self.bytes += size
+        self.seconds += seconds
+
+    def stats(self) -> dict:
+        return {
+            "files": self.files,
+            "bytes": self.bytes,
+            "rejected": self.rejected,
+            "deduplicated": self.deduplicated,
+            "throughput_mb_s": round(self.bytes / self.seconds / 1024 / 1024, 2) if self.seconds else None,
+        }
+
+upload_metrics = UploadMetrics()
+
+class UploadBudget:
+    """Bytes que ainda podem ser gravados nesta requisição"""
+
+    def __init__(self, max_bytes: int = None):
+        self.remaining = UPLOAD_MAX_REQUEST_BYTES if max_bytes is None else max_bytes
+
+    def consume(self, size: int):
+        self.remaining -= size
+        if self.remaining < 0:
+            raise UploadTooLargeError("requisição", UPLOAD_MAX_REQUEST_BYTES)
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def store_path(directory: str, digest: str, extension: str) -> str:
+    return os.path.join(directory, digest[:2], digest[2:4], f"{digest}{extension}")
+
+def _publish(partial_path: str, path: str) -> bool:
+    """Move o arquivo para o caminho final; False se o mesmo conteúdo já estava no store"""
+    if os.path.exists(path):
+        os.remove(partial_path)
+        # a fresh mtime keeps gc_images away from a file that is about to be referenced again
+        os.utime(path)
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(partial_path, path)
+    return True
+
+async def _store_upload(upload: UploadFile, directory: str, budget: UploadBudget) -> tuple[str, bool]:
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+
+    chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+    extension = sniff_image_type(chunk)
+    if extension is None:
+        upload_metrics.rejected += 1
+        raise UnsupportedImageError(upload.filename)
+
+    await loop.run_in_executor(_executor, lambda: os.makedirs(directory, exist_ok=True))
+    # written under a temporary name, so a half copied file is never served; the final name is only known at the end
+    partial_path = os.path.join(directory, f".{uuid.uuid4()}.part")
+    output = await loop.run_in_executor(_executor, open, partial_path, "wb")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while chunk:
+            size += len(chunk)
+            if size > UPLOAD_MAX_FILE_BYTES:
+                raise UploadTooLargeError(upload.filename, UPLOAD_MAX_FILE_BYTES)
+            budget.consume(len(chunk))
+            digest.update(chunk)
+            await loop.run_in_executor(_executor, output.write, chunk)
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        await loop.run_in_executor(_executor, output.close)
+        path = store_path(directory, digest.hexdigest(), extension)
+        created = await loop.run_in_executor(_executor, _publish, partial_path, path)
+    except BaseException:
+        upload_metrics.rejected += 1
+        await loop.run_in_executor(_executor, output.close)
+        await loop.run_in_executor(_executor, _remove, partial_path)
+        raise
+
+    upload_metrics.record(size, time.perf_counter() - start)
+    if not created:
+        upload_metrics.deduplicated += 1
+    return path, created
+
+async def save_upload(upload: UploadFile, directory: Optional[str] = None, budget: Optional[UploadBudget] = None) -> str:
+    """
+    Grava a imagem no store (nome = sha256 do conteúdo, extensão pelo conteúdo) e devolve o caminho.
+    Arquivos grandes demais ou que não são imagens são rejeitados antes de terminar a cópia.
+    """
+    path, _ = await _store_upload(upload, directory or IMAGE_STORE_DIR, budget or UploadBudget())
+    return path
+
+async def save_uploads(uploads: List[UploadFile], directory: Optional[str] = None) -> List[str]:
+    """Grava as imagens de uma requisição com o limite total; se uma falha, as que ela criou são removidas"""
+    budget = UploadBudget()
+    paths, created_paths = [], []
+    try:
+        for upload in uploads:
+            if upload:
+                path, created = await _store_upload(upload, directory or IMAGE_STORE_DIR, budget)
+                paths.append(path)
+                if created:
+                    created_paths.append(path)
+    except BaseException:
+        # files that were already in the store belong to other posts too
+        for path in created_paths:
+            await asyncio.get_running_loop().run_in_executor(_executor, _remove, path)
+        raise
+    return paths
+
+class UploadSizeLimitMiddleware:
+    """Recusa com 413 uploads cujo Content-Length já passa do limite, antes de o corpo ser lido"""
+
+    def __init__(self, app, max_bytes: int = None):
+        self.app = app
+        self.max_bytes = (UPLOAD_MAX_REQUEST_BYTES if max_bytes is None else max_bytes) + MULTIPART_OVERHEAD
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = dict(scope["headers"])
+            content_type = headers.get(b"content-type", b"")
+            content_length = headers.get(b"content-length", b"")
+            if content_type.startswith(b"multipart/form-data") and content_length.isdigit() \
+                    and int(content_length) > self.max_bytes:
+                upload_metrics.rejected += 1
+                await send({
+                    "type": "http.response.start",
+                    "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"connection", b"close")],
+                })
+                await send({"type": "http.response.body", "body": b'{"detail":"Upload maior que o permitido"}'})
+                return
+        await self.app(scope, receive, send)
+
+class ImmutableStaticFiles(StaticFiles):
+    """Arquivos do store: o nome é o hash do conteúdo, então o navegador pode guardar a resposta para sempre"""
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+class UploadTooLargeError(Exception):
+    # Throws this error when a file or the whole request goes over the upload limits
+    def __init__(self, name: str, limit: int):
+        self.limit = limit
+        super().__init__(f'Upload maior que o permitido ({name}): limite de {limit} bytes.')
+
+class UnsupportedImageError(Exception):
+    # Throws this error when the content of an upload is not a supported image
+    def __init__(self, name: str):
+        super().__init__(f'O arquivo {name} não é uma imagem JPEG, PNG, GIF ou WebP.')
@@ -0,0 +1,68 @@
+"""
+Preenche artist.spotify_id dos artistas cadastrados antes da coluna existir, buscando cada nome no Spotify.
+
+Uso (a partir de backend/):
+    python -m app.jobs.backfill_artist_spotify_ids [--batch-size 50] [--dry-run]
+"""
+import argparse
+import asyncio
+from sqlalchemy.orm import Session
+from app.core.http_client import close_http_client
+from app.database import get_db_context
+from app.models_sql import Artist
+from app.services.spotify_auth_service import SpotifyAuthService
+
+BACKFILL_CONCURRENCY = 8
+
+async def backfill_artist_spotify_ids(db: Session, batch_size: int = 50, dry_run: bool = False) -> dict:
+    """Devolve quantos artistas foram atualizados e quais nomes não tiveram correspondência exata"""
+    auth_service = SpotifyAuthService()
+    semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+    report = {"updated": 0, "not_found": []}
+
+    async def lookup(artist: Artist):
+        async with semaphore:
+            return await auth_service.search_artist(artist.nome)
+
+    last_id = 0
+    while True:
+        # keyset batches, updated rows leave the filter but skipped ones must not be read again
+        batch = db.query(Artist).filter(Artist.spotify_id.is_(None), Artist.id > last_id) \
+            .order_by(Artist.id).limit(batch_size).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        results = await asyncio.gather(*[lookup(artist) for artist in batch], return_exceptions=True)
+        for artist, found in zip(batch, results):
+            # only trust the search when the name matches, the first result can be another artist
+            if isinstance(found, dict) and (found.get("name") or "").casefold() == artist.nome.casefold():
+                artist.spotify_id = found["id"]
+                report["updated"] += 1
+            else:
+                report["not_found"].append(artist.nome)
+
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+
+    return report
+
+async def main(batch_size: int, dry_run: bool):
+    try:
+        with get_db_context() as db:
+            report = await backfill_artist_spotify_ids(db, batch_size=batch_size, dry_run=dry_run)
+    finally:
+        await close_http_client()
+
+    print(f"{report['updated']} artistas atualizados" + (" (dry run)" if dry_run else ""))
+    for nome in report["not_found"]:
+        print(f"Sem correspondência no Spotify: {nome}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.dry_run))
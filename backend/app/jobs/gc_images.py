@@ -0,0 +1,123 @@
+"""
+Apaga do store de imagens os arquivos que nenhum post ou foto de perfil referencia mais,
+junto com as variantes menores e as cópias parciais de uploads interrompidos.
+Arquivos mais novos que o período de carência nunca são apagados: a referência só é contada
+depois que o upload termina (ex.: quando o post é criado).
+
+Uso (a partir de backend/):
+    python -m app.jobs.gc_images [--grace-hours 24] [--dry-run]
+"""
+import argparse
+import asyncio
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Tuple
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from app import models_sql
+from app.core.mongo import settings
+from app.core.uploads import IMAGE_STORE_DIR
+from app.database import get_db_context
+from app.repositories.images_repository import ImagesRepo, image_key
+
+# <sha256>.<ext> is an original, <sha256>_w<width>.<ext> one of its variants
+STORED_FILE = re.compile(r'^(?P<digest>[0-9a-f]{64})(?P<variant>_w\d+)?\.\w+$')
+BATCH_SIZE = 1000
+
+def scan_store(directory: str) -> Tuple[Dict[str, List[str]], List[str]]:
+    """Agrupa os arquivos do store por conteúdo ({digest: [original, variantes...]}) e lista os .part"""
+    groups, partials = {}, []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            if name.endswith('.part'):
+                partials.append(path)
+                continue
+            match = STORED_FILE.match(name)
+            if match:
+                groups.setdefault(match['digest'], []).append(path)
+    return groups, partials
+
+def _is_original(path: str) -> bool:
+    return STORED_FILE.match(os.path.basename(path))['variant'] is None
+
+def _newest_mtime(paths: Iterable[str]) -> float:
+    mtimes = []
+    for path in paths:
+        try:
+            mtimes.append(os.stat(path).st_mtime)
+        except FileNotFoundError:
+            pass
+    return max(mtimes, default=0.0)
+
+async def gc_images(
+    db: AsyncIOMotorDatabase,
+    directory: str = IMAGE_STORE_DIR,
+    grace_seconds: float = 24 * 3600,
+    protected: Iterable[str] = (),
+    dry_run: bool = False,
+) -> dict:
+    """Devolve quantas imagens foram mantidas, quais arquivos foram apagados e quantos bytes foram liberados"""
+    repo = ImagesRepo(db)
+    cutoff = time.time() - grace_seconds
+    groups, partials = scan_store(directory)
+
+    originals = [path for files in groups.values() for path in files if _is_original(path)]
+    referenced = {image_key(path) for path in protected}
+    for start in range(0, len(originals), BATCH_SIZE):
+        referenced |= await repo.referenced(originals[start:start + BATCH_SIZE])
+
+    report = {'kept': 0, 'deleted': [], 'bytes': 0}
+    forgotten = []
+    for files in groups.values():
+        group_originals = [path for path in files if _is_original(path)]
+        # stat again right before deleting: a new upload of the same content refreshes the mtime
+        if any(path in referenced for path in group_originals) or _newest_mtime(files) > cutoff:
+            report['kept'] += 1
+            continue
+        for path in files:
+            report['bytes'] += os.path.getsize(path)
+            report['deleted'].append(path)
+            if not dry_run:
+                os.remove(path)
+        forgotten.extend(group_originals)
+
+    # copies of uploads that were interrupted before the final rename
+    for path in partials:
+        if _newest_mtime([path]) <= cutoff:
+            report['bytes'] += os.path.getsize(path)
+            report['deleted'].append(path)
+            if not dry_run:
+                os.remove(path)
+
+    if not dry_run:
+        await repo.forget(forgotten)
+    return report
+
+def profile_photos() -> List[str]:
+    # photos uploaded while mongoDB was down have no counter, the SQL users are the source of truth for them
+    with get_db_context() as db:
+        rows = db.query(models_sql.User.user_photo_url).filter(models_sql.User.user_photo_url.isnot(None)).all()
+    return [row.user_photo_url for row in rows]
+
+async def main(grace_hours: float, dry_run: bool):
+    client = AsyncIOMotorClient(settings.MONGO_URI)
+    try:
+        report = await gc_images(
+            client[settings.MONGO_DB_NAME],
+            grace_seconds=grace_hours * 3600,
+            protected=profile_photos(),
+            dry_run=dry_run,
+        )
+    finally:
+        client.close()
+
+    action = 'seriam apagados' if dry_run else 'apagados'
+    print(f"{len(report['deleted'])} arquivos {action} ({report['bytes']} bytes), {report['kept']} imagens mantidas")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grace-hours", type=float, default=24)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.grace_hours, args.dry_run))
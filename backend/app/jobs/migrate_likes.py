@@ -0,0 +1,91 @@
+"""
+Move as curtidas guardadas no array liked_by dos posts e comentários para a collection Likes.
+Pode ser executado de novo sem duplicar curtidas; o contador 'likes' é recalculado a partir do array.
+
+Uso (a partir de backend/):
+    python -m app.jobs.migrate_likes [--batch-size 500]
+"""
+import argparse
+import asyncio
+from datetime import datetime, timezone
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.core.mongo import settings
+from app.core.mongo_indexes import managed_indexes, reconcile_indexes
+from app.repositories.likes_repository import TARGET_COLLECTIONS
+
+DUPLICATE_KEY_ERROR = 11000
+
+def _as_object_id(user_id):
+    return user_id if isinstance(user_id, ObjectId) else ObjectId(str(user_id))
+
+async def _insert_likes(db: AsyncIOMotorDatabase, likes: list) -> int:
+    if not likes:
+        return 0
+    try:
+        result = await db['Likes'].insert_many(likes, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        # likes already migrated by a previous run
+        if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+            raise
+        return e.details['nInserted']
+
+async def migrate_likes(db: AsyncIOMotorDatabase, batch_size: int = 500) -> dict:
+    """Devolve, por tipo de alvo, quantos documentos foram migrados e quantas curtidas foram criadas"""
+    report = {}
+
+    for target_type, collection_name in TARGET_COLLECTIONS.items():
+        collection = db[collection_name]
+        migrated, inserted = 0, 0
+
+        while True:
+            # migrated documents lose liked_by, so every batch starts from the filter again
+            batch = await collection.find(
+                {'liked_by': {'$exists': True}}, {'liked_by': 1}
+            ).limit(batch_size).to_list(length=batch_size)
+            if not batch:
+                break
+
+            now = datetime.now(timezone.utc)
+            likes, updates = [], []
+            for doc in batch:
+                user_ids = {_as_object_id(user_id) for user_id in doc.get('liked_by') or []}
+                likes.extend(
+                    {'target_type': target_type, 'target_id': doc['_id'], 'user_id': user_id, 'created_at': now}
+                    for user_id in user_ids
+                )
+                updates.append(UpdateOne(
+                    {'_id': doc['_id']},
+                    {'$set': {'likes': len(user_ids)}, '$unset': {'liked_by': ''}}
+                ))
+
+            # likes first, so an interrupted run leaves liked_by in place to be retried
+            inserted += await _insert_likes(db, likes)
+            await collection.bulk_write(updates, ordered=False)
+            migrated += len(batch)
+
+        report[target_type] = {'migrated': migrated, 'likes_inserted': inserted}
+
+    return report
+
+async def main(batch_size: int):
+    client = AsyncIOMotorClient(settings.MONGO_URI)
+    try:
+        db = client[settings.MONGO_DB_NAME]
+        # the unique index is what keeps the migration idempotent
+        await reconcile_indexes(db, {'Likes': managed_indexes()['Likes']})
+        report = await migrate_likes(db, batch_size=batch_size)
+    finally:
+        client.close()
+
+    for target_type, counts in report.items():
+        print(f"{target_type}: {counts['migrated']} documentos migrados, {counts['likes_inserted']} curtidas criadas")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
@@ -12,13 +12,15 @@ class PostCreate(BaseModel):
 class AuthorInfo(BaseModel):
     name: str
     user_photo_url: Optional[str] = None
+    user_photo_variants: Optional[Dict[str, str]] = None  # {largura: caminho} das versões menores da foto
 
 class PostDB(PostCreate):
     id: str = Field(alias='_id')
+    image_variants: List[Dict[str, str]] = []  # {largura: caminho} de cada imagem, na ordem de images
     likes: int = 0
-    liked_by: List[str] = []
+    liked_by_me: bool = False  # se o usuário autenticado curtiu, vem da coleção Likes
     created_at: datetime
-    author: Optional[AuthorInfo] = None  # Informações do autor populadas pelo lookup
+    author: Optional[AuthorInfo] = None  # Informações do autor, resolvidas pelo AuthorLoader
     
     class Config:
         populate_by_name = True
@@ -31,5 +33,6 @@ class CommentCreate(BaseModel):
 class CommentDB(CommentCreate):
     id: str = Field(alias="_id")
     likes: int = 0
-    liked_by: List[str] = []
-    created_at: datetime
\ No newline at end of file
+    liked_by_me: bool = False
+    created_at: datetime
+    author: Optional[AuthorInfo] = None
\ No newline at end of file
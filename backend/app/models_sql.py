@@ -1,5 +1,5 @@
 from .database import base
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -21,8 +21,11 @@ class Artist(base):
     __tablename__ = 'artist'
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    nome = Column(String)
+    nome = Column(String, unique=True, index=True)
     music_genre = Column(String)
+    spotify_id = Column(String, nullable=True, index=True)
+    # last time the albums were fetched from Spotify, also set when the artist has none
+    albums_fetched_at = Column(DateTime, nullable=True)
     albums = relationship("Album", back_populates="criador")
     
 class Album(base):
@@ -36,6 +39,8 @@ class Album(base):
     release_date = Column(DateTime)
     album_cover_url = Column(String)
     total_tracks = Column(Integer)
+    # set on the albums imported from Spotify, the ones created through /album have none
+    spotify_id = Column(String, nullable=True, index=True)
     
     criador = relationship("Artist", back_populates="albums")
 
@@ -53,6 +58,12 @@ class FriendRequest(base):
     sender = relationship("User", foreign_keys=[sender_id])
     receiver = relationship("User", foreign_keys=[receiver_id])
 
+    # pending requests received / sent by a user (get_friend_requests, get_sent_friend_requests)
+    __table_args__ = (
+        Index("ix_friend_requests_receiver_id_status", "receiver_id", "status"),
+        Index("ix_friend_requests_sender_id_status", "sender_id", "status"),
+    )
+
 
 class Friendship(base):
     __tablename__ = "friendship"
@@ -64,7 +75,9 @@ class Friendship(base):
     created_at = Column(DateTime, default=datetime.now)
 
     __table_args__ = (
+        # also the index of the user1_id side of get_friend_ids, this one is the user2_id side
         UniqueConstraint("user1_id", "user2_id", name="unique_friendship"),
+        Index("ix_friendship_user2_id_user1_id", "user2_id", "user1_id"),
     )
 
 class Notification(base):
@@ -81,6 +94,11 @@ class Notification(base):
 
     user = relationship("User", foreign_keys=[user_id])
 
+    # notifications of a user, newest first (get_user_notifications)
+    __table_args__ = (
+        Index("ix_notifications_user_id_created_at", "user_id", "created_at"),
+    )
+
 
 class FriendRequestHistory(base):
     __tablename__ = "friend_request_history"
@@ -94,4 +112,10 @@ class FriendRequestHistory(base):
 
     user1 = relationship("User", foreign_keys=[user1_id])
     user2 = relationship("User", foreign_keys=[user2_id])
-    initiator = relationship("User", foreign_keys=[initiated_by])
\ No newline at end of file
+    initiator = relationship("User", foreign_keys=[initiated_by])
+
+    # history of a user on either side of the pair, newest first (get_friend_request_history)
+    __table_args__ = (
+        Index("ix_friend_request_history_user1_id_created_at", "user1_id", "created_at"),
+        Index("ix_friend_request_history_user2_id_created_at", "user2_id", "created_at"),
+    )
@@ -1,36 +1,76 @@
+import os
 from fastapi import Depends, HTTPException, status
 from . import schemas, database
 from .JWT_token import SECRET_KEY, ALGORITHM
+from .core.cache import TTLCache
 from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+# same scheme for public routes that only personalize the response when there is a token
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(database.get_db)):
+# authenticated users keyed by the token subject (email), so steady-state requests skip the SQL lookup.
+# Entries are invalidated when the user changes and expire after the TTL in any case.
+CURRENT_USER_CACHE_TTL = int(os.getenv("CURRENT_USER_CACHE_TTL", "60"))
+CURRENT_USER_CACHE_SIZE = int(os.getenv("CURRENT_USER_CACHE_SIZE", "1024"))
+current_user_cache = TTLCache(maxsize=CURRENT_USER_CACHE_SIZE, ttl=CURRENT_USER_CACHE_TTL)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)):
     from . import database, models_sql
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Não foi possível validar as credenciais",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
     token_data = verify_token(token, credentials_exception)
-    
-    # Buscar usuário no banco usando a sessão injetada
-    user = db.query(models_sql.User).filter(models_sql.User.email == token_data.email).first()
+
+    user = current_user_cache.get(token_data.email)
     if user is None:
-        raise credentials_exception
+        # Buscar usuário no banco usando a sessão injetada (assíncrona, não bloqueia o event loop)
+        result = await db.execute(select(models_sql.User).where(models_sql.User.email == token_data.email))
+        db_user = result.scalars().first()
+        if db_user is None:
+            raise credentials_exception
+        user = schemas.CurrentUser.model_validate(db_user, from_attributes=True)
+        current_user_cache.set(token_data.email, user)
+
+    # only trust the mongo id claim if the token was issued for this very user
+    if token_data.mongo_id and token_data.user_id == user.id and user.mongo_id != token_data.mongo_id:
+        user = user.model_copy(update={'mongo_id': token_data.mongo_id})
+        current_user_cache.set(token_data.email, user)
     return user
 
-    
+async def get_optional_current_user(token: str = Depends(optional_oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)):
+    """Usuário autenticado, ou None para requisições anônimas ou com token inválido"""
+    if not token:
+        return None
+    try:
+        return await get_current_user(token, db)
+    except HTTPException:
+        return None
+
+def invalidate_current_user(user_id: int):
+    """Remove o usuário do cache de get_current_user, deve ser chamado sempre que o usuário muda"""
+    current_user_cache.discard_where(lambda email, user: user.id == user_id)
+
+
 def verify_token(token: str, credentials_exception):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = schemas.TokenData(email=email)
+        token_data = schemas.TokenData(
+            email=email,
+            user_id=payload.get("uid"),
+            mongo_id=payload.get("mid"),
+            version=payload.get("ver", 1)
+        )
     except JWTError:
         raise credentials_exception
-    return token_data
\ No newline at end of file
+    return token_data
@@ -7,9 +7,12 @@ from ..database import get_db
 from typing import List
 
 def create_artist(request:schemas.Artist, db:Session=Depends(get_db)):
+    if db.query(models_sql.Artist).filter(models_sql.Artist.nome == request.nome).first():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Artista já existe")
     new_artist=models_sql.Artist(
         nome = request.nome,
-        music_genre=request.music_genre
+        music_genre=request.music_genre,
+        spotify_id=request.spotify_id
     )
     db.add(new_artist)
     db.commit()
@@ -0,0 +1,105 @@
+import asyncio
+import os
+from fastapi import Depends
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from bson.errors import InvalidId
+from app.core.cache import TTLCache
+from app.core.mongo import get_mongo_db_with_check
+from typing import Dict, List, Optional
+
+# public data of the authors keyed by the Users_cache ObjectId, shared by every request of the process
+AUTHOR_CACHE_TTL = int(os.getenv("AUTHOR_CACHE_TTL", "60"))
+AUTHOR_CACHE_SIZE = int(os.getenv("AUTHOR_CACHE_SIZE", "10000"))
+authors_cache = TTLCache(maxsize=AUTHOR_CACHE_SIZE, ttl=AUTHOR_CACHE_TTL)
+
+DEFAULT_AUTHOR = {'name': 'Usuário', 'user_photo_url': None}
+
+class AuthorLoader:
+    """
+    Resolve os autores de posts, comentários etc. em lote: os author_id pedidos no mesmo
+    ciclo do event loop viram uma única consulta $in em Users_cache. Uma instância por requisição.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        # authors already resolved in this request, None for the ones that do not exist
+        self._authors: Dict[str, Optional[dict]] = {}
+        self._pending: set = set()
+        self._batch: Optional[asyncio.Task] = None
+        # batch already resolving each author, a later load() of the same id waits for it
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    async def load(self, author_id: str) -> Optional[dict]:
+        """Autor ({'name', 'user_photo_url'}) ou None se não está em Users_cache"""
+        if author_id not in self._authors:
+            batch = self._in_flight.get(author_id)
+            if batch is None:
+                self._pending.add(author_id)
+                if self._batch is None:
+                    # the task only starts on the next loop iteration, after every load() of this one was queued
+                    self._batch = asyncio.ensure_future(self._dispatch())
+                batch = self._in_flight[author_id] = self._batch
+            await asyncio.shield(batch)
+        return self._authors[author_id]
+
+    async def load_many(self, author_ids: List[str]) -> Dict[str, Optional[dict]]:
+        author_ids = list(dict.fromkeys(author_ids))
+        authors = await asyncio.gather(*[self.load(author_id) for author_id in author_ids])
+        return dict(zip(author_ids, authors))
+
+    async def attach(self, items: List[dict], id_field: str = 'author_id', field: str = 'author'):
+        """Preenche item[field] de cada item com o autor de item[id_field]"""
+        authors = await self.load_many([item[id_field] for item in items])
+        for item in items:
+            item[field] = authors[item[id_field]] or DEFAULT_AUTHOR
+
+    async def _dispatch(self):
+        author_ids, self._pending, self._batch = self._pending, set(), None
+        try:
+            await self._resolve(author_ids)
+        finally:
+            for author_id in author_ids:
+                self._in_flight.pop(author_id, None)
+
+    async def _resolve(self, author_ids: set):
+        misses = []
+        for author_id in author_ids:
+            cached = authors_cache.get(author_id)
+            if cached is not None:
+                self._authors[author_id] = cached['author']
+            else:
+                misses.append(author_id)
+        if not misses:
+            return
+
+        object_ids = []
+        for author_id in misses:
+            try:
+                object_ids.append(ObjectId(author_id))
+            except (InvalidId, TypeError):
+                self._authors[author_id] = None
+        if not object_ids:
+            return
+
+        users = self.db['Users_cache'].find(
+            {'_id': {'$in': object_ids}},
+            {'sql_user_id': 1, 'name': 1, 'user_photo_url': 1, 'user_photo_variants': 1},
+        )
+        for user in await users.to_list(length=len(object_ids)):
+            author = {'name': user.get('name', DEFAULT_AUTHOR['name']), 'user_photo_url': user.get('user_photo_url')}
+            if user.get('user_photo_variants'):
+                author['user_photo_variants'] = user['user_photo_variants']
+            # sql_user_id is kept to invalidate the entry when the user changes
+            authors_cache.set(str(user['_id']), {'sql_user_id': user.get('sql_user_id'), 'author': author})
+            self._authors[str(user['_id'])] = author
+        # only now the ones that were not found, before the query they would read as missing
+        for author_id in misses:
+            self._authors.setdefault(author_id, None)
+
+def get_author_loader(db = Depends(get_mongo_db_with_check)) -> AuthorLoader:
+    """Dependency: o mesmo loader para tudo que renderiza autores numa requisição"""
+    return AuthorLoader(db)
+
+def invalidate_author(sql_user_id: int):
+    authors_cache.discard_where(lambda _, value: value['sql_user_id'] == sql_user_id)
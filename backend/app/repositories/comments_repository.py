@@ -2,12 +2,17 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from datetime import datetime, timezone
 from app.models.mongo_posts import CommentCreate
-from app.repositories.posts_repository import PostsRepo
+from app.repositories.posts_repository import PostsRepo, LEGACY_FIELDS
+from app.repositories.likes_repository import LikesRepo
+from app.repositories.author_loader import AuthorLoader
+from app.core.pagination import SORT_KEYS, keyset_filter
+from typing import Optional
 
 class CommentsRepo:
 
-    def __init__(self, db: AsyncIOMotorDatabase):
+    def __init__(self, db: AsyncIOMotorDatabase, authors: Optional[AuthorLoader] = None):
         self.db = db
+        self.authors = authors or AuthorLoader(db)
 
     async def create_comment(self, comment: CommentCreate):
         post_repo = PostsRepo(self.db)
@@ -18,14 +23,13 @@ class CommentsRepo:
             'author_id': ObjectId(comment.author_id),
             'content': comment.content,
             'likes': 0,
-            'liked_by': [],
             'created_at': datetime.now(timezone.utc),
         }
         result = await self.db['Comments'].insert_one(comment_data)
         return str(result.inserted_id)
 
     async def get_comment_by_id(self, comment_id: str):
-        comment = await self.db['Comments'].find_one({'_id': ObjectId(comment_id)})
+        comment = await self.db['Comments'].find_one({'_id': ObjectId(comment_id)}, LEGACY_FIELDS)
         if not comment:
             raise CommentNotFoundError(comment_id)
         else:
@@ -35,26 +39,19 @@ class CommentsRepo:
         return comment
     
     async def like_comment(self, comment_id: str, user_id: str):
-        result = await self.db['Comments'].update_one(
-            {'_id': ObjectId(comment_id)},
-            {'$addToSet': {'liked_by': ObjectId(user_id)}, '$inc': {'likes': 1}}
-        )
-
-        if result.modified_count < 1:
+        if not await LikesRepo(self.db).like('comment', comment_id, user_id):
             raise CommentNotFoundError(comment_id)
 
-    # return the comments from a post with pagination using the post id
-    async def get_post_comments(self, post_id: str, pagination: int = 20):
-        comments = self.db['Comments'].find({'post_id': ObjectId(post_id)}).sort('created_at', -1)
+    # return the comments from a post with pagination using the post id and an optional cursor
+    async def get_post_comments(self, post_id: str, pagination: int = 20, cursor: Optional[str] = None):
+        query = {'post_id': ObjectId(post_id), **keyset_filter(cursor)}
+        comments = self.db['Comments'].find(query, LEGACY_FIELDS, limit=pagination).sort(SORT_KEYS)
         comments = await comments.to_list(length=pagination)
         for comment in comments:
             comment['_id'] = str(comment['_id'])
             comment['post_id'] = str(comment['post_id'])
             comment['author_id'] = str(comment['author_id'])
-            users = []
-            for user in comment['liked_by']:
-                users.append(str(user))
-            comment['liked_by'] = users
+        await self.authors.attach(comments)
         return comments
     
     async def delete_comment(self, comment_id: str):
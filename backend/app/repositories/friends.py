@@ -1,10 +1,14 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from .. import models_sql, schemas
-from ..database import get_db
-from fastapi import Depends, status, HTTPException
+from fastapi import status, HTTPException
 from typing import List
+from ..core.mongo import get_mongo_db, is_mongo_connected
+from .timeline_repository import TimelineRepo
 
-def _log_friend_request_history(user1_id: int, user2_id: int, action: str, initiated_by: int, db: Session):
+# all the queries run on the async session, the friends routes never block the event loop
+
+async def _log_friend_request_history(user1_id: int, user2_id: int, action: str, initiated_by: int, db: AsyncSession):
     """Helper function to log friend request history"""
     # Ensure consistent ordering for user1_id and user2_id (smaller id first)
     if user1_id > user2_id:
@@ -18,15 +22,15 @@ def _log_friend_request_history(user1_id: int, user2_id: int, action: str, initi
     )
     
     db.add(history_entry)
-    db.commit()
-    db.refresh(history_entry)
+    await db.commit()
+    await db.refresh(history_entry)
     return history_entry
 
-def send_friend_request(sender_id: int, receiver_id: int, db: Session = Depends(get_db)):
+async def send_friend_request(sender_id: int, receiver_id: int, db: AsyncSession):
     #Envia uma solicitação de amizade
     #verificar se os usuários existem
-    sender = db.query(models_sql.User).filter(models_sql.User.id == sender_id).first()
-    receiver = db.query(models_sql.User).filter(models_sql.User.id == receiver_id).first()
+    sender = await db.get(models_sql.User, sender_id)
+    receiver = await db.get(models_sql.User, receiver_id)
     
     if not sender or not receiver:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuário não encontrado")
@@ -36,24 +40,24 @@ def send_friend_request(sender_id: int, receiver_id: int, db: Session = Depends(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Você não pode enviar solicitação para si mesmo")
     
     #verificar se já existe uma solicitação pendente
-    existing_pending_request = db.query(models_sql.FriendRequest).filter(
+    existing_pending_request = (await db.execute(select(models_sql.FriendRequest).where(
         ((models_sql.FriendRequest.sender_id == sender_id) & 
          (models_sql.FriendRequest.receiver_id == receiver_id) |
          (models_sql.FriendRequest.sender_id == receiver_id) & 
          (models_sql.FriendRequest.receiver_id == sender_id)) &
         (models_sql.FriendRequest.status == "Pending")
-    ).first()
+    ))).scalars().first()
     
     if existing_pending_request:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Solicitação pendente já existe")
     
     #verificar se já são amigos
-    existing_friendship = db.query(models_sql.Friendship).filter(
+    existing_friendship = (await db.execute(select(models_sql.Friendship).where(
         (models_sql.Friendship.user1_id == sender_id) & 
         (models_sql.Friendship.user2_id == receiver_id) |
         (models_sql.Friendship.user1_id == receiver_id) & 
         (models_sql.Friendship.user2_id == sender_id)
-    ).first()
+    ))).scalars().first()
     
     if existing_friendship:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Vocês já são amigos")
@@ -66,11 +70,11 @@ def send_friend_request(sender_id: int, receiver_id: int, db: Session = Depends(
     )
     
     db.add(new_request)
-    db.commit()
-    db.refresh(new_request)
+    await db.commit()
+    await db.refresh(new_request)
     
     # Log friend request history
-    _log_friend_request_history(sender_id, receiver_id, "sent", sender_id, db)
+    await _log_friend_request_history(sender_id, receiver_id, "sent", sender_id, db)
     
     #criar notificação para o receptor
     notification = models_sql.Notification(
@@ -81,32 +85,32 @@ def send_friend_request(sender_id: int, receiver_id: int, db: Session = Depends(
     )
     
     db.add(notification)
-    db.commit()
+    await db.commit()
     
     return new_request
 
-def respond_to_friend_request(request_id: int, response: str, user_id: int, db: Session = Depends(get_db)):
+async def respond_to_friend_request(request_id: int, response: str, user_id: int, db: AsyncSession):
     #Responde a uma solicitação de amizade (aceitar ou recusar)
     if response not in ["Accepted", "Denied"]:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Resposta deve ser 'Accepted' ou 'Denied'")
     
     #buscar a solicitação
-    friend_request = db.query(models_sql.FriendRequest).filter(
+    friend_request = (await db.execute(select(models_sql.FriendRequest).where(
         models_sql.FriendRequest.id == request_id,
         models_sql.FriendRequest.receiver_id == user_id,
         models_sql.FriendRequest.status == "Pending"
-    ).first()
+    ))).scalars().first()
     
     if not friend_request:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Solicitação não encontrada ou já respondida")
     
     #atualizar status da solicitação
     friend_request.status = response
-    db.commit()
+    await db.commit()
     
     # Log friend request history
     action = "accepted" if response == "Accepted" else "denied"
-    _log_friend_request_history(friend_request.sender_id, friend_request.receiver_id, action, user_id, db)
+    await _log_friend_request_history(friend_request.sender_id, friend_request.receiver_id, action, user_id, db)
     
     #se aceita, criar amizade
     if response == "Accepted":
@@ -120,12 +124,14 @@ def respond_to_friend_request(request_id: int, response: str, user_id: int, db:
         )
         
         db.add(new_friendship)
-        db.commit()
-        db.refresh(new_friendship)
+        await db.commit()
+        await db.refresh(new_friendship)
+        # the posts published before the friendship show up in the feed too
+        if is_mongo_connected():
+            await TimelineRepo(get_mongo_db()).on_friendship_created(user1_id, user2_id)
         
         #criar notificação para o remetente
-        sender = db.query(models_sql.User).filter(models_sql.User.id == friend_request.sender_id).first()
-        receiver = db.query(models_sql.User).filter(models_sql.User.id == friend_request.receiver_id).first()
+        receiver = await db.get(models_sql.User, friend_request.receiver_id)
         
         notification = models_sql.Notification(
             user_id=friend_request.sender_id,
@@ -135,109 +141,111 @@ def respond_to_friend_request(request_id: int, response: str, user_id: int, db:
         )
         
         db.add(notification)
-        db.commit()
+        await db.commit()
         
         return new_friendship
     
     return friend_request
 
-def get_friend_requests(user_id: int, db: Session = Depends(get_db)):
+async def get_friend_requests(user_id: int, db: AsyncSession):
     #busca solicitações de amizade recebidas pendentes
-    requests = db.query(models_sql.FriendRequest).filter(
+    requests = (await db.execute(select(models_sql.FriendRequest).where(
         models_sql.FriendRequest.receiver_id == user_id,
         models_sql.FriendRequest.status == "Pending"
-    ).all()
+    ))).scalars().all()
     
     return requests
 
-def get_sent_friend_requests(user_id: int, db: Session = Depends(get_db)):
+async def get_sent_friend_requests(user_id: int, db: AsyncSession):
     #busca solicitações de amizade enviadas pendentes
-    requests = db.query(models_sql.FriendRequest).filter(
+    requests = (await db.execute(select(models_sql.FriendRequest).where(
         models_sql.FriendRequest.sender_id == user_id,
         models_sql.FriendRequest.status == "Pending"
-    ).all()
+    ))).scalars().all()
     
     return requests
 
-def get_friends(user_id: int, db: Session = Depends(get_db)):
+async def get_friends(user_id: int, db: AsyncSession):
     #busca lista de amigos do usuário
-    friendships = db.query(models_sql.Friendship).filter(
-        (models_sql.Friendship.user1_id == user_id) | 
-        (models_sql.Friendship.user2_id == user_id)
-    ).all()
-    
-    friend_ids = []
-    for friendship in friendships:
-        if friendship.user1_id == user_id:
-            friend_ids.append(friendship.user2_id)
-        else:
-            friend_ids.append(friendship.user1_id)
+    friend_ids = await get_friend_ids(user_id, db)
     
     #buscar informações dos amigos
-    friends = db.query(models_sql.User).filter(models_sql.User.id.in_(friend_ids)).all()
+    friends = (await db.execute(select(models_sql.User).where(models_sql.User.id.in_(friend_ids)))).scalars().all()
     
     return friends
 
-def remove_friend(user_id: int, friend_id: int, db: Session = Depends(get_db)):
+async def get_friend_ids(user_id: int, db: AsyncSession) -> List[int]:
+    #busca apenas os ids dos amigos, sem carregar os usuários
+    friendships = (await db.execute(select(models_sql.Friendship.user1_id, models_sql.Friendship.user2_id).where(
+        (models_sql.Friendship.user1_id == user_id) | 
+        (models_sql.Friendship.user2_id == user_id)
+    ))).all()
+    
+    return [user2_id if user1_id == user_id else user1_id for user1_id, user2_id in friendships]
+
+async def remove_friend(user_id: int, friend_id: int, db: AsyncSession):
     #remove amizade entre dois usuários
     #garantir que user1_id seja sempre menor que user2_id
     user1_id = min(user_id, friend_id)
     user2_id = max(user_id, friend_id)
     
-    friendship = db.query(models_sql.Friendship).filter(
+    friendship = (await db.execute(select(models_sql.Friendship).where(
         models_sql.Friendship.user1_id == user1_id,
         models_sql.Friendship.user2_id == user2_id
-    ).first()
+    ))).scalars().first()
     
     if not friendship:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Amizade não encontrada")
     
     # Log friend request history before removing friendship
-    _log_friend_request_history(user_id, friend_id, "friendship_removed", user_id, db)
+    await _log_friend_request_history(user_id, friend_id, "friendship_removed", user_id, db)
     
-    db.delete(friendship)
-    db.commit()
+    await db.delete(friendship)
+    await db.commit()
+    # the ex-friend's posts leave the feed of each of them
+    if is_mongo_connected():
+        await TimelineRepo(get_mongo_db()).on_friendship_removed(user_id, friend_id)
     
     return {"message": "Amizade removida com sucesso"}
 
-def get_user_notifications(user_id: int, db: Session = Depends(get_db)):
+async def get_user_notifications(user_id: int, db: AsyncSession):
     #busca notificações do usuário
-    notifications = db.query(models_sql.Notification).filter(
+    notifications = (await db.execute(select(models_sql.Notification).where(
         models_sql.Notification.user_id == user_id
-    ).order_by(models_sql.Notification.created_at.desc()).all()
+    ).order_by(models_sql.Notification.created_at.desc()))).scalars().all()
     
     return notifications
 
-def mark_notification_as_read(notification_id: int, user_id: int, db: Session = Depends(get_db)):
+async def mark_notification_as_read(notification_id: int, user_id: int, db: AsyncSession):
     #marca notificação como lida
-    notification = db.query(models_sql.Notification).filter(
+    notification = (await db.execute(select(models_sql.Notification).where(
         models_sql.Notification.id == notification_id,
         models_sql.Notification.user_id == user_id
-    ).first()
+    ))).scalars().first()
     
     if not notification:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Notificação não encontrada")
     
     notification.read = True
-    db.commit()
+    await db.commit()
     
     return notification
 
-def search_users(query: str, current_user_id: int, db: Session = Depends(get_db)):
+async def search_users(query: str, current_user_id: int, db: AsyncSession):
     #busca usuários por nome de usuário ou nome
-    users = db.query(models_sql.User).filter(
+    users = (await db.execute(select(models_sql.User).where(
         (models_sql.User.username.ilike(f"%{query}%") | 
          models_sql.User.nome.ilike(f"%{query}%")) &
         (models_sql.User.id != current_user_id)
-    ).all()
+    ))).scalars().all()
     
     return users
 
-def get_friend_request_history(user_id: int, db: Session = Depends(get_db)):
+async def get_friend_request_history(user_id: int, db: AsyncSession):
     """Get all friend request history for a user"""
-    history = db.query(models_sql.FriendRequestHistory).filter(
+    history = (await db.execute(select(models_sql.FriendRequestHistory).where(
         (models_sql.FriendRequestHistory.user1_id == user_id) |
         (models_sql.FriendRequestHistory.user2_id == user_id)
-    ).order_by(models_sql.FriendRequestHistory.created_at.desc()).all()
+    ).order_by(models_sql.FriendRequestHistory.created_at.desc()))).scalars().all()
     
     return history
\ No newline at end of file
@@ -0,0 +1,72 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from typing import List, Optional
+from app.core.uploads import IMAGE_STORE_DIR
+
+# profile picture urls are served under /backend/images, the store keys are the paths on disk
+URL_PREFIX = 'backend/'
+
+def image_key(path: str) -> str:
+    return path[len(URL_PREFIX):] if path.startswith(URL_PREFIX) else path
+
+class ImagesRepo:
+    """
+    Contador de referências das imagens do store em 'Images' (_id = caminho do arquivo).
+    Cada post que usa a imagem e cada foto de perfil conta uma referência; o arquivo só é
+    apagado pelo job gc_images quando o contador chega a zero.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+
+    async def _inc(self, paths: List[str], amount: int):
+        # images saved before the store (images/posts, images/pfp) are not counted
+        paths = [image_key(path) for path in paths if image_key(path).startswith(IMAGE_STORE_DIR + '/')]
+        if not paths:
+            return
+        now = datetime.now(timezone.utc)
+        if amount > 0:
+            # one update per reference, a post with the same image twice holds two
+            requests = [
+                UpdateOne(
+                    {'_id': path},
+                    {'$inc': {'refs': amount}, '$set': {'updated_at': now}, '$setOnInsert': {'created_at': now}},
+                    upsert=True,
+                )
+                for path in paths
+            ]
+        else:
+            # never below zero and never a new counter: a reference that was not counted (e.g. a photo
+            # uploaded while mongoDB was down) would make the next acquire land on 0 and free a live file
+            requests = [
+                UpdateOne({'_id': path, 'refs': {'$gt': 0}}, {'$inc': {'refs': amount}, '$set': {'updated_at': now}})
+                for path in paths
+            ]
+        await self.db['Images'].bulk_write(requests, ordered=False)
+
+    async def acquire(self, paths: List[str]):
+        await self._inc(paths, 1)
+
+    async def release(self, paths: List[str]):
+        await self._inc(paths, -1)
+
+    async def replace(self, old_path: Optional[str], new_path: str):
+        """Troca uma referência (ex.: nova foto de perfil); nada muda se o conteúdo é o mesmo"""
+        if old_path and image_key(old_path) == image_key(new_path):
+            return
+        await self.acquire([new_path])
+        if old_path:
+            await self.release([old_path])
+
+    async def referenced(self, paths: List[str]) -> set:
+        """Caminhos (dentre paths) que ainda têm alguma referência"""
+        if not paths:
+            return set()
+        images = self.db['Images'].find({'_id': {'$in': paths}, 'refs': {'$gt': 0}}, {'_id': 1})
+        return {image['_id'] for image in await images.to_list(length=len(paths))}
+
+    async def forget(self, paths: List[str]):
+        # only counters that are still zero, an upload may have referenced the file again meanwhile
+        if paths:
+            await self.db['Images'].delete_many({'_id': {'$in': paths}, 'refs': 0})
@@ -0,0 +1,97 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from typing import List, Optional, Set
+
+# collection that holds the likes counter of each kind of target
+TARGET_COLLECTIONS = {
+    'post': 'Posts',
+    'comment': 'Comments',
+}
+
+class LikesRepo:
+    """
+    Um documento por curtida em 'Likes' (único por target_id + user_id). Posts e comentários
+    guardam só o contador 'likes', então o tamanho deles não cresce com o número de curtidas.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+
+    async def _insert(self, target_type: str, target_id: ObjectId, user_id: ObjectId) -> bool:
+        # the unique index decides who liked first, False if the like already exists
+        try:
+            await self.db['Likes'].insert_one({
+                'target_type': target_type,
+                'target_id': target_id,
+                'user_id': user_id,
+                'created_at': datetime.now(timezone.utc),
+            })
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def like(self, target_type: str, target_id: str, user_id: str) -> bool:
+        """Curte o alvo (idempotente), devolve False se o alvo não existe"""
+        target_obj_id, user_obj_id = ObjectId(target_id), ObjectId(user_id)
+        if not await self._insert(target_type, target_obj_id, user_obj_id):
+            return True
+
+        result = await self.db[TARGET_COLLECTIONS[target_type]].update_one(
+            {'_id': target_obj_id}, {'$inc': {'likes': 1}}
+        )
+        if result.modified_count < 1:
+            await self.db['Likes'].delete_one({'target_id': target_obj_id, 'user_id': user_obj_id})
+            return False
+        return True
+
+    async def toggle(self, target_type: str, target_id: str, user_id: str) -> Optional[dict]:
+        """Curte ou descurte, devolve {'liked': bool, 'likes': int} ou None se o alvo não existe"""
+        target_obj_id, user_obj_id = ObjectId(target_id), ObjectId(user_id)
+        collection = self.db[TARGET_COLLECTIONS[target_type]]
+
+        liked = await self._insert(target_type, target_obj_id, user_obj_id)
+        if not liked:
+            result = await self.db['Likes'].delete_one({'target_id': target_obj_id, 'user_id': user_obj_id})
+            if result.deleted_count < 1:
+                # a concurrent toggle removed it first and already adjusted the counter
+                target = await collection.find_one({'_id': target_obj_id}, {'_id': 0, 'likes': 1})
+                return {'liked': False, 'likes': target.get('likes', 0)} if target else None
+
+        # every inserted or deleted like moves the counter exactly once, so it can not drift
+        target = await collection.find_one_and_update(
+            {'_id': target_obj_id},
+            {'$inc': {'likes': 1 if liked else -1}},
+            projection={'_id': 0, 'likes': 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if target is None:
+            if liked:
+                await self.db['Likes'].delete_one({'target_id': target_obj_id, 'user_id': user_obj_id})
+            return None
+        return {'liked': liked, 'likes': target['likes']}
+
+    async def liked_by_user(self, user_id: str, target_ids: List[str]) -> Set[str]:
+        """Quais dos alvos (ex.: os posts de uma página do feed) o usuário curtiu, numa única consulta"""
+        if not target_ids:
+            return set()
+        likes = self.db['Likes'].find(
+            {'target_id': {'$in': [ObjectId(target_id) for target_id in target_ids]}, 'user_id': ObjectId(user_id)},
+            {'_id': 0, 'target_id': 1},
+        )
+        return {str(like['target_id']) for like in await likes.to_list(length=len(target_ids))}
+
+    async def on_targets_deleted(self, target_ids: List[str]):
+        if not target_ids:
+            return 0
+        result = await self.db['Likes'].delete_many(
+            {'target_id': {'$in': [ObjectId(target_id) for target_id in target_ids]}}
+        )
+        return result.deleted_count
+
+    # removes the likes of a post and of its comments, must run before the comments are deleted
+    async def on_post_deleted(self, post_id: str):
+        comment_ids = await self.db['Comments'].distinct('_id', {'post_id': ObjectId(post_id)})
+        return await self.on_targets_deleted([post_id] + [str(comment_id) for comment_id in comment_ids])
@@ -1,14 +1,61 @@
+import logging
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from datetime import datetime, timezone
 from app.models.mongo_posts import PostCreate
+from app.core.pagination import SORT_KEYS, keyset_filter
+from app.repositories.timeline_repository import TimelineRepo
+from app.repositories.likes_repository import LikesRepo
+from app.repositories.images_repository import ImagesRepo
+from app.repositories.author_loader import AuthorLoader
+from typing import Dict, Optional, List, Set
+
+logger = logging.getLogger(__name__)
+
+# likes live in the Likes collection, old documents may still carry the embedded array
+LEGACY_FIELDS = {'liked_by': 0}
+
+# fields of a feed post, what ?fields= can select. '_id' and 'created_at' always come, the cursor needs them
+STORED_FIELDS = ['author_id', 'artist_id', 'content', 'images', 'image_variants', 'likes', 'created_at']
+POST_FIELDS = set(STORED_FIELDS) | {'author', 'liked_by_me'}
+
+def parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    """Converte ?fields=content,author,likes no conjunto de campos; None devolve o post inteiro"""
+    if fields is None:
+        return None
+    selected = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = selected - POST_FIELDS
+    if unknown:
+        raise InvalidFieldsError(unknown)
+    return selected | {'created_at'}
+
+def projection_stages(fields: Optional[Set[str]] = None) -> list:
+    """Estágio final dos pipelines do feed: o post sai do mongoDB já no formato da resposta, só com os campos pedidos"""
+    fields = POST_FIELDS if fields is None else fields
+    project = {'_id': {'$toString': '$_id'}}
+    for field in STORED_FIELDS:
+        # the author is resolved from author_id by the AuthorLoader
+        if field in fields or (field == 'author_id' and 'author' in fields):
+            project[field] = {'$toString': '$author_id'} if field == 'author_id' else 1
+    return [{'$project': project}]
 
 class PostsRepo:
 
-    def __init__(self, db: AsyncIOMotorDatabase):
+    def __init__(self, db: AsyncIOMotorDatabase, authors: Optional[AuthorLoader] = None):
         self.db = db
+        # routes pass the request's loader, so posts and comments share one batch of authors
+        self.authors = authors or AuthorLoader(db)
+
+    async def _with_authors(self, posts: list, fields: Optional[Set[str]]):
+        if fields is None or 'author' in fields:
+            await self.authors.attach(posts)
+            if fields is not None and 'author_id' not in fields:
+                for post in posts:
+                    del post['author_id']
+        return posts
 
-    async def create_post(self, post: PostCreate):
+    async def create_post(self, post: PostCreate, audience: Optional[List[int]] = None):
+        """Cria o post e, se a audiência (ids do SQL) for informada, entrega nos inboxes de timeline"""
         post_data = {
             'author_id': ObjectId(post.author_id),  # Converte string do MongoDB ObjectId para ObjectId
             'artist_id': post.artist_id,  # ID do Spotify (string)
@@ -16,14 +63,19 @@ class PostsRepo:
             'artist_id': post.artist_id,
             'images': post.images,
             'likes': 0,
-            'liked_by': [],
             'created_at': datetime.now(timezone.utc),
         }
         result = await self.db['Posts'].insert_one(post_data)
+        # the post holds a reference to each image of the content addressed store
+        await ImagesRepo(self.db).acquire(post.images)
+        if audience is not None:
+            await TimelineRepo(self.db).fan_out(
+                str(result.inserted_id), post.author_id, post_data['created_at'], audience
+            )
         return str(result.inserted_id)
 
     async def get_post_by_id(self, post_id: str):
-        post = await self.db['Posts'].find_one({'_id': ObjectId(post_id)})
+        post = await self.db['Posts'].find_one({'_id': ObjectId(post_id)}, LEGACY_FIELDS)
         if not post:
             raise PostNotFoundError(post_id)
         else:
@@ -31,162 +83,75 @@ class PostsRepo:
         return post
 
     async def like_post(self, post_id: str, user_id: str):
-        result = await self.db['Posts'].update_one(
-            {'_id': ObjectId(post_id)},
-            {'$addToSet': {'liked_by': ObjectId(user_id)}, '$inc': {'likes': 1}}
-        )
-
-        if result.modified_count < 1:
+        if not await LikesRepo(self.db).like('post', post_id, user_id):
             raise PostNotFoundError(post_id)
-    
+
     async def toggle_like_post(self, post_id: str, user_id: str):
         """
         Toggle like em um post: adiciona se não existir, remove se existir.
-        Retorna True se curtiu, False se descurtiu.
+        Retorna {'liked': bool, 'likes': int} com o estado depois da troca.
         """
-        # Primeiro, verificar se o post existe e se o usuário já curtiu
-        post = await self.db['Posts'].find_one({'_id': ObjectId(post_id)})
-        if not post:
+        result = await LikesRepo(self.db).toggle('post', post_id, user_id)
+        if result is None:
             raise PostNotFoundError(post_id)
-        
-        user_obj_id = ObjectId(user_id)
-        liked_by = post.get('liked_by', [])
-        
-        # Verificar se o usuário já curtiu
-        already_liked = user_obj_id in liked_by
-        
-        if already_liked:
-            # Remover like
-            result = await self.db['Posts'].update_one(
-                {'_id': ObjectId(post_id)},
-                {
-                    '$pull': {'liked_by': user_obj_id},
-                    '$inc': {'likes': -1}
-                }
-            )
-            return False  # Descurtiu
-        else:
-            # Adicionar like
-            result = await self.db['Posts'].update_one(
-                {'_id': ObjectId(post_id)},
-                {
-                    '$addToSet': {'liked_by': user_obj_id},
-                    '$inc': {'likes': 1}
-                }
-            )
-            return True  # Curtiu
+        return result
 
-    async def get_post_list(self, pagination: int = 20):
-        """Busca lista de posts com informações do autor"""
+    async def get_post_list(self, pagination: int = 20, cursor: Optional[str] = None, fields: Optional[Set[str]] = None):
+        """Busca lista de posts com informações do autor, a partir do cursor se informado"""
         pipeline = [
-            {'$sort': {'created_at': -1}},
+            {'$match': keyset_filter(cursor)},
+            {'$sort': dict(SORT_KEYS)},
             {'$limit': pagination},
-            {
-                '$lookup': {
-                    'from': 'Users_cache',
-                    'localField': 'author_id',
-                    'foreignField': '_id',
-                    'as': 'author_info'
-                }
-            },
-            {
-                '$unwind': {
-                    'path': '$author_info',
-                    'preserveNullAndEmptyArrays': True
-                }
-            }
+            *projection_stages(fields),
         ]
-        
         posts = await self.db['Posts'].aggregate(pipeline).to_list(length=pagination)
-        
-        for post in posts:
-            post['_id'] = str(post['_id'])
-            post['author_id'] = str(post['author_id'])
-            
-            # Adicionar informações do autor
-            if 'author_info' in post and post['author_info']:
-                post['author'] = {
-                    'name': post['author_info'].get('name', 'Usuário'),
-                    'user_photo_url': post['author_info'].get('user_photo_url', None)
-                }
-                del post['author_info']
-            else:
-                post['author'] = {
-                    'name': 'Usuário',
-                    'user_photo_url': None
-                }
-            
-            # Converter liked_by para strings
-            users = []
-            for user in post.get('liked_by', []):
-                users.append(str(user))
-            post['liked_by'] = users
-            
-        return posts
+        return await self._with_authors(posts, fields)
     
+    async def get_posts_by_ids(self, post_ids: List[str], fields: Optional[Set[str]] = None):
+        """Busca os posts informados, mais recentes primeiro, com informações do autor"""
+        pipeline = [
+            {'$match': {'_id': {'$in': [ObjectId(post_id) for post_id in post_ids]}}},
+            {'$sort': dict(SORT_KEYS)},
+            *projection_stages(fields),
+        ]
+        posts = await self.db['Posts'].aggregate(pipeline).to_list(length=len(post_ids))
+        return await self._with_authors(posts, fields)
+
+    async def set_image_variants(self, post_id: str, image_variants: List[Dict[str, str]]):
+        """Guarda as variantes menores das imagens do post, na mesma ordem de 'images'"""
+        await self.db['Posts'].update_one({'_id': ObjectId(post_id)}, {'$set': {'image_variants': image_variants}})
+
     async def delete_post(self, post_id: str):
-        result = await self.db['Posts'].delete_one({'_id': ObjectId(post_id)})
-        if result.deleted_count < 1:
+        deleted = await self.db['Posts'].find_one_and_delete({'_id': ObjectId(post_id)}, {'images': 1})
+        if not deleted:
             raise PostNotFoundError(post_id)
-        
-        return result.deleted_count
+
+        # files left without references are removed later by the gc_images job
+        await ImagesRepo(self.db).release(deleted.get('images') or [])
+        return 1
     
-    async def get_posts_by_artist(self, artist_id: str, pagination: int = 20):
+    async def get_posts_by_artist(
+        self, artist_id: str, pagination: int = 20, cursor: Optional[str] = None, fields: Optional[Set[str]] = None
+    ):
         """Busca posts de um artista específico pelo ID do Spotify com informações do autor"""
         pipeline = [
-            {'$match': {'artist_id': artist_id}},
-            {'$sort': {'created_at': -1}},
+            {'$match': {'artist_id': artist_id, **keyset_filter(cursor)}},
+            {'$sort': dict(SORT_KEYS)},
             {'$limit': pagination},
-            {
-                '$lookup': {
-                    'from': 'Users_cache',
-                    'localField': 'author_id',
-                    'foreignField': '_id',
-                    'as': 'author_info'
-                }
-            },
-            {
-                '$unwind': {
-                    'path': '$author_info',
-                    'preserveNullAndEmptyArrays': True
-                }
-            }
+            *projection_stages(fields),
         ]
-        
         posts = await self.db['Posts'].aggregate(pipeline).to_list(length=pagination)
-        
-        print(f"DEBUG: Encontrados {len(posts)} posts para o artista {artist_id}")
-        
-        for post in posts:
-            print(f"DEBUG: Post {post.get('_id')} - author_info: {post.get('author_info', 'NONE')}")
-            
-            post['_id'] = str(post['_id'])
-            post['author_id'] = str(post['author_id'])
-            
-            # Adicionar informações do autor
-            if 'author_info' in post and post['author_info']:
-                post['author'] = {
-                    'name': post['author_info'].get('name', 'Usuário'),
-                    'user_photo_url': post['author_info'].get('user_photo_url', None)
-                }
-                del post['author_info']
-                print(f"DEBUG: Autor populado: {post['author']}")
-            else:
-                post['author'] = {
-                    'name': 'Usuário',
-                    'user_photo_url': None
-                }
-                print(f"DEBUG: Sem author_info, usando padrão")
-            
-            # Converter liked_by para strings
-            users = []
-            for user in post.get('liked_by', []):
-                users.append(str(user))
-            post['liked_by'] = users
-            
-        return posts
+        # one record per page, sampled by LOG_SAMPLE_RATES
+        logger.debug('Posts do artista carregados', extra={'artist_id': artist_id, 'count': len(posts)})
+        return await self._with_authors(posts, fields)
     
 class PostNotFoundError(Exception):
     # Trhows this error when a post cant be found on the data base
     def __init__(self, post_id: str):
-        super().__init__(f'Post com ID {post_id} não foi encontrado.')
\ No newline at end of file
+        super().__init__(f'Post com ID {post_id} não foi encontrado.')
+
+class InvalidFieldsError(Exception):
+    # Throws this error when ?fields= asks for a field that a post does not have
+    def __init__(self, fields: Set[str]):
+        self.fields = sorted(fields)
+        super().__init__(f'Campos inválidos: {", ".join(self.fields)}')
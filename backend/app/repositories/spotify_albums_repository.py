@@ -1,35 +1,176 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from ..models_sql import Artist
+from ..models_sql import Artist, Album
 from ..services.spotify_auth_service import SpotifyAuthService
-from typing import List, Dict, Any
+from ..core.cache import TTLCache
+from typing import List, Dict, Any, Optional
 
+logger = logging.getLogger(__name__)
 
-def get_all_albums_from_artists(db: Session) -> List[Dict[str, Any]]:
+# max Spotify lookups running at the same time, and how long a request waits for them
+SPOTIFY_ALBUMS_CONCURRENCY = int(os.getenv("SPOTIFY_ALBUMS_CONCURRENCY", "8"))
+SPOTIFY_ALBUMS_TIMEOUT = float(os.getenv("SPOTIFY_ALBUMS_TIMEOUT", "10"))
+SPOTIFY_ALBUMS_CACHE_TTL = int(os.getenv("SPOTIFY_ALBUMS_CACHE_TTL", "3600"))
+
+# {"artist_id": spotify id, "albums": [...]} fetched from Spotify, keyed by artist name
+albums_cache = TTLCache(maxsize=1024, ttl=SPOTIFY_ALBUMS_CACHE_TTL)
+
+# lookups in progress, so concurrent requests for the same artist share one call
+_inflight: Dict[str, asyncio.Task] = {}
+_semaphores: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+
+
+def _semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores.clear()
+        _semaphores[loop] = asyncio.Semaphore(SPOTIFY_ALBUMS_CONCURRENCY)
+    return _semaphores[loop]
+
+
+async def _fetch_artist_albums(artist_name: str, spotify_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    try:
+        async with _semaphore():
+            # with a stored spotify_id the search request is skipped
+            spotify_data = await SpotifyAuthService().get_artist_albums(artist_name, spotify_id=spotify_id)
+    except Exception as e:
+        logger.warning("Erro ao buscar álbuns do artista %s no Spotify: %s", artist_name, e)
+        return None
+
+    result = {
+        "artist_id": spotify_data.get("artist_id") if spotify_data else None,
+        "albums": spotify_data.get("albums", []) if spotify_data else [],
+    }
+    albums_cache.set(artist_name, result)
+    return result
+
+
+def _albums_are_fresh(artist: Artist) -> bool:
+    # the stored albums expire like the in-memory cache, past the TTL the artist is looked up again
+    if artist.albums_fetched_at is None:
+        return False
+    return datetime.now() - artist.albums_fetched_at < timedelta(seconds=SPOTIFY_ALBUMS_CACHE_TTL)
+
+
+def _artist_albums_task(artist_name: str, spotify_id: Optional[str]) -> asyncio.Task:
+    task = _inflight.get(artist_name)
+    if task is None or task.done():
+        task = asyncio.ensure_future(_fetch_artist_albums(artist_name, spotify_id))
+        _inflight[artist_name] = task
+
+        def forget(done_task):
+            if _inflight.get(artist_name) is done_task:
+                del _inflight[artist_name]
+        task.add_done_callback(forget)
+    return task
+
+
+def _parse_release_date(value: Optional[str]) -> Optional[datetime]:
+    # Spotify returns "2020-05-01", "2020-05" or "2020" depending on the precision
+    for fmt in ("%Y-%m-%d", "%Y-%m", "%Y"):
+        try:
+            return datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _album_row(artist: Artist, album: Dict[str, Any]) -> Album:
+    return Album(
+        artist_id=artist.id,
+        artist_name=artist.nome,
+        artist_genre=artist.music_genre,
+        album_name=album.get("name"),
+        release_date=_parse_release_date(album.get("release_date")),
+        album_cover_url=album.get("image"),
+        total_tracks=album.get("total_tracks"),
+        spotify_id=album.get("id"),
+    )
+
+
+def _album_dict(album: Album) -> Dict[str, Any]:
+    return {
+        "artist_id": album.artist_id,
+        "artist_name": album.artist_name,
+        "artist_genre": album.artist_genre,
+        "album_name": album.album_name,
+        "release_date": album.release_date.date().isoformat() if album.release_date else None,
+        "total_tracks": album.total_tracks,
+        "image": album.album_cover_url,
+    }
+
+
+def _save_albums(fetched: Dict[int, List[Album]], artists: Dict[int, Artist], db: Session):
+    # replace the Spotify albums of the refreshed artists in a single transaction, the ones created by hand stay
+    if not fetched:
+        return
+    db.query(Album).filter(
+        Album.artist_id.in_(list(fetched.keys())),
+        Album.spotify_id.isnot(None),
+    ).delete(synchronize_session=False)
+    fetched_at = datetime.now()
+    for artist_id, rows in fetched.items():
+        db.add_all(rows)
+        # also marks the artists without albums, they are not looked up again on every request
+        artists[artist_id].albums_fetched_at = fetched_at
+    db.commit()
+
+
+async def get_all_albums_from_artists(db: Session, refresh: bool = False) -> List[Dict[str, Any]]:
+    """
+    Álbuns de todos os artistas cadastrados. Serve do banco quando os álbuns do artista foram buscados dentro do TTL,
+    busca os que faltam no Spotify em paralelo e devolve o que ficou pronto dentro do timeout.
+    """
     artists = db.query(Artist).all()
-    
+
     if not artists:
         return []
-    
-    auth_service = SpotifyAuthService()
-    
+
+    # the albums created by hand are stored too, they are served alongside the Spotify ones
+    stored: Dict[int, List[Album]] = {}
+    artist_ids = [artist.id for artist in artists]
+    for album in db.query(Album).filter(Album.artist_id.in_(artist_ids)).order_by(Album.id).all():
+        stored.setdefault(album.artist_id, []).append(album)
+
+    artists_by_id = {artist.id: artist for artist in artists}
+    lookups: Dict[int, Dict[str, Any]] = {}
+    tasks: Dict[int, asyncio.Task] = {}
+    for artist in artists:
+        if _albums_are_fresh(artist) and not refresh:
+            continue
+        cached = None if refresh else albums_cache.get(artist.nome)
+        if cached is not None:
+            lookups[artist.id] = cached
+        else:
+            tasks[artist.id] = _artist_albums_task(artist.nome, artist.spotify_id)
+
+    if tasks:
+        # asyncio.wait does not cancel on timeout, late lookups keep going in the background and fill the cache
+        await asyncio.wait(tasks.values(), timeout=SPOTIFY_ALBUMS_TIMEOUT)
+        for artist_id, task in tasks.items():
+            if task.done() and not task.cancelled() and task.result() is not None:
+                lookups[artist_id] = task.result()
+
+    fetched: Dict[int, List[Album]] = {}
+    for artist_id, lookup in lookups.items():
+        artist = artists_by_id[artist_id]
+        if not artist.spotify_id and lookup["artist_id"]:
+            # remember the id found by the search, next lookups go straight to the albums
+            artist.spotify_id = lookup["artist_id"]
+        fetched[artist_id] = [_album_row(artist, album) for album in lookup["albums"]]
+
+    # built before the commit, which would expire every loaded row
     result = []
-    
     for artist in artists:
-        try:
-            spotify_data = auth_service.get_artist_albums(artist.nome)
-            
-            if spotify_data and "albums" in spotify_data:
-                for album in spotify_data["albums"]:
-                    result.append({
-                        "artist_id": artist.id,
-                        "artist_name": artist.nome,
-                        "artist_genre": artist.music_genre,
-                        "album_name": album.get("name"),
-                        "release_date": album.get("release_date"),
-                        "total_tracks": album.get("total_tracks"),
-                        "image": album.get("image")
-                    })
-        except Exception as e:
-            print(f"Erro ao buscar álbuns do artista {artist.nome} no Spotify: {str(e)}")
-    
-    return result
\ No newline at end of file
+        albums = stored.get(artist.id, [])
+        if artist.id in fetched:
+            albums = [album for album in albums if album.spotify_id is None] + fetched[artist.id]
+        for album in albums:
+            result.append(_album_dict(album))
+
+    _save_albums(fetched, artists_by_id, db)
+
+    return result
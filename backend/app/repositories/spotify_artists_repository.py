@@ -1,37 +1,50 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
 from .. import models_sql
 from typing import Dict, List
 
+# INSERT ... ON CONFLICT DO UPDATE comes from the dialect specific insert()
+_UPSERT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
 def sync_top_artists(spotify_artists_data: Dict, db: Session):
-    synced_artists = []
-    
-    if "items" in spotify_artists_data:
-        for artist_data in spotify_artists_data["items"]:
-            artist_name = artist_data.get("name")
-            genres = artist_data.get("genres", [])
-            # Pega o primeiro gênero ou define como "Unknown"
-            music_genre = genres[0] if genres else "Unknown"
-            
-            # Procura se o artista já existe
-            existing_artist = db.query(models_sql.Artist).filter(
-                models_sql.Artist.nome == artist_name
-            ).first()
-            
-            if existing_artist:
-                # Atualiza o artista existente
-                existing_artist.music_genre = music_genre
-                db.commit()
-                db.refresh(existing_artist)
-                synced_artists.append(existing_artist)
-            else:
-                # Cria um novo artista
-                new_artist = models_sql.Artist(
-                    nome=artist_name,
-                    music_genre=music_genre
-                )
-                db.add(new_artist)
-                db.commit()
-                db.refresh(new_artist)
-                synced_artists.append(new_artist)
-    
+    """Insere ou atualiza os artistas do top do usuário numa única transação"""
+    genres_by_name = {}
+    spotify_ids = {}
+
+    for artist_data in spotify_artists_data.get("items", []):
+        artist_name = artist_data.get("name")
+        if not artist_name:
+            continue
+        genres = artist_data.get("genres", [])
+        # Pega o primeiro gênero ou define como "Unknown"
+        genres_by_name[artist_name] = genres[0] if genres else "Unknown"
+        spotify_ids[artist_name] = artist_data.get("id")
+
+    if not genres_by_name:
+        return []
+
+    insert = _UPSERT_INSERTS[db.get_bind().dialect.name]
+    stmt = insert(models_sql.Artist).values([
+        {"nome": nome, "music_genre": music_genre, "spotify_id": spotify_ids[nome]}
+        for nome, music_genre in genres_by_name.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models_sql.Artist.nome],
+        set_={
+            "music_genre": stmt.excluded.music_genre,
+            # never erase an id we already know
+            "spotify_id": func.coalesce(stmt.excluded.spotify_id, models_sql.Artist.spotify_id),
+        }
+    )
+    db.execute(stmt)
+
+    artists = db.query(models_sql.Artist).filter(models_sql.Artist.nome.in_(list(genres_by_name))).all()
+    # same order as the Spotify top list (sorted before the commit expires the loaded attributes)
+    position = {nome: i for i, nome in enumerate(genres_by_name)}
+    synced_artists: List[models_sql.Artist] = sorted(artists, key=lambda artist: position[artist.nome])
+    db.commit()
     return synced_artists
@@ -0,0 +1,134 @@
+import os
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from pymongo import UpdateOne
+from typing import List, Dict
+from app.core.pagination import keyset_filter, SORT_KEYS
+
+# authors with more followers than this don't fan out on write, their posts are
+# pulled into the followers feed on read instead (hybrid fan-out)
+TIMELINE_FANOUT_LIMIT = int(os.getenv("TIMELINE_FANOUT_LIMIT", "1000"))
+
+# how many of the latest posts of an author are delivered to a new friend's inbox
+TIMELINE_BACKFILL_LIMIT = int(os.getenv("TIMELINE_BACKFILL_LIMIT", "50"))
+
+TIMELINE_SORT_KEYS = [('created_at', -1), ('post_id', -1)]
+
+class TimelineRepo:
+    """
+    Inbox de timeline por usuário: cada documento de 'Timelines' aponta para um post
+    de um amigo, então ler o feed é uma única busca indexada por user_id.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+
+    async def fan_out(self, post_id: str, author_id: str, created_at: datetime, audience: List[int]):
+        """
+        Entrega o post no inbox de cada usuário da audiência (ids do SQL).
+        Retorna False quando a audiência é grande demais e o autor passa a ser lido no fan-out on read.
+        """
+        if len(audience) > TIMELINE_FANOUT_LIMIT:
+            await self.db['Users_cache'].update_one(
+                {'_id': ObjectId(author_id)},
+                {'$set': {'timeline_fanout': 'read'}}
+            )
+            return False
+
+        # the audience dropped back under the limit, the posts pulled on read meanwhile go to the inboxes
+        reset = await self.db['Users_cache'].update_one(
+            {'_id': ObjectId(author_id), 'timeline_fanout': 'read'},
+            {'$unset': {'timeline_fanout': ''}}
+        )
+        if reset.modified_count:
+            await self._deliver_recent_posts(ObjectId(author_id), audience)
+            return True
+
+        entries = [
+            {
+                'user_id': user_id,
+                'post_id': ObjectId(post_id),
+                'author_id': ObjectId(author_id),
+                'created_at': created_at,
+            }
+            for user_id in audience
+        ]
+        if entries:
+            await self.db['Timelines'].insert_many(entries, ordered=False)
+        return True
+
+    async def _deliver_recent_posts(self, author_id: ObjectId, audience: List[int]):
+        """Entrega os últimos TIMELINE_BACKFILL_LIMIT posts do autor nos inboxes, sem duplicar os que já estão lá"""
+        posts = self.db['Posts'].find({'author_id': author_id}, {'_id': 1, 'created_at': 1}, limit=TIMELINE_BACKFILL_LIMIT).sort(SORT_KEYS)
+        posts = [post async for post in posts]
+        requests = [
+            UpdateOne(
+                {'user_id': user_id, 'created_at': post['created_at'], 'post_id': post['_id']},
+                {'$setOnInsert': {'author_id': author_id}},
+                upsert=True,
+            )
+            for post in posts
+            for user_id in audience
+        ]
+        if requests:
+            await self.db['Timelines'].bulk_write(requests, ordered=False)
+
+    async def _authors(self, *sql_user_ids: int) -> Dict[int, dict]:
+        authors = self.db['Users_cache'].find(
+            {'sql_user_id': {'$in': list(sql_user_ids)}},
+            {'_id': 1, 'sql_user_id': 1, 'timeline_fanout': 1}
+        )
+        return {author['sql_user_id']: author async for author in authors}
+
+    async def on_friendship_created(self, user_id: int, friend_id: int):
+        """Cada um recebe no inbox os posts recentes do outro (ids do SQL)"""
+        authors = await self._authors(user_id, friend_id)
+        for reader, author in ((user_id, friend_id), (friend_id, user_id)):
+            # the posts of fan-out on read authors are already pulled into the feed
+            if author in authors and authors[author].get('timeline_fanout') != 'read':
+                await self._deliver_recent_posts(authors[author]['_id'], [reader])
+
+    async def on_friendship_removed(self, user_id: int, friend_id: int):
+        """Remove do inbox de cada um os posts do outro (ids do SQL)"""
+        authors = await self._authors(user_id, friend_id)
+        conditions = [
+            {'user_id': reader, 'author_id': authors[author]['_id']}
+            for reader, author in ((user_id, friend_id), (friend_id, user_id))
+            if author in authors
+        ]
+        if not conditions:
+            return 0
+        result = await self.db['Timelines'].delete_many({'$or': conditions})
+        return result.deleted_count
+
+    async def get_fanout_on_read_authors(self) -> Dict[int, ObjectId]:
+        """Autores que não fazem fan-out on write, mapeados do id do SQL para o ObjectId do cache"""
+        authors = self.db['Users_cache'].find(
+            {'timeline_fanout': 'read'},
+            {'_id': 1, 'sql_user_id': 1}
+        )
+        return {author['sql_user_id']: author['_id'] async for author in authors}
+
+    async def get_timeline_post_ids(self, user_id: int, pagination: int = 20, cursor: str = None, pull_author_ids: List[ObjectId] = None) -> List[str]:
+        """
+        Retorna os ids dos posts da página do feed, mais recentes primeiro.
+        Os posts de pull_author_ids (autores com fan-out on read) são mesclados com os do inbox.
+        """
+        query = {'user_id': user_id, **keyset_filter(cursor, id_field='post_id')}
+        inbox = self.db['Timelines'].find(query, {'post_id': 1, 'created_at': 1}, limit=pagination).sort(TIMELINE_SORT_KEYS)
+        entries = [(entry['created_at'], entry['post_id']) async for entry in inbox]
+
+        if pull_author_ids:
+            query = {'author_id': {'$in': pull_author_ids}, **keyset_filter(cursor)}
+            pulled = self.db['Posts'].find(query, {'_id': 1, 'created_at': 1}, limit=pagination).sort(SORT_KEYS)
+            entries.extend([(post['created_at'], post['_id']) async for post in pulled])
+
+        # the same post can come from both sources if the author crossed the fan-out limit
+        page = sorted(set(entries), reverse=True)[:pagination]
+        return [str(post_id) for _, post_id in page]
+
+    # removes the post from every inbox it was delivered to
+    async def on_post_deleted(self, post_id: str):
+        result = await self.db['Timelines'].delete_many({'post_id': ObjectId(post_id)})
+        return result.deleted_count
@@ -1,11 +1,15 @@
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from .. import models_sql, schemas
 from ..database import get_db
 from fastapi import Depends, status, HTTPException
 from ..core.security import Hash
+from ..oauth2 import invalidate_current_user
 from app.repositories.users_cache_repository import UserCacheRepo
 from app.models.mongo_users import UserCache
-from app.core.mongo import get_mongo_db_with_check
+from app.core.mongo import get_mongo_db_with_check, get_mongo_db, is_mongo_connected
+from app.repositories.images_repository import ImagesRepo
 from datetime import datetime
 
 def get_all_users(db:Session=Depends(get_db)):
@@ -20,7 +24,7 @@ def get_user_by_id(user_id: int, db: Session = Depends(get_db)):
     user = db.query(models_sql.User).filter(models_sql.User.id == user_id).first()
     return user
 
-async def create_user(request_user: schemas.User, db: Session = Depends(get_db), mongo = Depends(get_mongo_db_with_check)):
+async def create_user(request_user: schemas.User, db: AsyncSession, mongo = Depends(get_mongo_db_with_check)):
     # mongoDB cache instance
     cache = UserCacheRepo(mongo)
     usernameaux = request_user.username
@@ -30,11 +34,11 @@ async def create_user(request_user: schemas.User, db: Session = Depends(get_db),
         nome=request_user.nome,
         username=usernameaux,
         email=request_user.email,
-        senha=Hash.hashPWD(request_user.senha)
+        senha=await Hash.hash_async(request_user.senha)
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     # update the users cache on mongoDB
     await cache.upsert_user_cache(
         user=UserCache(
@@ -47,31 +51,39 @@ async def create_user(request_user: schemas.User, db: Session = Depends(get_db),
     )
     return new_user
 
-def delete_user(username: str, db: Session = Depends(get_db)):
-    user = db.query(models_sql.User).filter(models_sql.User.username == username)
-    if not user.first():
+async def delete_user(username: str, db: AsyncSession):
+    result = await db.execute(select(models_sql.User).where(models_sql.User.username == username))
+    deleted_user = result.scalars().first()
+    if not deleted_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario nao encontrado")
-    user.delete(synchronize_session=False)
-    db.commit()
+    deleted_user_id = deleted_user.id
+    photo_url = deleted_user.user_photo_url
+    await db.execute(delete(models_sql.User).where(models_sql.User.id == deleted_user_id))
+    await db.commit()
+    invalidate_current_user(deleted_user_id)
+    # the profile photo loses its reference, gc_images collects it once nothing else uses it
+    if photo_url and is_mongo_connected():
+        await ImagesRepo(get_mongo_db()).release([photo_url])
     return f"{username} deletado"
 
-async def update_user(username: str, request: schemas.User, db: Session = Depends(get_db), mongo = Depends(get_mongo_db_with_check)):
+async def update_user(username: str, request: schemas.User, db: AsyncSession, mongo = Depends(get_mongo_db_with_check)):
     # mongoDB cache instance
     cache = UserCacheRepo(mongo)
-    user = db.query(models_sql.User).filter(models_sql.User.username == username)
-    if not user.first():
+    result = await db.execute(select(models_sql.User).where(models_sql.User.username == username))
+    updated_user = result.scalars().first()
+    if not updated_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User {username} não foi encontrado")
     
     # Hash da senha se ela foi fornecida na atualização
     update_data = request.model_dump(exclude_unset=True)
     if 'senha' in update_data:
-        update_data['senha'] = Hash.hashPWD(update_data['senha'])
+        update_data['senha'] = await Hash.hash_async(update_data['senha'])
     
-    user.update(update_data)
-    db.commit()
+    for field, value in update_data.items():
+        setattr(updated_user, field, value)
+    await db.commit()
     
-    # Get the updated user to refresh the cache
-    updated_user = user.first()
+    invalidate_current_user(updated_user.id)
     # update the users cache on mongoDB
     await cache.upsert_user_cache(
         user=UserCache(
@@ -91,14 +103,16 @@ def show_user(username: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'Não existe usuário {username}')
     return user
 
-def update_favorite_artist(username: str, artist_name: str, db: Session = Depends(get_db)):
-    user = db.query(models_sql.User).filter(models_sql.User.username == username).first()
+async def update_favorite_artist(username: str, artist_name: str, db: AsyncSession):
+    result = await db.execute(select(models_sql.User).where(models_sql.User.username == username))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'Usuário {username} não encontrado')
     
     user.favorite_artist = artist_name
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    invalidate_current_user(user.id)
     return user
 
 def update_spotify_tokens(user_id: int, access_token: str, refresh_token: str, expires_at: datetime, db: Session):
@@ -112,6 +126,7 @@ def update_spotify_tokens(user_id: int, access_token: str, refresh_token: str, e
     user.spotify_expires_at = expires_at
     db.commit()
     db.refresh(user)
+    invalidate_current_user(user.id)
     return user
 
 def get_user_spotify_tokens(user_id: int, db: Session):
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.models.mongo_users import UserCache
+from app.repositories.author_loader import invalidate_author
 from bson import ObjectId
 
 class UserCacheRepo:
@@ -15,8 +16,29 @@ class UserCacheRepo:
             {'$set': {'name': user.name, 'user_photo_url': user.user_photo_url, 'updated_at': datetime.now(timezone.utc)}},
             upsert=True
         )
+        # name and photo are rendered from the authors cache
+        invalidate_author(user.sql_user_id)
         return result.upserted_id
 
+    async def set_photo(self, sql_user_id: int, user_photo_url: str):
+        """Troca a foto de perfil; as variantes da foto anterior deixam de valer"""
+        await self.db['Users_cache'].update_one(
+            {'sql_user_id': sql_user_id},
+            {'$set': {'user_photo_url': user_photo_url, 'updated_at': datetime.now(timezone.utc)},
+             '$unset': {'user_photo_variants': ''}}
+        )
+        invalidate_author(sql_user_id)
+
+    async def set_photo_variants(self, sql_user_id: int, user_photo_url: str, variants: dict):
+        """Guarda as variantes menores da foto, só se ela ainda for a foto atual do usuário"""
+        # the resize of an older upload can finish after a newer one, then it matches nothing
+        result = await self.db['Users_cache'].update_one(
+            {'sql_user_id': sql_user_id, 'user_photo_url': user_photo_url},
+            {'$set': {'user_photo_variants': variants, 'updated_at': datetime.now(timezone.utc)}}
+        )
+        if result.modified_count:
+            invalidate_author(sql_user_id)
+
     async def get_user_cache_by_id(self, user_id: int):
         user = await self.db['Users_cache'].find_one({'sql_user_id': user_id})
         if not user:
@@ -32,6 +54,12 @@ class UserCacheRepo:
         
         return str(user['_id'])
 
+    async def resolve_mongo_id(self, current_user) -> str:
+        """ObjectId do usuário autenticado: usa o claim do token e só consulta o cache para tokens antigos"""
+        if current_user.mongo_id:
+            return current_user.mongo_id
+        return await self.get_mongo_id_by_sql_id(current_user.id)
+
 class UserCacheNotFoundError(Exception):
     # Trhows this error when a user cant be found on the data base
     def __init__(self, user_id: str):
@@ -23,6 +23,7 @@ class ShowUser(BaseModel):
 class Artist(BaseModel):
     nome: str
     music_genre: str
+    spotify_id: Optional[str] = None
     
     
 class Album(BaseModel):
@@ -47,6 +48,25 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: Optional[str] = None
     email: Optional[str] = None
+    user_id: Optional[int] = None
+    mongo_id: Optional[str] = None
+    version: int = 1
+
+class CurrentUser(BaseModel):
+    # snapshot of the authenticated user, shared between requests by the get_current_user cache
+    id: int
+    username: str
+    nome: Optional[str] = None
+    email: str
+    favorite_artist: Optional[str] = None
+    user_photo_url: Optional[str] = None
+    spotify_user_token: Optional[str] = None
+    spotify_refresh_token: Optional[str] = None
+    spotify_expires_at: Optional[datetime] = None
+    mongo_id: Optional[str] = None  # vem do token (claims v2), None para tokens antigos
+    class Config:
+        orm_mode = True
+        frozen = True
 
 class FavoriteArtist(BaseModel):
     artist_id: str = None
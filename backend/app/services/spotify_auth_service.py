@@ -1,27 +1,94 @@
-import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-import requests
+import asyncio
 import base64
+import logging
+import time
+from app.core.http_client import get_http_client
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 SPOTIFY_REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI")
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com/v1")
+SPOTIFY_ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL", "https://accounts.spotify.com")
+# the app token is renewed this many seconds before Spotify's expires_in runs out
+SPOTIFY_APP_TOKEN_REFRESH_MARGIN = int(os.getenv("SPOTIFY_APP_TOKEN_REFRESH_MARGIN", "60"))
+
+class AppTokenCache:
+    """
+    Token client-credentials do app, compartilhado por todo o processo até perto de expirar.
+    Só uma requisição renova o token por vez, as outras esperam e reaproveitam o resultado.
+    """
+
+    def __init__(self, refresh_margin: int):
+        self.refresh_margin = refresh_margin
+        self.token = None
+        self.expires_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self._locks = {}
+
+    def _lock(self) -> asyncio.Lock:
+        # asyncio locks belong to one event loop (tests run one loop per test)
+        loop = asyncio.get_running_loop()
+        if loop not in self._locks:
+            self._locks = {loop: asyncio.Lock()}
+        return self._locks[loop]
+
+    def _fresh(self) -> bool:
+        return self.token is not None and time.monotonic() < self.expires_at - self.refresh_margin
+
+    def store(self, token: str, expires_in: float):
+        self.token = token
+        self.expires_at = time.monotonic() + expires_in
+
+    def invalidate(self):
+        self.token = None
+        self.expires_at = 0.0
+
+    async def get(self, fetch) -> str:
+        """fetch é uma corrotina que devolve (token, expires_in)"""
+        if self._fresh():
+            self.hits += 1
+            return self.token
+        async with self._lock():
+            # another request may have renewed it while we waited
+            if self._fresh():
+                self.hits += 1
+                return self.token
+            self.misses += 1
+            token, expires_in = await fetch()
+            self.store(token, expires_in)
+            return token
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expires_in": max(round(self.expires_at - time.monotonic()), 0) if self.token else 0,
+        }
+
+app_token_cache = AppTokenCache(SPOTIFY_APP_TOKEN_REFRESH_MARGIN)
 
 class SpotifyAuthService:
     def __init__(self):
         self.client_id = SPOTIFY_CLIENT_ID
         self.client_secret = SPOTIFY_CLIENT_SECRET
         self.redirect_uri = SPOTIFY_REDIRECT_URI
-        
+        self.api_url = SPOTIFY_API_URL
+        self.token_url = f"{SPOTIFY_ACCOUNTS_URL}/api/token"
+
         if not self.client_id or not self.client_secret:
             raise ValueError("SPOTIFY_CLIENT_ID e SPOTIFY_CLIENT_SECRET não estão configurados no .env")
-    
+
     def get_auth_url(self, state: str = None):
+        # only builds the URL, no request is made
         sp_oauth = SpotifyOAuth(
             client_id=self.client_id,
             client_secret=self.client_secret,
@@ -32,107 +99,122 @@ class SpotifyAuthService:
         )
         auth_url = sp_oauth.get_authorize_url()
         return auth_url
-    
-    def get_access_token(self, code: str):
-        token_url = "https://accounts.spotify.com/api/token"
-        headers = {
+
+    def _basic_auth_headers(self):
+        return {
             "Authorization": "Basic " + base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode(),
             "Content-Type": "application/x-www-form-urlencoded"
         }
+
+    async def get_access_token(self, code: str):
         data = {
             "grant_type": "authorization_code",
             "code": code,
             "redirect_uri": self.redirect_uri
         }
-        
-        response = requests.post(token_url, headers=headers, data=data)
+
+        response = await get_http_client().post(self.token_url, headers=self._basic_auth_headers(), data=data)
         response.raise_for_status()
-        
+
         token_info = response.json()
         return {
             "access_token": token_info.get("access_token"),
             "refresh_token": token_info.get("refresh_token"),
             "expires_at": datetime.now() + timedelta(seconds=token_info.get("expires_in", 3600))
         }
-    
-    # get application access token
-    def get_app_access_token(self):
-        url = "https://accounts.spotify.com/api/token"
-        headers = {
-            "Authorization": "Basic " + base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode(),
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
+
+    # get application access token, cached for the whole process until it is about to expire
+    async def get_app_access_token(self):
+        return await app_token_cache.get(self._request_app_token)
+
+    async def _request_app_token(self):
         data = {
             "grant_type": "client_credentials"
         }
-        
-        response = requests.post(url, headers=headers, data=data)
+
+        response = await get_http_client().post(self.token_url, headers=self._basic_auth_headers(), data=data)
         response.raise_for_status()
-        
-        return response.json()["access_token"]
 
-    def refresh_access_token(self, refresh_token: str):
+        token_info = response.json()
+        return token_info["access_token"], token_info.get("expires_in", 3600)
+
+    async def _app_get(self, url: str, params: dict = None):
+        """GET com o token do app, renovando o token uma vez se o Spotify responder 401"""
+        client = get_http_client()
+        token = await self.get_app_access_token()
+        response = await client.get(url, headers={"Authorization": f"Bearer {token}"}, params=params)
+        if response.status_code == 401:
+            app_token_cache.invalidate()
+            token = await self.get_app_access_token()
+            response = await client.get(url, headers={"Authorization": f"Bearer {token}"}, params=params)
+        return response
+
+    async def refresh_access_token(self, refresh_token: str):
         try:
-            token_url = "https://accounts.spotify.com/api/token"
             payload = {
                 "grant_type": "refresh_token",
                 "refresh_token": refresh_token,
                 "client_id": self.client_id,
                 "client_secret": self.client_secret
             }
-            response = requests.post(token_url, data=payload)
-            
+            response = await get_http_client().post(self.token_url, data=payload)
+
             if response.status_code == 200:
                 token_data = response.json()
                 return {
                     "access_token": token_data.get("access_token"),
+                    # Spotify may rotate the refresh token, None keeps the stored one
+                    "refresh_token": token_data.get("refresh_token"),
                     "expires_at": datetime.now() + timedelta(seconds=token_data.get("expires_in", 3600))
                 }
             else:
                 return None
         except Exception as e:
-            print(f"Erro ao renovar token: {str(e)}")
+            logger.warning("Erro ao renovar token do Spotify: %s", e)
             return None
-    
-    def validate_token(self, access_token: str) -> bool:
+
+    async def validate_token(self, access_token: str) -> bool:
         try:
-            sp = spotipy.Spotify(auth=access_token)
-            sp.current_user()
-            return True
+            response = await get_http_client().get(
+                f"{self.api_url}/me",
+                headers={"Authorization": f"Bearer {access_token}"}
+            )
+            return response.status_code == 200
         except Exception:
             return False
-    
-    def get_top_artists(self, access_token: str, limit: int = 50):
-        sp = spotipy.Spotify(auth=access_token)
-        results = sp.current_user_top_artists(limit=limit)
-        return results
-
-    def get_artist_albums(self, artist_name: str):
-        base_url = "https://api.spotify.com/v1"
-        token = self.get_app_access_token()  
-        
-        headers = {"Authorization": f"Bearer {token}"}
-
-        search_url = f"{base_url}/search"
-        search_params = {
-            "q": artist_name,
-            "type": "artist",
-            "limit": 1
-        }
 
-        artist_res = requests.get(search_url, headers=headers, params=search_params)
-        artist_data = artist_res.json()
+    async def get_top_artists(self, access_token: str, limit: int = 50):
+        response = await get_http_client().get(
+            f"{self.api_url}/me/top/artists",
+            headers={"Authorization": f"Bearer {access_token}"},
+            params={"limit": limit}
+        )
+        response.raise_for_status()
+        return response.json()
 
-        if not artist_data.get("artists", {}).get("items"):
-            return {"albums": []}
+    async def get_artist(self, artist_id: str):
+        response = await self._app_get(f"{self.api_url}/artists/{artist_id}")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def get_artist_albums(self, artist_name: str, spotify_id: str = None):
+        """Álbuns do artista, a busca pelo nome só é feita quando o ID do Spotify não é conhecido"""
+        if spotify_id:
+            artist = {"id": spotify_id, "name": artist_name}
+        else:
+            artist = await self.search_artist(artist_name)
+            if artist is None:
+                return {"albums": []}
 
-        artist = artist_data["artists"]["items"][0]
         artist_id = artist["id"]
 
-        albums_url = f"{base_url}/artists/{artist_id}/albums"
         albums_params = {"limit": 50, "include_groups": "album,single"}
 
-        albums_res = requests.get(albums_url, headers=headers, params=albums_params)
+        albums_res = await self._app_get(f"{self.api_url}/artists/{artist_id}/albums", params=albums_params)
+        # a 429 or 5xx must not be read as an artist without albums
+        albums_res.raise_for_status()
         albums_data = albums_res.json()
 
         raw_albums = albums_data.get("items", [])
@@ -141,6 +223,7 @@ class SpotifyAuthService:
 
         for album in raw_albums:
             cleaned_albums.append({
+                "id": album.get("id"),
                 "name": album.get("name"),
                 "release_date": album.get("release_date"),
                 "total_tracks": album.get("total_tracks"),
@@ -153,24 +236,33 @@ class SpotifyAuthService:
 
         return {
             "artist": artist.get("name"),
+            "artist_id": artist_id,
             "albums": cleaned_albums
         }
 
-    def search_artists(self, query: str, limit: int = 12):
-        token = self.get_app_access_token()
+    async def search_artist(self, artist_name: str):
+        """Primeiro resultado da busca de artistas do Spotify pelo nome, ou None"""
+        search_params = {
+            "q": artist_name,
+            "type": "artist",
+            "limit": 1
+        }
+
+        artist_res = await self._app_get(f"{self.api_url}/search", params=search_params)
+        artist_res.raise_for_status()
+        artist_data = artist_res.json()
+
+        items = artist_data.get("artists", {}).get("items")
+        return items[0] if items else None
 
-        headers = {"Authorization": f"Bearer {token}"}
+    async def search_artists(self, query: str, limit: int = 12):
         params = {
             "q": query,
             "type": "artist",
             "limit": limit
         }
 
-        response = requests.get(
-            "https://api.spotify.com/v1/search",
-            headers=headers,
-            params=params
-        )
+        response = await self._app_get(f"{self.api_url}/search", params=params)
         response.raise_for_status()
         data = response.json()
 
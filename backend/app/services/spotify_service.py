@@ -1,8 +1,10 @@
-import requests
+import httpx
 import base64
 import os
 from fastapi import HTTPException, status
 from typing import Optional
+from app.core.http_client import get_http_client
+from app.services.spotify_auth_service import SPOTIFY_API_URL, SPOTIFY_ACCOUNTS_URL, app_token_cache
 
 class SpotifyService:
     """Serviço para integração com a API do Spotify"""
@@ -11,18 +13,19 @@ class SpotifyService:
         # Para usar a API do Spotify, você precisará configurar essas variáveis de ambiente
         self.client_id = os.getenv("SPOTIFY_CLIENT_ID")
         self.client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
-        self.base_url = "https://api.spotify.com/v1"
-        self.token_url = "https://accounts.spotify.com/api/token"
-        self.access_token = None
+        self.base_url = SPOTIFY_API_URL
+        self.token_url = f"{SPOTIFY_ACCOUNTS_URL}/api/token"
     
-    def _get_access_token(self) -> str:
-        """Obtém token de acesso usando Client Credentials Flow"""
+    async def _get_access_token(self) -> str:
+        """Obtém token de acesso usando Client Credentials Flow (compartilhado com SpotifyAuthService)"""
         if not self.client_id or not self.client_secret:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Credenciais do Spotify não configuradas"
             )
-        
+        return await app_token_cache.get(self._request_access_token)
+
+    async def _request_access_token(self):
         # Encode client_id:client_secret em base64
         credentials = f"{self.client_id}:{self.client_secret}"
         encoded_credentials = base64.b64encode(credentials.encode()).decode()
@@ -37,17 +40,17 @@ class SpotifyService:
         }
         
         try:
-            response = requests.post(self.token_url, headers=headers, data=data)
+            response = await get_http_client().post(self.token_url, headers=headers, data=data)
             response.raise_for_status()
             token_data = response.json()
-            return token_data.get("access_token")
-        except requests.RequestException as e:
+            return token_data.get("access_token"), token_data.get("expires_in", 3600)
+        except httpx.HTTPError as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Erro ao obter token do Spotify: {str(e)}"
             )
     
-    def get_artist_info(self, artist_id: str) -> Optional[dict]:
+    async def get_artist_info(self, artist_id: str) -> Optional[dict]:
         """Busca informações de um artista pelo ID do Spotify"""
         
         # Para desenvolvimento: se credenciais não estão configuradas, retorna dados mockados
@@ -60,23 +63,23 @@ class SpotifyService:
                 "external_urls": {"spotify": f"https://open.spotify.com/artist/{artist_id}"}
             }
         
-        if not self.access_token:
-            self.access_token = self._get_access_token()
+        access_token = await self._get_access_token()
         
         headers = {
-            "Authorization": f"Bearer {self.access_token}"
+            "Authorization": f"Bearer {access_token}"
         }
         
         try:
-            response = requests.get(
+            response = await get_http_client().get(
                 f"{self.base_url}/artists/{artist_id}",
                 headers=headers
             )
             
             if response.status_code == 401:  # Token expirado
-                self.access_token = self._get_access_token()
-                headers["Authorization"] = f"Bearer {self.access_token}"
-                response = requests.get(
+                app_token_cache.invalidate()
+                access_token = await self._get_access_token()
+                headers["Authorization"] = f"Bearer {access_token}"
+                response = await get_http_client().get(
                     f"{self.base_url}/artists/{artist_id}",
                     headers=headers
                 )
@@ -98,7 +101,7 @@ class SpotifyService:
                 "external_urls": artist_data.get("external_urls", {})
             }
             
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Erro ao buscar artista no Spotify: {str(e)}"
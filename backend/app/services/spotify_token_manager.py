@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import os
+import httpx
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import Awaitable, Callable, ContextManager, Dict, List
+from app.core.cache import TTLCache
+from app.database import get_db_context
+from app.models_sql import User
+from app.repositories.user import get_user_spotify_tokens, update_spotify_tokens
+from app.services.spotify_auth_service import SpotifyAuthService
+
+logger = logging.getLogger(__name__)
+
+# The stored spotify_expires_at is trusted: a token is only refreshed when it expired, when
+# Spotify answers 401, or ahead of time by the background task for users seen recently.
+SPOTIFY_TOKEN_REFRESH_MARGIN = int(os.getenv("SPOTIFY_TOKEN_REFRESH_MARGIN", "300"))
+SPOTIFY_TOKEN_REFRESH_INTERVAL = int(os.getenv("SPOTIFY_TOKEN_REFRESH_INTERVAL", "60"))
+SPOTIFY_ACTIVE_USER_WINDOW = int(os.getenv("SPOTIFY_ACTIVE_USER_WINDOW", "900"))
+
+class SpotifyTokenManager:
+    def __init__(self, session_factory: Callable[[], ContextManager[Session]] = get_db_context):
+        # the refreshes and the background task open their own sessions, never the one of a request
+        self.session_factory = session_factory
+        self.active_users = TTLCache(maxsize=10000, ttl=SPOTIFY_ACTIVE_USER_WINDOW)
+        self.refreshes = 0
+        self._inflight: Dict[int, asyncio.Task] = {}
+        self._task: asyncio.Task = None
+
+    async def get_access_token(self, user_id: int, db: Session) -> str:
+        tokens = get_user_spotify_tokens(user_id, db)
+        if not tokens or not tokens.get("access_token"):
+            raise SpotifyTokenError("Usuário não autenticado com Spotify. Faça login primeiro.")
+
+        self.active_users.set(user_id, True)
+        expires_at = tokens["expires_at"]
+        if expires_at and expires_at <= datetime.now():
+            return await self.refresh(user_id)
+        return tokens["access_token"]
+
+    async def refresh(self, user_id: int) -> str:
+        # concurrent refreshes of the same user share one request to Spotify
+        task = self._inflight.get(user_id)
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._refresh(user_id))
+            self._inflight[user_id] = task
+
+            def forget(done_task):
+                if self._inflight.get(user_id) is done_task:
+                    del self._inflight[user_id]
+            task.add_done_callback(forget)
+        return await asyncio.shield(task)
+
+    def _stored_tokens(self, user_id: int) -> dict:
+        with self.session_factory() as db:
+            return get_user_spotify_tokens(user_id, db)
+
+    def _store_tokens(self, user_id: int, token_data: dict):
+        with self.session_factory() as db:
+            update_spotify_tokens(
+                user_id=user_id,
+                access_token=token_data["access_token"],
+                refresh_token=token_data.get("refresh_token"),
+                expires_at=token_data["expires_at"],
+                db=db
+            )
+
+    async def _refresh(self, user_id: int) -> str:
+        # the sync queries run in the thread pool, the event loop keeps serving other requests
+        tokens = await run_in_threadpool(self._stored_tokens, user_id)
+        if not tokens or not tokens.get("refresh_token"):
+            raise SpotifyTokenError("Token expirado e refresh token não disponível. Faça login novamente.")
+
+        new_token_data = await SpotifyAuthService().refresh_access_token(tokens["refresh_token"])
+        if not new_token_data:
+            raise SpotifyTokenError("Falha ao renovar token. Faça login novamente com o Spotify.")
+
+        await run_in_threadpool(self._store_tokens, user_id, new_token_data)
+        self.refreshes += 1
+        return new_token_data["access_token"]
+
+    async def call(self, user_id: int, db: Session, request: Callable[[str], Awaitable]):
+        """Chama request(access_token), renovando o token e tentando de novo uma vez se o Spotify responder 401"""
+        access_token = await self.get_access_token(user_id, db)
+        try:
+            return await request(access_token)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 401:
+                raise
+        access_token = await self.refresh(user_id)
+        return await request(access_token)
+
+    def _expiring_user_ids(self, user_ids: List[int]) -> List[int]:
+        limit = datetime.now() + timedelta(seconds=SPOTIFY_TOKEN_REFRESH_MARGIN)
+        with self.session_factory() as db:
+            expiring = db.query(User.id).filter(
+                User.id.in_(user_ids),
+                User.spotify_refresh_token.isnot(None),
+                User.spotify_expires_at <= limit
+            ).all()
+        return [user_id for (user_id,) in expiring]
+
+    async def refresh_expiring(self) -> int:
+        """Renova os tokens dos usuários ativos que expiram dentro da margem, devolve quantos foram renovados"""
+        user_ids = self.active_users.keys()
+        if not user_ids:
+            return 0
+
+        refreshed = 0
+        for user_id in await run_in_threadpool(self._expiring_user_ids, list(user_ids)):
+            try:
+                await self.refresh(user_id)
+                refreshed += 1
+            except Exception as e:
+                logger.warning("Erro ao renovar token do Spotify do usuário %s: %s", user_id, e)
+        return refreshed
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(SPOTIFY_TOKEN_REFRESH_INTERVAL)
+            try:
+                await self.refresh_expiring()
+            except Exception as e:
+                logger.exception("Erro na renovação automática de tokens do Spotify")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+spotify_token_manager = SpotifyTokenManager()
+
+class SpotifyTokenError(Exception):
+    # Throws this error when the user has no usable Spotify token
+    pass
@@ -0,0 +1,111 @@
+"""
+Benchmark da sessão síncrona x assíncrona em rotas async sob carga concorrente: cada "requisição"
+busca usuários (como /friends/search). Com a sessão síncrona a consulta roda no event loop e
+atrasa todas as outras requisições; o atraso do loop é medido por uma tarefa que acorda a cada 1ms.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_async_db [--users 20000] [--concurrency 50] [--requests 500]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.database import base, create_async_db_engine, create_db_engine
+from app import models_sql
+
+
+def search_query(term):
+    return select(models_sql.User).where(
+        models_sql.User.username.ilike(f"%{term}%") | models_sql.User.nome.ilike(f"%{term}%")
+    ).limit(20)
+
+
+def setup(url, users):
+    engine = create_db_engine(url)
+    base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all(
+            models_sql.User(username=f"user{i}", nome=f"Nome {i}", email=f"user{i}@socialjam.com", senha="x")
+            for i in range(users)
+        )
+        db.commit()
+    return engine
+
+
+async def run(handler, concurrency, requests):
+    latencies, lags = [], []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        # how late the loop wakes up a task that asked to sleep 1ms
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(f"{i % 997}9")
+            latencies.append(time.perf_counter() - start)
+
+    ticker = asyncio.create_task(heartbeat())
+    start = time.perf_counter()
+    await asyncio.gather(*[request(i) for i in range(requests)])
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ticker
+
+    latencies.sort()
+    return {
+        "req_s": requests / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "max_lag_ms": max(lags, default=0) * 1000,
+    }
+
+
+async def main(users, concurrency, requests):
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        sync_engine = setup(url, users)
+        async_engine = create_async_db_engine(url)
+        Session = sessionmaker(bind=sync_engine)
+        AsyncSession = async_sessionmaker(bind=async_engine)
+
+        async def sync_handler(term):
+            # what the async routes did before: a blocking query inside the coroutine
+            with Session() as db:
+                db.execute(search_query(term)).scalars().all()
+
+        async def async_handler(term):
+            async with AsyncSession() as db:
+                (await db.execute(search_query(term))).scalars().all()
+
+        print(f"{'sessão':<10}{'req/s':>10}{'p50':>11}{'p95':>11}{'atraso máx. do loop':>22}")
+        try:
+            for name, handler in (("síncrona", sync_handler), ("async", async_handler)):
+                result = await run(handler, concurrency, requests)
+                print(
+                    f"{name:<10}{result['req_s']:>10.0f}{result['p50_ms']:>9.1f}ms"
+                    f"{result['p95_ms']:>9.1f}ms{result['max_lag_ms']:>20.1f}ms"
+                )
+        finally:
+            await async_engine.dispose()
+            sync_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.concurrency, args.requests))
@@ -0,0 +1,134 @@
+"""
+Benchmark das páginas do feed (get_post_list): bytes que saem do mongoDB por página e latência p95,
+comparando o pipeline antigo ($lookup com o Users_cache inteiro, remontado em Python) com o $project
+e com uma seleção de campos (?fields=content,author,likes), os dois com os autores do AuthorLoader.
+Precisa de um mongoDB rodando.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_feed_projection [--posts 1000] [--page-size 20] [--rounds 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import bson
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.mongo_indexes import managed_indexes, reconcile_indexes
+from app.core.pagination import SORT_KEYS, keyset_filter, next_cursor
+from app.repositories.author_loader import AuthorLoader
+from app.repositories.posts_repository import parse_fields, projection_stages
+
+BENCH_MONGO_URI = os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017")
+BENCH_DB_NAME = "SocialJAM_bench_feed"
+
+
+def legacy_stages():
+    # versão anterior, mantida aqui só para comparação
+    return [
+        {'$lookup': {'from': 'Users_cache', 'localField': 'author_id', 'foreignField': '_id', 'as': 'author_info'}},
+        {'$unwind': {'path': '$author_info', 'preserveNullAndEmptyArrays': True}},
+    ]
+
+
+async def legacy_reshape(db, posts):
+    for post in posts:
+        post['_id'] = str(post['_id'])
+        post['author_id'] = str(post['author_id'])
+        if post.get('author_info'):
+            post['author'] = {
+                'name': post['author_info'].get('name', 'Usuário'),
+                'user_photo_url': post['author_info'].get('user_photo_url', None)
+            }
+            del post['author_info']
+        else:
+            post['author'] = {'name': 'Usuário', 'user_photo_url': None}
+    return posts
+
+
+async def attach_authors(db, posts):
+    # one loader per page, as in a request
+    await AuthorLoader(db).attach(posts)
+    return posts
+
+
+async def seed(db, posts):
+    now = datetime.now(timezone.utc)
+    users = [
+        {'_id': ObjectId(), 'sql_user_id': i, 'name': f'user {i}', 'user_photo_url': f'images/users/{i}.jpg', 'updated_at': now}
+        for i in range(50)
+    ]
+    await db['Users_cache'].insert_many(users)
+    await db['Posts'].insert_many([
+        {
+            'author_id': users[i % len(users)]['_id'],
+            'artist_id': f'artist{i % 10}',
+            'content': f'post {i} ' + 'lorem ipsum dolor sit amet ' * 10,
+            'images': [f'images/posts/{ObjectId()}.jpg' for _ in range(i % 3)],
+            'likes': i % 40,
+            'created_at': now - timedelta(seconds=i),
+        }
+        for i in range(posts)
+    ])
+    await reconcile_indexes(db, managed_indexes())
+
+
+async def walk_feed(db, stages, reshape, page_size):
+    """Percorre o feed inteiro pelo cursor; devolve bytes e latência (ms) de cada página"""
+    sizes, latencies = [], []
+    cursor = None
+    while True:
+        pipeline = [{'$match': keyset_filter(cursor)}, {'$sort': dict(SORT_KEYS)}, {'$limit': page_size}, *stages]
+        start = time.perf_counter()
+        page = await db['Posts'].aggregate(pipeline).to_list(length=page_size)
+        sizes.append(sum(len(bson.encode(post)) for post in page))
+        await reshape(db, page)
+        latencies.append((time.perf_counter() - start) * 1000)
+        cursor = next_cursor(page, page_size)
+        if not cursor:
+            return sizes, latencies
+
+
+async def main(posts, page_size, rounds):
+    client = AsyncIOMotorClient(BENCH_MONGO_URI, serverSelectionTimeoutMS=2000)
+    db = client[BENCH_DB_NAME]
+    try:
+        await db.command('ping')
+    except Exception as e:
+        print(f"mongoDB não está disponível em {BENCH_MONGO_URI}: {e}")
+        return
+
+    variants = [
+        ("antes", legacy_stages(), legacy_reshape),
+        ("$project", projection_stages(), attach_authors),
+        ("fields", projection_stages(parse_fields('content,author,likes')), attach_authors),
+    ]
+    try:
+        await client.drop_database(BENCH_DB_NAME)
+        await seed(db, posts)
+        print(f"{posts} posts, páginas de {page_size}, {rounds} rodadas")
+        print(f"{'versão':<10}{'bytes/página':>14}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, stages, reshape in variants:
+            sizes, latencies = [], []
+            for _ in range(rounds):
+                round_sizes, round_latencies = await walk_feed(db, stages, reshape, page_size)
+                sizes += round_sizes
+                latencies += round_latencies
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            print(f"{name:<10}{statistics.mean(sizes):>14.0f}{statistics.median(latencies):>10.2f}{p95:>10.2f}")
+    finally:
+        await client.drop_database(BENCH_DB_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.posts, args.page_size, args.rounds))
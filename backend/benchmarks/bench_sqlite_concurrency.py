@@ -0,0 +1,105 @@
+"""
+Benchmark de leituras e escritas concorrentes no SQLite: threads (como as rotas sync no thread pool
+do FastAPI) lendo e criando notificações, comparando o engine padrão (rollback journal, pool de 5)
+com o engine de create_db_engine (WAL, synchronous=NORMAL, busy timeout, pool do tamanho do thread pool).
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_sqlite_concurrency [--threads 40] [--seconds 5] [--write-ratio 0.2]
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError, TimeoutError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import base, create_db_engine
+from app import models_sql
+
+USERS = 200
+
+
+def setup(engine):
+    base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    with Session() as db:
+        db.add_all(models_sql.User(username=f"user{i}", email=f"user{i}@socialjam.com", senha="x") for i in range(USERS))
+        db.commit()
+    return Session
+
+
+def worker(Session, deadline, write_ratio, results):
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        user_id = rng.randint(1, USERS)
+        write = rng.random() < write_ratio
+        start = time.perf_counter()
+        try:
+            with Session() as db:
+                if write:
+                    db.add(models_sql.Notification(user_id=user_id, type="friend_request", content="bench"))
+                    db.commit()
+                else:
+                    db.query(models_sql.Notification).filter(models_sql.Notification.user_id == user_id).limit(20).all()
+        except (OperationalError, TimeoutError):
+            # "database is locked" or no connection available in the pool
+            results["errors"] += 1
+            continue
+        results["writes" if write else "reads"].append(time.perf_counter() - start)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def measure(make_engine, threads, seconds, write_ratio):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = make_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Session = setup(engine)
+        results = {"reads": [], "writes": [], "errors": 0}
+        deadline = time.perf_counter() + seconds
+        pool = [threading.Thread(target=worker, args=(Session, deadline, write_ratio, results)) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        engine.dispose()
+
+    return {
+        "reads_s": len(results["reads"]) / seconds,
+        "writes_s": len(results["writes"]) / seconds,
+        "read_p95_ms": percentile(results["reads"], 0.95),
+        "write_p95_ms": percentile(results["writes"], 0.95),
+        "errors": results["errors"],
+    }
+
+
+def default_engine(url):
+    # the engine app/database.py used to create
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{'engine':<10}{'leituras/s':>12}{'escritas/s':>12}{'p95 leitura':>13}{'p95 escrita':>13}{'erros':>8}")
+    for name, make_engine in (("padrão", default_engine), ("ajustado", create_db_engine)):
+        result = measure(make_engine, args.threads, args.seconds, args.write_ratio)
+        print(
+            f"{name:<10}{result['reads_s']:>12.0f}{result['writes_s']:>12.0f}"
+            f"{result['read_p95_ms']:>11.1f}ms{result['write_p95_ms']:>11.1f}ms{result['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
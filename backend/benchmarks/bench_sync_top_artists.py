@@ -0,0 +1,85 @@
+"""
+Benchmark de sync_top_artists: transações e comandos SQL por sincronização do top 50,
+comparando a versão antiga (SELECT + commit por artista) com o upsert em lote.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_sync_top_artists [--runs 20]
+"""
+import argparse
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import base
+from app import models_sql
+from app.repositories.spotify_artists_repository import sync_top_artists
+
+
+def sync_top_artists_per_row(spotify_artists_data, db):
+    # versão anterior, mantida aqui só para comparação
+    synced_artists = []
+    for artist_data in spotify_artists_data.get("items", []):
+        artist_name = artist_data.get("name")
+        genres = artist_data.get("genres", [])
+        music_genre = genres[0] if genres else "Unknown"
+        existing_artist = db.query(models_sql.Artist).filter(models_sql.Artist.nome == artist_name).first()
+        if existing_artist:
+            existing_artist.music_genre = music_genre
+            db.commit()
+            db.refresh(existing_artist)
+            synced_artists.append(existing_artist)
+        else:
+            new_artist = models_sql.Artist(nome=artist_name, music_genre=music_genre)
+            db.add(new_artist)
+            db.commit()
+            db.refresh(new_artist)
+            synced_artists.append(new_artist)
+    return synced_artists
+
+
+def top_artists_payload(count=50):
+    return {"items": [{"name": f"Artist {i}", "genres": [f"genre {i % 7}"]} for i in range(count)]}
+
+
+def measure(sync, runs):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    counters = {"commits": 0, "statements": 0}
+
+    @event.listens_for(engine, "commit")
+    def on_commit(conn):
+        counters["commits"] += 1
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counters["statements"] += 1
+
+    payload = top_artists_payload()
+    start = time.perf_counter()
+    # the first run inserts every artist, the following ones update them
+    for _ in range(runs):
+        with Session() as db:
+            sync(payload, db)
+    elapsed = time.perf_counter() - start
+    return {
+        "transactions_per_sync": counters["commits"] / runs,
+        "statements_per_sync": counters["statements"] / runs,
+        "ms_per_sync": elapsed * 1000 / runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'versão':<12}{'transações/sync':>18}{'comandos/sync':>16}{'ms/sync':>10}")
+    for name, sync in (("por linha", sync_top_artists_per_row), ("upsert", sync_top_artists)):
+        result = measure(sync, args.runs)
+        print(f"{name:<12}{result['transactions_per_sync']:>18.1f}{result['statements_per_sync']:>16.1f}{result['ms_per_sync']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,40 +10,65 @@ from app.api.authentication import router as auth_router
 from app.api.friendlist import router as friends_router
 from app.api.routes_spotify import router as spotify_router
 from app import models_sql as models
-from app.database import engine
-from app.core.mongo import connect_mongo, disconnect_mongo, apply_schemas, is_mongo_connected
+from app.database import engine, async_engine, async_replica_engine
+from app.core.security import hash_pool, HashPoolSaturatedError
+from app.core.image_variants import image_variants
+from app.core.uploads import (
+    upload_metrics, ImmutableStaticFiles, IMAGE_STORE_DIR, UploadSizeLimitMiddleware, UploadTooLargeError, UnsupportedImageError,
+)
+from app.core.http_client import close_http_client
+from app.services.spotify_auth_service import app_token_cache
+from app.services.spotify_token_manager import spotify_token_manager
+from app.core.mongo import connect_mongo, disconnect_mongo, apply_schemas, ensure_indexes, is_mongo_connected
 from contextlib import asynccontextmanager
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
+from app.core.logging import setup_logging
+import logging
 import os
 
 load_dotenv()
 
+# before anything logs: records go through a queue, the event loop never writes to stdout
+setup_logging()
+logger = logging.getLogger(__name__)
+
 # connect to mongo db right after starting the server and disconnect before closing the server
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Criar diretórios necessários
     os.makedirs("images/posts", exist_ok=True)
     os.makedirs("images/pfp", exist_ok=True)
+    os.makedirs(IMAGE_STORE_DIR, exist_ok=True)
     
     # Tentar conectar ao MongoDB
     mongo_success = await connect_mongo()
     
     if mongo_success:
-        print('Conectado ao MongoDB')
+        logger.info('Conectado ao MongoDB')
         await apply_schemas()
+        await ensure_indexes()
     else:
-        print('Servidor iniciado sem MongoDB - algumas funcionalidades podem não estar disponíveis')
+        logger.warning('Servidor iniciado sem MongoDB - algumas funcionalidades podem não estar disponíveis')
     
+    # refreshes the Spotify tokens of active users before they expire
+    spotify_token_manager.start()
+
     try:
         yield
     finally:
+        await spotify_token_manager.stop()
+        await image_variants.stop()
+        await close_http_client()
+        # the aiosqlite connections run on their own threads, they would keep the process alive
+        await async_engine.dispose()
+        await async_replica_engine.dispose()
         await disconnect_mongo()
         if mongo_success:
-            print('Encerrando conexão com mongoDB')
+            logger.info('Encerrando conexão com mongoDB')
         else:
-            print('Servidor finalizado')
+            logger.info('Servidor finalizado')
     
 app = FastAPI(
     title="SocialJAM",
@@ -57,6 +82,10 @@ async def health_check():
     return {
         "status": "ok",
         "mongodb_connected": is_mongo_connected(),
+        "password_hash_pool": hash_pool.stats(),
+        "spotify_app_token": app_token_cache.stats(),
+        "uploads": upload_metrics.stats(),
+        "image_variants": image_variants.stats(),
         "message": "Servidor funcionando" + (" com MongoDB" if is_mongo_connected() else " sem MongoDB")
     }
 
@@ -70,6 +99,22 @@ async def validation_exception_handler(request, exc):
         }
     )
 
+@app.exception_handler(HashPoolSaturatedError)
+async def hash_pool_saturated_handler(request, exc):
+    # too many logins/signups at once: ask the client to retry instead of queueing forever
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servidor ocupado, tente novamente em instantes"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(UploadTooLargeError)
+async def upload_too_large_handler(request, exc):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+@app.exception_handler(UnsupportedImageError)
+async def unsupported_image_handler(request, exc):
+    return JSONResponse(status_code=415, content={"detail": str(exc)})
 
 origins = [
     "http://localhost:5173"
@@ -77,17 +122,24 @@ origins = [
 
 
 
+# rejects oversized uploads by their Content-Length before the body is read (inside CORS, so the 413 reaches the browser)
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # adds the cors middleware responsible to menage the conection betwen front-end and back-end
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 models.base.metadata.create_all(engine)
 
 # Servir arquivos estáticos (imagens)
+# the store is mounted first: its files never change, so they are served with an immutable Cache-Control
+app.mount("/images/store", ImmutableStaticFiles(directory=IMAGE_STORE_DIR, check_dir=False), name="images_store")
+app.mount("/backend/images/store", ImmutableStaticFiles(directory=IMAGE_STORE_DIR, check_dir=False), name="backend_images_store")
 app.mount("/images", StaticFiles(directory="images"), name="images")
 app.mount("/backend/images", StaticFiles(directory="images"), name="backend_images")
 
@@ -4,24 +4,50 @@ Configurações e fixtures para testes do backend SocialJAM
 import pytest
 import pytest_asyncio
 import asyncio
+import atexit
+import importlib.util
+import json
+import logging
 import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
 from motor.motor_asyncio import AsyncIOMotorClient
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool, StaticPool
 
-from app.database import base, get_db
+# the app and the tests use SQLite files of a temporary directory, the committed database.db is never
+# opened (the WAL pragma would rewrite it)
+TEST_DB_DIR = tempfile.mkdtemp(prefix="socialjam-tests-")
+atexit.register(shutil.rmtree, TEST_DB_DIR, ignore_errors=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DB_DIR, 'database.db')}"
+
+from app.database import base, create_db_engine, get_db, get_async_db, get_read_db, get_async_read_db
 from app.core.mongo import get_mongo_db_with_check
+from app.oauth2 import current_user_cache
+from app.core.http_client import close_http_client
+from app.services import spotify_auth_service
+from app.services.spotify_service import spotify_service
+from app.repositories.spotify_albums_repository import albums_cache
+from app.repositories.author_loader import authors_cache
 from main import app
 
 # Configurar variável de ambiente para testes
 os.environ["SECRET_KEY"] = "test_secret_key_for_jwt_tokens_in_tests_should_be_very_secure"
 
 
-# Configuração do banco de dados de teste em memória
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+# Configuração do banco de dados de teste
+TEST_DB_PATH = os.path.join(TEST_DB_DIR, "test.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{TEST_DB_PATH}"
 TEST_MONGO_URI = 'mongodb://localhost:27017'
+# PostgreSQL of the SQL matrix; without it one is started with pgembed, when installed
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
 TESTE_DB_NAME = 'SocialJAM_TEST'
 
 engine = create_engine(
@@ -32,6 +58,11 @@ engine = create_engine(
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# same file for the async routes, so they see what the tests write through db_session.
+# No pool: aiosqlite connections belong to the event loop of the TestClient that opened them
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{TEST_DB_PATH}", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 # create a loop to deal with async functions
 @pytest.fixture(scope='session')
 def event_loop():
@@ -50,6 +81,148 @@ async def mongo_client():
     await client.drop_database(TESTE_DB_NAME)
     client.close() 
 
+@pytest.fixture(autouse=True)
+def clear_authors_cache():
+    # authors are cached per process and the tests reuse the same ObjectIds with other names
+    authors_cache.clear()
+    yield
+    authors_cache.clear()
+
+# fixture for tests that need a real mongoDB (e.g. query plans), skipped when there is none running
+@pytest_asyncio.fixture(scope="function")
+async def live_mongo():
+    client = AsyncIOMotorClient(TEST_MONGO_URI, serverSelectionTimeoutMS=1000)
+    db = client[TESTE_DB_NAME]
+    try:
+        await db.command('ping')
+    except Exception:
+        client.close()
+        pytest.skip('MongoDB não está disponível em ' + TEST_MONGO_URI)
+    yield db
+    await client.drop_database(TESTE_DB_NAME)
+    client.close()
+
+@pytest.fixture(scope="session")
+def postgres_url(tmp_path_factory):
+    """URL do PostgreSQL dos testes: TEST_POSTGRES_URL ou um servidor local do pgembed"""
+    if TEST_POSTGRES_URL:
+        yield TEST_POSTGRES_URL
+        return
+    for module in ("pgembed", "psycopg2", "asyncpg"):
+        if importlib.util.find_spec(module) is None:
+            pytest.skip(f'PostgreSQL não está disponível (defina TEST_POSTGRES_URL ou instale {module})')
+    import pgembed
+    # pgembed logs from its atexit hook, after pytest has closed the captured output
+    logging.getLogger("pgembed").setLevel(logging.WARNING)
+    server = pgembed.get_server(tmp_path_factory.mktemp("postgres"), cleanup_mode="stop")
+    yield server.get_uri()
+    server.cleanup()
+
+# the SQL repositories run on every backend of the matrix, PostgreSQL is skipped when there is none
+@pytest.fixture(params=["sqlite", "postgresql"])
+def sql_url(request, tmp_path):
+    if request.param == "sqlite":
+        return f"sqlite:///{tmp_path / 'test.db'}"
+    return request.getfixturevalue("postgres_url")
+
+@pytest.fixture(scope="function")
+def sql_session(sql_url):
+    """Sessão em um banco vazio de cada backend da matriz (SQLite e PostgreSQL)"""
+    sql_engine = create_db_engine(sql_url)
+    base.metadata.create_all(bind=sql_engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=sql_engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        base.metadata.drop_all(bind=sql_engine)
+        sql_engine.dispose()
+
+class SpotifyStub:
+    """Servidor HTTP local que imita os endpoints do Spotify usados pelo backend"""
+
+    def __init__(self):
+        # (method, path) -> (status, body) or fn(request) -> (status, body); paths are matched without the query string
+        self.routes = {
+            ("POST", "/api/token"): (200, {"access_token": "app-token", "token_type": "Bearer", "expires_in": 3600}),
+            ("GET", "/v1/me"): (200, {"id": "stub-user"}),
+        }
+        self.requests = []
+        self.connections = set()
+        self.delay = 0.0  # seconds each response takes, to simulate Spotify latency
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse can be observed
+
+            def _handle(self):
+                url = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode() if length else ""
+                stub.requests.append({
+                    "method": self.command,
+                    "path": url.path,
+                    "query": url.query,
+                    "headers": dict(self.headers),
+                    "body": body,
+                })
+                stub.connections.add(self.client_address)
+                with stub._lock:
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                time.sleep(stub.delay)
+                with stub._lock:
+                    stub.active -= 1
+                route = stub.routes.get((self.command, url.path), (404, {"error": "not found"}))
+                # a route can also be a function of the recorded request
+                status_code, payload = route(stub.requests[-1]) if callable(route) else route
+                data = json.dumps(payload).encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def count(self, method: str, path: str) -> int:
+        return sum(1 for r in self.requests if r["method"] == method and r["path"] == path)
+
+# local Spotify stand-in, the services point to it instead of api.spotify.com
+@pytest_asyncio.fixture(scope="function")
+async def spotify_stub(monkeypatch):
+    stub = SpotifyStub()
+    stub.thread.start()
+    monkeypatch.setattr(spotify_auth_service, "SPOTIFY_CLIENT_ID", "test-client-id")
+    monkeypatch.setattr(spotify_auth_service, "SPOTIFY_CLIENT_SECRET", "test-client-secret")
+    monkeypatch.setattr(spotify_auth_service, "SPOTIFY_API_URL", stub.url + "/v1")
+    monkeypatch.setattr(spotify_auth_service, "SPOTIFY_ACCOUNTS_URL", stub.url)
+    monkeypatch.setattr(spotify_service, "client_id", "test-client-id")
+    monkeypatch.setattr(spotify_service, "client_secret", "test-client-secret")
+    monkeypatch.setattr(spotify_service, "base_url", stub.url + "/v1")
+    monkeypatch.setattr(spotify_service, "token_url", stub.url + "/api/token")
+    # every test starts without cached Spotify data
+    spotify_auth_service.app_token_cache.invalidate()
+    albums_cache.clear()
+    yield stub
+    spotify_auth_service.app_token_cache.invalidate()
+    albums_cache.clear()
+    # the shared client belongs to this test's event loop
+    await close_http_client()
+    stub.server.shutdown()
+    stub.server.server_close()
+
 @pytest.fixture(scope="function")
 def db_session():
     """Fixture que cria uma sessão de banco de dados para testes"""
@@ -70,6 +243,10 @@ def client(db_session):
             yield db_session
         finally:
             db_session.close()
+
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
     
     # Mock MongoDB for tests with proper async interface
     def override_get_mongo():
@@ -120,10 +297,17 @@ def client(db_session):
         return MockMongoDB()
     
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    # no replica in the tests, the read-only routes use the same database
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
     app.dependency_overrides[get_mongo_db_with_check] = override_get_mongo
+    # every test starts with a fresh database, so cached users from other tests are stale
+    current_user_cache.clear()
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
+    current_user_cache.clear()
 
 
 @pytest.fixture
@@ -187,4 +187,36 @@ def test_user_can_only_delete_own_profile(client: TestClient):
     headers = {"Authorization": f"Bearer {token1}"}
     response = client.delete("/user/user2/delete", headers=headers)
     assert response.status_code == status.HTTP_403_FORBIDDEN
-    assert "Você só pode deletar sua própria conta" in response.json()["detail"]
\ No newline at end of file
+    assert "Você só pode deletar sua própria conta" in response.json()["detail"]
+
+def test_login_token_carries_user_ids(client: TestClient, sample_user_data):
+    """Testa que o token emitido no login carrega os ids do SQL e do MongoDB (claims v2)"""
+    from jose import jwt
+    from app.JWT_token import SECRET_KEY, ALGORITHM, TOKEN_CLAIMS_VERSION
+
+    user_id = client.post("/user/", json=sample_user_data).json()["id"]
+    login_data = {
+        "username": sample_user_data["username"],
+        "password": sample_user_data["senha"]
+    }
+    token = client.post("/auth/login", data=login_data).json()["access_token"]
+
+    claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    assert claims["sub"] == sample_user_data["email"]
+    assert claims["uid"] == user_id
+    assert claims["mid"] == "mock_id"  # upserted_id of the mocked Users_cache
+    assert claims["ver"] == TOKEN_CLAIMS_VERSION
+
+    response = client.get("/user/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.json()["mongo_id"] == "mock_id"
+
+
+def test_token_without_claims_version_is_accepted(client: TestClient, sample_user_data):
+    """Testa que tokens antigos (apenas "sub") continuam válidos"""
+    from app.JWT_token import create_access_token
+
+    client.post("/user/", json=sample_user_data)
+    token = create_access_token(data={"sub": sample_user_data["email"]})
+
+    response = client.get("/user/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_200_OK
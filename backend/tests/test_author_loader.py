@@ -0,0 +1,98 @@
+"""
+Testes do AuthorLoader: autores de uma página resolvidos numa única consulta, com cache TTL
+"""
+import asyncio
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+from bson import ObjectId
+from app.models.mongo_users import UserCache
+from app.repositories.author_loader import AuthorLoader, DEFAULT_AUTHOR
+from app.repositories.users_cache_repository import UserCacheRepo
+
+
+def users_db(users):
+    # create a mock object to make possibel to access using "db['Users_cache']"
+    collection = MagicMock()
+    collection.find.return_value.to_list = AsyncMock(return_value=users)
+    collection.update_one = AsyncMock()
+    db = MagicMock()
+    db.__getitem__.return_value = collection
+    return db, collection
+
+
+@pytest.mark.asyncio
+async def test_concurrent_loads_are_batched():
+    ana, bia = ObjectId(), ObjectId()
+    db, collection = users_db([
+        {'_id': ana, 'sql_user_id': 1, 'name': 'Ana', 'user_photo_url': None},
+        {'_id': bia, 'sql_user_id': 2, 'name': 'Bia', 'user_photo_url': 'images/bia.jpg'},
+    ])
+    loader = AuthorLoader(db)
+
+    # e.g. the posts and the comments of the same request
+    first, second, missing = await asyncio.gather(
+        loader.load(str(ana)), loader.load(str(bia)), loader.load(str(ObjectId()))
+    )
+
+    assert first == {'name': 'Ana', 'user_photo_url': None}
+    assert second == {'name': 'Bia', 'user_photo_url': 'images/bia.jpg'}
+    assert missing is None
+    collection.find.assert_called_once()
+    assert len(collection.find.call_args[0][0]['_id']['$in']) == 3
+
+
+@pytest.mark.asyncio
+async def test_load_during_the_query_waits_for_its_result():
+    ana = ObjectId()
+    db, collection = users_db([])
+    released = asyncio.Event()
+
+    async def slow_query(length):
+        await released.wait()
+        return [{'_id': ana, 'sql_user_id': 1, 'name': 'Ana', 'user_photo_url': None}]
+
+    collection.find.return_value.to_list = slow_query
+    loader = AuthorLoader(db)
+    first = asyncio.ensure_future(loader.attach([{'author_id': str(ana)}]))
+    while not collection.find.called:
+        await asyncio.sleep(0)
+
+    # a second attach of the same request while the $in query is still running
+    items = [{'author_id': str(ana)}]
+    second = asyncio.ensure_future(loader.attach(items))
+    await asyncio.sleep(0)
+    released.set()
+    await asyncio.gather(first, second)
+
+    assert items[0]['author'] == {'name': 'Ana', 'user_photo_url': None}
+    collection.find.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_authors_are_cached_between_requests():
+    ana = ObjectId()
+    db, collection = users_db([{'_id': ana, 'sql_user_id': 1, 'name': 'Ana', 'user_photo_url': None}])
+
+    await AuthorLoader(db).load(str(ana))
+    items = [{'author_id': str(ana)}, {'author_id': 'not-an-id'}]
+    await AuthorLoader(db).attach(items)
+
+    assert items[0]['author'] == {'name': 'Ana', 'user_photo_url': None}
+    assert items[1]['author'] == DEFAULT_AUTHOR
+    # the second request had nothing valid left to ask for
+    collection.find.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_user_update_invalidates_the_cached_author():
+    ana = ObjectId()
+    db, collection = users_db([{'_id': ana, 'sql_user_id': 1, 'name': 'Ana', 'user_photo_url': None}])
+    await AuthorLoader(db).load(str(ana))
+
+    await UserCacheRepo(db).upsert_user_cache(UserCache(_id=str(ana), sql_user_id=1, name='Ana Maria', updated_at=datetime.now(timezone.utc)))
+    collection.find.return_value.to_list.return_value = [
+        {'_id': ana, 'sql_user_id': 1, 'name': 'Ana Maria', 'user_photo_url': None}
+    ]
+
+    assert (await AuthorLoader(db).load(str(ana)))['name'] == 'Ana Maria'
@@ -0,0 +1,47 @@
+"""
+Testes do job que preenche artist.spotify_id a partir da busca do Spotify
+"""
+import pytest
+from app.models_sql import Artist
+from app.jobs.backfill_artist_spotify_ids import backfill_artist_spotify_ids
+
+
+def search_route(request):
+    # answers each search with an artist named after the query, except for "Unknown"
+    query = dict(part.split("=", 1) for part in request["query"].split("&"))
+    name = query["q"].replace("+", " ")
+    if name == "Unknown":
+        return 200, {"artists": {"items": [{"id": "other", "name": "Someone Else"}]}}
+    return 200, {"artists": {"items": [{"id": f"id-{name.replace(' ', '-')}", "name": name.upper()}]}}
+
+
+@pytest.mark.asyncio
+async def test_backfill_fills_missing_ids(spotify_stub, db_session):
+    spotify_stub.routes[("GET", "/v1/search")] = search_route
+    db_session.add_all([
+        Artist(nome="Artist 1", music_genre="Rock"),
+        Artist(nome="Artist 2", music_genre="Pop"),
+        Artist(nome="Known", music_genre="Pop", spotify_id="known-id"),
+        Artist(nome="Unknown", music_genre="Pop"),
+    ])
+    db_session.commit()
+
+    report = await backfill_artist_spotify_ids(db_session, batch_size=2)
+
+    assert report == {"updated": 2, "not_found": ["Unknown"]}
+    ids = {artist.nome: artist.spotify_id for artist in db_session.query(Artist).all()}
+    assert ids == {"Artist 1": "id-Artist-1", "Artist 2": "id-Artist-2", "Known": "known-id", "Unknown": None}
+    # the artist that already had an id was not searched
+    assert spotify_stub.count("GET", "/v1/search") == 3
+
+
+@pytest.mark.asyncio
+async def test_backfill_dry_run_does_not_write(spotify_stub, db_session):
+    spotify_stub.routes[("GET", "/v1/search")] = search_route
+    db_session.add(Artist(nome="Artist 1", music_genre="Rock"))
+    db_session.commit()
+
+    report = await backfill_artist_spotify_ids(db_session, dry_run=True)
+
+    assert report["updated"] == 1
+    assert db_session.query(Artist).one().spotify_id is None
@@ -0,0 +1,67 @@
+"""
+Testes do cache TTL/LRU em memória usado por get_current_user
+"""
+import pytest
+from unittest.mock import patch
+from app.core.cache import TTLCache
+
+
+def test_get_returns_cached_value():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+
+
+def test_least_recently_used_item_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    # "a" becomes the most recently used, so "b" is evicted
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+
+
+def test_expired_item_is_not_returned():
+    cache = TTLCache(maxsize=2, ttl=10)
+    with patch('app.core.cache.time.monotonic', return_value=100.0):
+        cache.set('a', 1)
+    with patch('app.core.cache.time.monotonic', return_value=110.0):
+        assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_discard_where_removes_matching_items():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set('x@example.com', {'id': 1})
+    cache.set('y@example.com', {'id': 2})
+
+    removed = cache.discard_where(lambda key, value: value['id'] == 1)
+
+    assert removed == 1
+    assert cache.get('x@example.com') is None
+    assert cache.get('y@example.com') == {'id': 2}
+
+
+def test_current_user_cache_is_invalidated_on_update(client, sample_user_data):
+    """O usuário em cache deve refletir a atualização feita por update_user"""
+    client.post("/user/", json=sample_user_data)
+    response = client.post("/auth/login", data={
+        "username": sample_user_data["username"],
+        "password": sample_user_data["senha"]
+    })
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    # first authenticated request fills the cache
+    assert client.get("/user/me", headers=headers).json()["nome"] == sample_user_data["nome"]
+
+    update_data = {**sample_user_data, "nome": "Nome Atualizado"}
+    client.put(f"/user/{sample_user_data['username']}/update", json=update_data, headers=headers)
+
+    assert client.get("/user/me", headers=headers).json()["nome"] == "Nome Atualizado"
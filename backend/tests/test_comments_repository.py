@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock, Mock
 from app.repositories.comments_repository import CommentsRepo, CommentNotFoundError
+from app.repositories.author_loader import AuthorLoader
 from app.models.mongo_posts import CommentCreate
 from bson.errors import InvalidId
 from bson import ObjectId
@@ -143,9 +144,6 @@ async def test_get_post_comments():
             'author_id': ObjectId('68c70db5e711056c7db5e35c'),
             'content': 'Test',
             'likes': 1,
-            'liked_by': [
-                ObjectId('68c70db5e711056c7db5e35c')
-            ],
             'created_at': '2025-09-14 18:57:57.026249+00:00'
         },
         {
@@ -154,9 +152,6 @@ async def test_get_post_comments():
             'author_id': ObjectId('68c70db5e711056c7db5e35c'),
             'content': 'Test_2',
             'likes': 1,
-            'liked_by': [
-                ObjectId('68c70db5e711056c7db5e35c')
-            ],
             'created_at': '2025-09-14 18:57:57.026249+00:00'
         }
     ]
@@ -168,10 +163,8 @@ async def test_get_post_comments():
             'author_id': '68c70db5e711056c7db5e35c',
             'content': 'Test',
             'likes': 1,
-            'liked_by': [
-                '68c70db5e711056c7db5e35c'
-            ],
-            'created_at': '2025-09-14 18:57:57.026249+00:00'
+            'created_at': '2025-09-14 18:57:57.026249+00:00',
+            'author': {'name': 'Ana', 'user_photo_url': None}
         },
         {
             '_id': '68d44ffa3bf8996a42b85dd5',
@@ -179,10 +172,8 @@ async def test_get_post_comments():
             'author_id': '68c70db5e711056c7db5e35c',
             'content': 'Test_2',
             'likes': 1,
-            'liked_by': [
-                '68c70db5e711056c7db5e35c'
-            ],
-            'created_at': '2025-09-14 18:57:57.026249+00:00'
+            'created_at': '2025-09-14 18:57:57.026249+00:00',
+            'author': {'name': 'Ana', 'user_photo_url': None}
         }
     ]
 
@@ -191,12 +182,17 @@ async def test_get_post_comments():
     return_mock = AsyncMock()
     return_mock.to_list.return_value = db_response
     mock_collection.find.return_value.sort.return_value = return_mock
+    # the authors of the page come from Users_cache
+    users_collection = MagicMock()
+    users_collection.find.return_value.to_list = AsyncMock(return_value=[
+        {'_id': ObjectId('68c70db5e711056c7db5e35c'), 'sql_user_id': 1, 'name': 'Ana', 'user_photo_url': None}
+    ])
 
-    # create a mock object to make possibel to access using "db['Comments']"
+    # create a mock object to make possibel to access using "db['Comments']" and "db['Users_cache']"
     mock_db = MagicMock()
-    mock_db.__getitem__.return_value = mock_collection
+    mock_db.__getitem__.side_effect = {'Comments': mock_collection, 'Users_cache': users_collection}.__getitem__
 
-    repo = CommentsRepo(mock_db)
+    repo = CommentsRepo(mock_db, AuthorLoader(mock_db))
 
     comments = await repo.get_post_comments('68c9c040619f5b84f887d6da')
 
@@ -0,0 +1,60 @@
+"""
+Testes do engine do SQL: pragmas do SQLite em cada conexão e pool do tamanho do thread pool
+"""
+from sqlalchemy import text
+from app import database
+from app.database import create_db_engine
+
+
+def pragma(connection, name):
+    return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_pragmas_are_applied_to_every_connection(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    try:
+        with engine.connect() as first, engine.connect() as second:
+            for connection in (first, second):
+                assert pragma(connection, "journal_mode") == "wal"
+                # NORMAL
+                assert pragma(connection, "synchronous") == 1
+                assert pragma(connection, "busy_timeout") == database.SQLITE_BUSY_TIMEOUT_MS
+                assert pragma(connection, "cache_size") == -database.SQLITE_CACHE_SIZE_KB
+    finally:
+        engine.dispose()
+
+
+def test_pool_is_sized_for_the_thread_pool(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    assert engine.pool.size() == database.DB_POOL_SIZE
+    engine.dispose()
+
+
+def test_in_memory_database_keeps_the_single_connection_pool():
+    engine = create_db_engine("sqlite://")
+    with engine.connect() as connection:
+        assert pragma(connection, "busy_timeout") == database.SQLITE_BUSY_TIMEOUT_MS
+    engine.dispose()
+
+
+def test_writes_are_not_blocked_by_an_open_read(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE notification (id INTEGER PRIMARY KEY, content TEXT)"))
+        connection.execute(text("INSERT INTO notification (content) VALUES ('first')"))
+
+    reader = engine.connect()
+    try:
+        reader.exec_driver_sql("BEGIN")
+        assert reader.execute(text("SELECT count(*) FROM notification")).scalar() == 1
+
+        # with the rollback journal this commit waits for the reader until the busy timeout
+        with engine.begin() as writer:
+            writer.execute(text("INSERT INTO notification (content) VALUES ('second')"))
+
+        # the reader keeps its snapshot
+        assert reader.execute(text("SELECT count(*) FROM notification")).scalar() == 1
+        reader.exec_driver_sql("ROLLBACK")
+    finally:
+        reader.close()
+        engine.dispose()
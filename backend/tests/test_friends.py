@@ -0,0 +1,87 @@
+"""
+Testes do repositório de amizades na sessão assíncrona, no SQLite (aiosqlite) e no PostgreSQL (asyncpg)
+"""
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app import models_sql
+from app.database import base, create_async_db_engine
+from app.repositories import friends
+
+
+@pytest_asyncio.fixture
+async def db(sql_url):
+    engine = create_async_db_engine(sql_url)
+    async with engine.begin() as connection:
+        await connection.run_sync(base.metadata.create_all)
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as session:
+        session.add_all([
+            models_sql.User(id=1, username="ana", nome="Ana", email="ana@socialjam.com", senha="x"),
+            models_sql.User(id=2, username="bruno", nome="Bruno", email="bruno@socialjam.com", senha="x"),
+            models_sql.User(id=3, username="carla", nome="Carla", email="carla@socialjam.com", senha="x"),
+        ])
+        await session.commit()
+        yield session
+    async with engine.begin() as connection:
+        await connection.run_sync(base.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_accepted_request_creates_the_friendship(db):
+    request = await friends.send_friend_request(1, 2, db)
+    assert [r.id for r in await friends.get_friend_requests(2, db)] == [request.id]
+
+    await friends.respond_to_friend_request(request.id, "Accepted", 2, db)
+
+    assert await friends.get_friend_ids(1, db) == [2]
+    assert [user.username for user in await friends.get_friends(2, db)] == ["ana"]
+    assert await friends.get_friend_requests(2, db) == []
+    # one notification for the request, one for the answer
+    assert [n.user_id for n in await friends.get_user_notifications(2, db)] == [2]
+    assert [n.user_id for n in await friends.get_user_notifications(1, db)] == [1]
+
+
+@pytest.mark.asyncio
+async def test_duplicated_request_is_rejected(db):
+    await friends.send_friend_request(1, 2, db)
+
+    with pytest.raises(HTTPException) as error:
+        await friends.send_friend_request(2, 1, db)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_remove_friend_is_kept_in_the_history(db):
+    request = await friends.send_friend_request(3, 1, db)
+    await friends.respond_to_friend_request(request.id, "Accepted", 1, db)
+
+    await friends.remove_friend(1, 3, db)
+
+    assert await friends.get_friend_ids(1, db) == []
+    history = await friends.get_friend_request_history(3, db)
+    assert sorted(entry.action for entry in history) == ["accepted", "friendship_removed", "sent"]
+
+
+@pytest.mark.asyncio
+async def test_friendship_changes_update_the_timelines(db, monkeypatch):
+    timeline = MagicMock(on_friendship_created=AsyncMock(), on_friendship_removed=AsyncMock())
+    monkeypatch.setattr(friends, "is_mongo_connected", lambda: True)
+    monkeypatch.setattr(friends, "get_mongo_db", MagicMock())
+    monkeypatch.setattr(friends, "TimelineRepo", lambda mongo: timeline)
+
+    request = await friends.send_friend_request(3, 1, db)
+    await friends.respond_to_friend_request(request.id, "Accepted", 1, db)
+    timeline.on_friendship_created.assert_awaited_once_with(1, 3)
+
+    await friends.remove_friend(1, 3, db)
+    timeline.on_friendship_removed.assert_awaited_once_with(1, 3)
+
+
+@pytest.mark.asyncio
+async def test_search_users_skips_the_current_user(db):
+    users = await friends.search_users("r", 2, db)
+
+    assert [user.username for user in users] == ["carla"]
@@ -0,0 +1,163 @@
+"""
+Testes do store de imagens endereçado por conteúdo: contador de referências e coleta dos órfãos
+"""
+import os
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, Mock
+from bson import ObjectId
+from app.core.image_variants import variant_path
+from app.core.uploads import IMAGE_STORE_DIR, store_path
+from app.jobs.gc_images import gc_images
+from app.repositories.images_repository import ImagesRepo, image_key
+from app.repositories.posts_repository import PostsRepo
+from app.repositories import user as user_repository
+from app import models_sql
+from app.database import base, create_async_db_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+POST_ID = '68c9c040619f5b84f887d6da'
+DIGEST = 'ab' * 32
+OTHER_DIGEST = 'cd' * 32
+
+
+def mock_db(collections):
+    # create a mock object to make possibel to access using "db['Images']" and "db['Posts']"
+    db = MagicMock()
+    db.__getitem__.side_effect = collections.__getitem__
+    return db
+
+
+def write(path: str, content: bytes = b'img', age: float = 0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_image_key():
+    assert image_key('backend/images/store/ab/cd/x.png') == 'images/store/ab/cd/x.png'
+    assert image_key('images/store/ab/cd/x.png') == 'images/store/ab/cd/x.png'
+
+
+@pytest.mark.asyncio
+async def test_only_images_of_the_store_are_counted():
+    collections = {'Images': AsyncMock()}
+    stored = store_path(IMAGE_STORE_DIR, DIGEST, '.png')
+
+    await ImagesRepo(mock_db(collections)).acquire([stored, 'images/posts/old.png', stored])
+
+    updates = collections['Images'].bulk_write.call_args[0][0]
+    assert [update._filter for update in updates] == [{'_id': stored}, {'_id': stored}]
+    assert updates[0]._doc['$inc'] == {'refs': 1}
+
+
+@pytest.mark.asyncio
+async def test_replacing_a_photo_with_the_same_content_does_nothing():
+    collections = {'Images': AsyncMock()}
+    stored = store_path(IMAGE_STORE_DIR, DIGEST, '.png')
+
+    await ImagesRepo(mock_db(collections)).replace(f'backend/{stored}', f'backend/{stored}')
+
+    collections['Images'].bulk_write.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_delete_post_releases_its_images():
+    stored = store_path(IMAGE_STORE_DIR, DIGEST, '.png')
+    collections = {'Posts': AsyncMock(), 'Images': AsyncMock()}
+    collections['Posts'].find_one_and_delete.return_value = {'_id': ObjectId(POST_ID), 'images': [stored]}
+
+    assert await PostsRepo(mock_db(collections)).delete_post(POST_ID) == 1
+
+    updates = collections['Images'].bulk_write.call_args[0][0]
+    # a release never creates a counter nor takes it below zero
+    assert updates[0]._filter == {'_id': stored, 'refs': {'$gt': 0}}
+    assert updates[0]._doc['$inc'] == {'refs': -1}
+    assert not updates[0]._upsert
+
+
+@pytest.mark.asyncio
+async def test_delete_user_releases_the_profile_photo(monkeypatch):
+    stored = store_path(IMAGE_STORE_DIR, DIGEST, '.png')
+    collections = {'Images': AsyncMock()}
+    monkeypatch.setattr(user_repository, 'is_mongo_connected', lambda: True)
+    monkeypatch.setattr(user_repository, 'get_mongo_db', lambda: mock_db(collections))
+    engine = create_async_db_engine('sqlite://')
+    async with engine.begin() as connection:
+        await connection.run_sync(base.metadata.create_all)
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as db:
+        db.add(models_sql.User(username='ana', nome='Ana', email='ana@socialjam.com', senha='x', user_photo_url=f'backend/{stored}'))
+        await db.commit()
+
+        await user_repository.delete_user('ana', db)
+    await engine.dispose()
+
+    updates = collections['Images'].bulk_write.call_args[0][0]
+    assert updates[0]._filter == {'_id': stored, 'refs': {'$gt': 0}}
+
+
+@pytest.mark.asyncio
+async def test_create_post_acquires_its_images():
+    from app.models.mongo_posts import PostCreate
+    stored = store_path(IMAGE_STORE_DIR, DIGEST, '.png')
+    collections = {'Posts': AsyncMock(), 'Images': AsyncMock()}
+    collections['Posts'].insert_one.return_value = Mock(inserted_id=POST_ID)
+
+    post = PostCreate(author_id='68c70db5e711056c7db5e35c', content='Test123', artist_id='artist123', images=[stored])
+    await PostsRepo(mock_db(collections)).create_post(post)
+
+    assert collections['Images'].bulk_write.call_args[0][0][0]._doc['$inc'] == {'refs': 1}
+
+
+@pytest.mark.asyncio
+async def test_gc_removes_orphans_with_their_variants(tmp_path):
+    directory = str(tmp_path)
+    orphan = write(store_path(directory, DIGEST, '.png'), age=3600)
+    orphan_variant = write(variant_path(orphan, 160), age=3600)
+    used = write(store_path(directory, OTHER_DIGEST, '.jpg'), age=3600)
+    interrupted = write(os.path.join(directory, '.upload.part'), age=3600)
+    collections = {'Images': MagicMock()}
+    collections['Images'].find.return_value.to_list = AsyncMock(return_value=[{'_id': used}])
+    collections['Images'].delete_many = AsyncMock()
+
+    report = await gc_images(mock_db(collections), directory, grace_seconds=60)
+
+    assert sorted(report['deleted']) == sorted([orphan, orphan_variant, interrupted])
+    assert report['kept'] == 1
+    assert os.path.exists(used) and not os.path.exists(orphan)
+    # the counter is dropped only if it is still zero
+    assert collections['Images'].delete_many.call_args[0][0] == {'_id': {'$in': [orphan]}, 'refs': 0}
+
+
+@pytest.mark.asyncio
+async def test_gc_keeps_recent_and_protected_files(tmp_path):
+    directory = str(tmp_path)
+    # just uploaded, the post may not exist yet
+    recent = write(store_path(directory, DIGEST, '.png'))
+    # profile picture saved while mongoDB was down
+    photo = write(store_path(directory, OTHER_DIGEST, '.png'), age=3600)
+    collections = {'Images': MagicMock()}
+    collections['Images'].find.return_value.to_list = AsyncMock(return_value=[])
+    collections['Images'].delete_many = AsyncMock()
+
+    report = await gc_images(mock_db(collections), directory, grace_seconds=60, protected=[f'backend/{photo}'])
+
+    assert report == {'kept': 2, 'deleted': [], 'bytes': 0}
+    assert os.path.exists(recent) and os.path.exists(photo)
+
+
+@pytest.mark.asyncio
+async def test_gc_dry_run_deletes_nothing(tmp_path):
+    orphan = write(store_path(str(tmp_path), DIGEST, '.png'), age=3600)
+    collections = {'Images': MagicMock()}
+    collections['Images'].find.return_value.to_list = AsyncMock(return_value=[])
+    collections['Images'].delete_many = AsyncMock()
+
+    report = await gc_images(mock_db(collections), str(tmp_path), grace_seconds=60, dry_run=True)
+
+    assert report['deleted'] == [orphan]
+    assert os.path.exists(orphan)
+    collections['Images'].delete_many.assert_not_called()
@@ -0,0 +1,121 @@
+"""
+Testes das variantes menores das imagens (geradas em segundo plano num pool de processos)
+"""
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.core import image_variants as variants_module
+from app.repositories.users_cache_repository import UserCacheRepo
+from app.core.image_variants import ImageVariantsWorker, make_variants, variant_path
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    monkeypatch.setattr(variants_module, "PILLOW_AVAILABLE", True)
+    monkeypatch.setattr(variants_module, "IMAGE_VARIANTS_ENABLED", True)
+    return ImageVariantsWorker(workers=1)
+
+
+def test_variant_path():
+    assert variant_path("images/posts/abc.png", 640, "webp") == "images/posts/abc_w640.webp"
+    assert variant_path("images/posts/abc.png", 160, "jpeg") == "images/posts/abc_w160.jpg"
+
+
+@pytest.mark.asyncio
+async def test_nothing_is_scheduled_without_pillow(worker, monkeypatch):
+    monkeypatch.setattr(variants_module, "PILLOW_AVAILABLE", False)
+
+    assert worker.schedule(["images/posts/abc.png"], None) is None
+    assert worker.stats()["enabled"] is False
+
+
+@pytest.mark.asyncio
+async def test_variants_are_recorded_in_the_upload_order(worker, monkeypatch):
+    async def generate(path):
+        return {"160": variant_path(path, 160)}
+    monkeypatch.setattr(worker, "generate", generate)
+    recorded = []
+
+    async def on_done(variants):
+        recorded.append(variants)
+
+    await worker.schedule(["a.png", "b.jpg"], on_done)
+
+    assert recorded == [[{"160": "a_w160.webp"}, {"160": "b_w160.webp"}]]
+    assert worker.stats()["generated"] == 2
+    assert worker.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failures_are_counted_and_do_not_raise(worker, monkeypatch):
+    async def generate(path):
+        raise OSError("cannot identify image file")
+    monkeypatch.setattr(worker, "generate", generate)
+
+    async def on_done(variants):
+        raise AssertionError("not called")
+
+    await worker.schedule(["broken.png"], on_done)
+
+    assert worker.stats()["failed"] == 1
+
+
+def test_make_variants_only_shrinks(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    path = str(tmp_path / "photo.png")
+    Image.new("RGBA", (800, 400), (255, 0, 0, 128)).save(path)
+
+    variants = make_variants(path, [160, 640, 1080], "webp", 80)
+
+    assert variants == {"160": variant_path(path, 160, "webp"), "640": variant_path(path, 640, "webp")}
+    with Image.open(variants["160"]) as small:
+        assert small.size == (160, 80)
+    assert not os.path.exists(variant_path(path, 1080, "webp"))
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+
+
+def test_interrupted_save_leaves_no_variant(tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    path = str(tmp_path / "photo.png")
+    Image.new("RGB", (800, 400)).save(path)
+
+    def truncated_save(self, fp, *args, **kwargs):
+        with open(fp, "wb") as output:
+            output.write(b"RIFF")
+        raise OSError("No space left on device")
+    monkeypatch.setattr(Image.Image, "save", truncated_save)
+
+    with pytest.raises(OSError):
+        make_variants(path, [160], "webp", 80)
+
+    # nothing half written in the store, the next upload generates the variant again
+    assert os.listdir(tmp_path) == ["photo.png"]
+
+
+@pytest.mark.asyncio
+async def test_generate_in_the_process_pool(worker, tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    path = str(tmp_path / "photo.jpg")
+    Image.new("RGB", (1200, 900)).save(path)
+
+    try:
+        variants = await worker.generate(path)
+    finally:
+        await worker.stop()
+
+    assert set(variants) == {"160", "640", "1080"}
+
+
+@pytest.mark.asyncio
+async def test_variants_only_apply_to_the_current_photo():
+    collection = MagicMock()
+    collection.update_one = AsyncMock(return_value=MagicMock(modified_count=0))
+    db = MagicMock()
+    db.__getitem__.return_value = collection
+
+    # the resize of the first upload finishing after the second upload
+    await UserCacheRepo(db).set_photo_variants(1, "backend/images/store/old.png", {160: "backend/images/store/old_w160.webp"})
+
+    query, update = collection.update_one.call_args[0]
+    assert query == {"sql_user_id": 1, "user_photo_url": "backend/images/store/old.png"}
+    assert "user_photo_url" not in update["$set"]
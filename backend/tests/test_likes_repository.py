@@ -0,0 +1,103 @@
+"""
+Testes da collection Likes (uma curtida por documento, contador nos posts e comentários)
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, Mock
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from app.core.mongo_indexes import managed_indexes, reconcile_indexes
+from app.jobs.migrate_likes import migrate_likes
+from app.repositories.likes_repository import LikesRepo
+
+POST_ID = '68c70db5e711056c7db5e35c'
+USER_ID = '68c70db5e711056c7db5e35d'
+
+
+def mock_db(collections):
+    # create a mock object to make possibel to access using "db['Likes']" and "db['Posts']"
+    db = MagicMock()
+    db.__getitem__.side_effect = collections.__getitem__
+    return db
+
+
+@pytest.mark.asyncio
+async def test_like_is_idempotent():
+    collections = {'Likes': AsyncMock(), 'Posts': AsyncMock()}
+    collections['Likes'].insert_one.side_effect = DuplicateKeyError('duplicate')
+
+    liked = await LikesRepo(mock_db(collections)).like('post', POST_ID, USER_ID)
+
+    assert liked is True
+    # the counter only moves when the like is new
+    collections['Posts'].update_one.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_toggle_removes_an_existing_like():
+    collections = {'Likes': AsyncMock(), 'Posts': AsyncMock()}
+    collections['Likes'].insert_one.side_effect = DuplicateKeyError('duplicate')
+    collections['Likes'].delete_one.return_value = Mock(deleted_count=1)
+    collections['Posts'].find_one_and_update.return_value = {'likes': 0}
+
+    result = await LikesRepo(mock_db(collections)).toggle('post', POST_ID, USER_ID)
+
+    assert result == {'liked': False, 'likes': 0}
+    assert collections['Posts'].find_one_and_update.call_args[0][1] == {'$inc': {'likes': -1}}
+
+
+@pytest.mark.asyncio
+async def test_liked_by_user_is_a_single_query():
+    post_ids = [str(ObjectId()) for _ in range(3)]
+    collections = {'Likes': MagicMock()}
+    collections['Likes'].find.return_value.to_list = AsyncMock(return_value=[{'target_id': ObjectId(post_ids[1])}])
+
+    liked = await LikesRepo(mock_db(collections)).liked_by_user(USER_ID, post_ids)
+
+    assert liked == {post_ids[1]}
+    collections['Likes'].find.assert_called_once()
+    query = collections['Likes'].find.call_args[0][0]
+    assert query == {'target_id': {'$in': [ObjectId(post_id) for post_id in post_ids]}, 'user_id': ObjectId(USER_ID)}
+
+
+@pytest.mark.asyncio
+async def test_liked_by_user_without_targets():
+    collections = {'Likes': MagicMock()}
+
+    assert await LikesRepo(mock_db(collections)).liked_by_user(USER_ID, []) == set()
+    collections['Likes'].find.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_on_post_deleted_removes_the_likes_of_the_comments():
+    comment_id = ObjectId()
+    collections = {'Likes': AsyncMock(), 'Comments': AsyncMock()}
+    collections['Comments'].distinct.return_value = [comment_id]
+    collections['Likes'].delete_many.return_value = Mock(deleted_count=2)
+
+    deleted = await LikesRepo(mock_db(collections)).on_post_deleted(POST_ID)
+
+    assert deleted == 2
+    query = collections['Likes'].delete_many.call_args[0][0]
+    assert query == {'target_id': {'$in': [ObjectId(POST_ID), comment_id]}}
+
+
+@pytest.mark.asyncio
+async def test_migrate_likes_moves_the_liked_by_arrays(live_mongo):
+    await reconcile_indexes(live_mongo, {'Likes': managed_indexes()['Likes']})
+    users = [ObjectId() for _ in range(3)]
+    post_id = (await live_mongo['Posts'].insert_one({'likes': 7, 'liked_by': users})).inserted_id
+    comment_id = (await live_mongo['Comments'].insert_one({'likes': 1, 'liked_by': [str(users[0])]})).inserted_id
+
+    await migrate_likes(live_mongo, batch_size=1)
+    # a second run finds nothing left to migrate
+    report = await migrate_likes(live_mongo)
+
+    assert report == {'post': {'migrated': 0, 'likes_inserted': 0}, 'comment': {'migrated': 0, 'likes_inserted': 0}}
+    post = await live_mongo['Posts'].find_one({'_id': post_id})
+    assert post == {'_id': post_id, 'likes': 3}
+    assert await live_mongo['Likes'].count_documents({'target_id': post_id}) == 3
+    assert await live_mongo['Likes'].count_documents({'target_id': comment_id, 'user_id': users[0]}) == 1
+
+    liked = await LikesRepo(live_mongo).liked_by_user(str(users[0]), [str(post_id), str(comment_id)])
+    assert liked == {str(post_id), str(comment_id)}
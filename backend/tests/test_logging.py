@@ -0,0 +1,92 @@
+"""
+Testes do logging do app: fila não bloqueante, níveis por módulo, amostragem e formato JSON
+"""
+import io
+import json
+import logging
+import time
+import pytest
+from app.core import logging as app_logging
+from app.core.logging import SamplingFilter, parse_module_settings, setup_logging, stop_logging
+
+
+class SlowStream(io.StringIO):
+    # a terminal or pipe that takes a while to accept each line
+    def write(self, text):
+        time.sleep(0.05)
+        return super().write(text)
+
+
+@pytest.fixture
+def log_stream(monkeypatch):
+    monkeypatch.setattr(app_logging, "LOG_LEVELS", "tests.quiet=WARNING")
+    monkeypatch.setattr(app_logging, "LOG_SAMPLE_RATES", "tests.hot=0.25")
+    stream = io.StringIO()
+    setup_logging(stream)
+    yield stream
+    logging.getLogger("tests.quiet").setLevel(logging.NOTSET)
+    # back to the configuration of the app
+    monkeypatch.undo()
+    setup_logging()
+
+
+def test_parse_module_settings():
+    assert parse_module_settings("app.a=DEBUG, app.b = 0.1,invalid,") == {"app.a": "DEBUG", "app.b": "0.1"}
+
+
+def test_sampling_keeps_one_in_n_and_every_warning():
+    sampling = SamplingFilter(0.25)
+    info = logging.LogRecord("hot", logging.INFO, "", 0, "msg", (), None)
+    warning = logging.LogRecord("hot", logging.WARNING, "", 0, "msg", (), None)
+
+    assert [sampling.filter(info) for _ in range(8)] == [True, False, False, False] * 2
+    assert all(sampling.filter(warning) for _ in range(4))
+    assert not SamplingFilter(0).filter(info)
+
+
+def test_levels_and_sampling_per_module(log_stream):
+    logging.getLogger("tests.quiet").info("hidden")
+    logging.getLogger("tests.quiet").warning("shown")
+    for i in range(8):
+        logging.getLogger("tests.hot").info("page %s", i)
+    stop_logging()
+
+    lines = log_stream.getvalue().splitlines()
+    assert not any("hidden" in line for line in lines)
+    assert any("shown" in line for line in lines)
+    assert [line.split(": ")[-1] for line in lines if "tests.hot" in line] == ["page 0", "page 4"]
+
+
+def test_json_format_with_extra_fields(monkeypatch):
+    monkeypatch.setattr(app_logging, "LOG_FORMAT", "json")
+    stream = io.StringIO()
+    setup_logging(stream)
+    try:
+        logging.getLogger("tests.json").info("Posts do artista carregados", extra={"artist_id": "a1", "count": 3})
+    finally:
+        stop_logging()
+        monkeypatch.undo()
+        setup_logging()
+
+    entry = json.loads(stream.getvalue())
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "tests.json"
+    assert entry["message"] == "Posts do artista carregados"
+    assert entry["artist_id"] == "a1" and entry["count"] == 3
+
+
+def test_logging_does_not_wait_for_the_output():
+    stream = SlowStream()
+    setup_logging(stream)
+    try:
+        start = time.perf_counter()
+        for i in range(10):
+            logging.getLogger("tests.slow").warning("record %s", i)
+        elapsed = time.perf_counter() - start
+    finally:
+        stop_logging()
+        setup_logging()
+
+    # writing takes 0.5s in the listener thread, the caller only puts the records on the queue
+    assert elapsed < 0.1
+    assert stream.getvalue().count("record") == 10
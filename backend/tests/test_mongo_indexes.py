@@ -0,0 +1,216 @@
+"""
+Testes do registro de índices do MongoDB
+
+Os testes de plano de consulta usam um MongoDB real (fixture live_mongo) e são
+pulados quando não há um servidor disponível.
+"""
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, MagicMock
+from datetime import datetime, timezone
+from bson import ObjectId
+from app.core.mongo_indexes import managed_indexes, reconcile_indexes
+from app.core.pagination import encode_cursor
+from app.repositories.posts_repository import PostsRepo
+from app.repositories.comments_repository import CommentsRepo
+from app.repositories.likes_repository import LikesRepo
+from app.repositories.timeline_repository import TimelineRepo
+from app.repositories.users_cache_repository import UserCacheRepo
+
+POST_ID = '68c9c040619f5b84f887d6da'
+AUTHOR_ID = '68c70db5e711056c7db5e35c'
+CURSOR = encode_cursor(datetime(2025, 9, 14, tzinfo=timezone.utc), POST_ID)
+
+
+@pytest.mark.asyncio
+async def test_reconcile_creates_missing_and_reports_drift():
+    registry = {
+        'Users_cache': [
+            {'keys': [('sql_user_id', 1)], 'unique': True},
+            {'keys': [('name', 1)]},
+        ]
+    }
+    # the sql_user_id index exists but isn't unique and there is an index that isn't in the registry
+    mock_collection = AsyncMock()
+    mock_collection.index_information.return_value = {
+        '_id_': {'key': [('_id', 1)]},
+        'sql_user_id_1': {'key': [('sql_user_id', 1)]},
+        'updated_at_1': {'key': [('updated_at', 1)]},
+    }
+    mock_collection.create_index.return_value = 'name_1'
+
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+
+    report = await reconcile_indexes(mock_db, registry)
+
+    mock_collection.create_index.assert_called_once_with([('name', 1)], unique=False)
+    assert report['created'] == ['Users_cache.name_1']
+    assert report['drifted'] == ['Users_cache.sql_user_id_1: unique=False, esperado unique=True']
+    assert report['unmanaged'] == ['Users_cache.updated_at_1']
+
+
+def plan_stages(plan) -> set:
+    # collects every "stage" of an explain output, whatever the server version layout is
+    stages = set()
+    if isinstance(plan, dict):
+        for key, value in plan.items():
+            if key == 'stage' and isinstance(value, str):
+                stages.add(value)
+            else:
+                stages |= plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            stages |= plan_stages(item)
+    return stages
+
+def assert_uses_index(explain, blocking_sort=False):
+    stages = plan_stages(explain)
+    assert 'IXSCAN' in stages, stages
+    assert 'COLLSCAN' not in stages, stages
+    # a blocking SORT means the index doesn't cover the requested order
+    if not blocking_sort:
+        assert 'SORT' not in stages, stages
+
+async def explain_aggregate(db, collection, pipeline):
+    return await db.command(
+        'explain',
+        {'aggregate': collection, 'pipeline': pipeline, 'cursor': {}},
+        verbosity='queryPlanner'
+    )
+
+def captured_pipeline():
+    # mock db that records the pipeline sent to aggregate by the repository
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value.aggregate.return_value.to_list = AsyncMock(return_value=[])
+    return mock_db
+
+class RecordingCollection:
+    """Coleção real que guarda os cursores das consultas do repositório, para o explain"""
+
+    def __init__(self, collection, cursors):
+        self._collection = collection
+        self._cursors = cursors
+
+    def find(self, *args, **kwargs):
+        # the repository sorts and limits this same cursor object
+        cursor = self._collection.find(*args, **kwargs)
+        self._cursors.append(cursor)
+        return cursor
+
+    async def find_one(self, filter=None, *args, **kwargs):
+        # find_one is a find limited to one document, with the same plan
+        self._cursors.append(self._collection.find(filter, *args, **kwargs).limit(1))
+        return await self._collection.find_one(filter, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+class RecordingDb:
+    def __init__(self, db):
+        self._db = db
+        self.cursors = []
+
+    def __getitem__(self, name):
+        return RecordingCollection(self._db[name], self.cursors)
+
+@pytest_asyncio.fixture
+async def indexed_db(live_mongo):
+    await reconcile_indexes(live_mongo, managed_indexes(unique_user_cache=True))
+    # some data so the query planner has real collections to plan against
+    now = datetime.now(timezone.utc)
+    await live_mongo['Posts'].insert_many([
+        {'author_id': ObjectId(AUTHOR_ID), 'artist_id': f'artist{i % 3}', 'content': 'Test', 'created_at': now}
+        for i in range(20)
+    ])
+    await live_mongo['Comments'].insert_many([
+        {'post_id': ObjectId(POST_ID), 'author_id': ObjectId(AUTHOR_ID), 'content': 'Test', 'created_at': now}
+        for _ in range(20)
+    ])
+    await live_mongo['Users_cache'].insert_many([
+        {'sql_user_id': i, 'name': f'user{i}'} for i in range(20)
+    ])
+    await live_mongo['Likes'].insert_many([
+        {'target_id': ObjectId(), 'target_type': 'post', 'user_id': ObjectId(AUTHOR_ID), 'created_at': now}
+        for _ in range(20)
+    ])
+    await live_mongo['Timelines'].insert_many([
+        {'user_id': i % 3, 'post_id': ObjectId(), 'author_id': ObjectId(AUTHOR_ID), 'created_at': now}
+        for i in range(20)
+    ])
+    return live_mongo
+
+
+@pytest.mark.asyncio
+async def test_get_post_list_uses_index(indexed_db):
+    mock_db = captured_pipeline()
+    await PostsRepo(mock_db).get_post_list(10, CURSOR)
+    pipeline = mock_db['Posts'].aggregate.call_args[0][0]
+
+    assert_uses_index(await explain_aggregate(indexed_db, 'Posts', pipeline))
+
+@pytest.mark.asyncio
+async def test_get_posts_by_artist_uses_index(indexed_db):
+    mock_db = captured_pipeline()
+    await PostsRepo(mock_db).get_posts_by_artist('artist1', 10, CURSOR)
+    pipeline = mock_db['Posts'].aggregate.call_args[0][0]
+
+    assert_uses_index(await explain_aggregate(indexed_db, 'Posts', pipeline))
+
+@pytest.mark.asyncio
+async def test_get_post_comments_uses_index(indexed_db):
+    db = RecordingDb(indexed_db)
+    await CommentsRepo(db).get_post_comments(POST_ID, 10, CURSOR)
+    # the next cursors are the authors of the comments
+    comments = db.cursors[0]
+
+    assert_uses_index(await comments.explain())
+
+@pytest.mark.asyncio
+async def test_get_mongo_id_by_sql_id_uses_index(indexed_db):
+    db = RecordingDb(indexed_db)
+    await UserCacheRepo(db).get_mongo_id_by_sql_id(7)
+    [cursor] = db.cursors
+
+    assert_uses_index(await cursor.explain())
+
+@pytest.mark.asyncio
+async def test_timeline_inbox_uses_index(indexed_db):
+    db = RecordingDb(indexed_db)
+    await TimelineRepo(db).get_timeline_post_ids(1, 10, CURSOR)
+    [inbox] = db.cursors
+
+    assert_uses_index(await inbox.explain())
+
+@pytest.mark.asyncio
+async def test_timeline_pulled_posts_use_index(indexed_db):
+    db = RecordingDb(indexed_db)
+    await TimelineRepo(db).get_timeline_post_ids(1, 10, pull_author_ids=[ObjectId(AUTHOR_ID), ObjectId()])
+    [inbox, pulled] = db.cursors
+
+    assert_uses_index(await pulled.explain())
+
+@pytest.mark.asyncio
+async def test_fanout_on_read_authors_use_index(indexed_db):
+    db = RecordingDb(indexed_db)
+    await TimelineRepo(db).get_fanout_on_read_authors()
+    [cursor] = db.cursors
+
+    assert_uses_index(await cursor.explain())
+
+@pytest.mark.asyncio
+async def test_liked_by_user_uses_index(indexed_db):
+    db = RecordingDb(indexed_db)
+    await LikesRepo(db).liked_by_user(AUTHOR_ID, [POST_ID, str(ObjectId())])
+    [cursor] = db.cursors
+
+    assert_uses_index(await cursor.explain())
+
+@pytest.mark.asyncio
+async def test_get_posts_by_ids_uses_index(indexed_db):
+    mock_db = captured_pipeline()
+    await PostsRepo(mock_db).get_posts_by_ids([POST_ID, str(ObjectId())])
+    pipeline = mock_db['Posts'].aggregate.call_args[0][0]
+
+    # the _id index finds the page, sorting at most one page of documents is expected
+    assert_uses_index(await explain_aggregate(indexed_db, 'Posts', pipeline), blocking_sort=True)
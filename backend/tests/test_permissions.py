@@ -58,6 +58,12 @@ def test_create_album_blocked_even_with_auth(client: TestClient, sample_user_dat
     assert "Criação de álbuns não permitida" in response.json()["detail"]
 
 
+def test_refresh_albums_blocked_for_users(client: TestClient):
+    """Testa que usuários comuns não podem reimportar os álbuns do Spotify"""
+    response = client.get("/spotify/albums?refresh=true")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
 def test_read_artists_still_works(client: TestClient):
     """Testa que a leitura de artistas ainda funciona"""
     # Não deve retornar erro, mesmo que não tenha artistas
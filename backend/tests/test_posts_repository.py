@@ -1,8 +1,13 @@
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, MagicMock, Mock
-from app.repositories.posts_repository import PostsRepo, PostNotFoundError
+from app.repositories.posts_repository import PostsRepo, PostNotFoundError, InvalidFieldsError, parse_fields, projection_stages
 from app.models.mongo_posts import PostCreate
+from app.core.mongo_indexes import managed_indexes, reconcile_indexes
+from app.core.pagination import encode_cursor, decode_cursor, next_cursor, InvalidCursorError
 from bson.errors import InvalidId
+from bson import ObjectId
+from datetime import datetime, timezone
 
 @pytest.mark.asyncio
 async def test_get_post_by_id_found():
@@ -120,4 +125,149 @@ async def test_delete_post_invalid_id():
     repo = PostsRepo(mock_db)
 
     with pytest.raises(InvalidId):
-        await repo.delete_post('123')
\ No newline at end of file
+        await repo.delete_post('123')
+
+@pytest.mark.asyncio
+async def test_get_post_list_with_cursor():
+    created_at = datetime(2025, 9, 14, 18, 57, 57, 26000, tzinfo=timezone.utc)
+    cursor = encode_cursor(created_at, '68c70db5e711056c7db5e35c')
+    # create a mock for the aggregate cursor of mongoDB lib
+    mock_collection = MagicMock()
+    mock_collection.aggregate.return_value.to_list = AsyncMock(return_value=[])
+
+    # create a mock object to make possibel to access using "db['Posts']"
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+
+    repo = PostsRepo(mock_db)
+
+    await repo.get_post_list(10, cursor)
+
+    pipeline = mock_collection.aggregate.call_args[0][0]
+    assert pipeline[0] == {'$match': {'$or': [
+        {'created_at': {'$lt': created_at}},
+        {'created_at': created_at, '_id': {'$lt': ObjectId('68c70db5e711056c7db5e35c')}},
+    ]}}
+    assert pipeline[1] == {'$sort': {'created_at': -1, '_id': -1}}
+
+@pytest.mark.asyncio
+async def test_get_post_list_invalid_cursor():
+    mock_db = MagicMock()
+
+    repo = PostsRepo(mock_db)
+
+    with pytest.raises(InvalidCursorError):
+        await repo.get_post_list(10, 'not-a-cursor')
+
+def test_next_cursor_only_when_page_is_full():
+    posts = [
+        {'_id': '68c70db5e711056c7db5e35c', 'created_at': datetime(2025, 9, 14, 18, 57, 57)},
+        {'_id': '68c9c040619f5b84f887d6da', 'created_at': datetime(2025, 9, 14, 18, 50, 0)},
+    ]
+
+    assert next_cursor(posts, 3) is None
+    assert decode_cursor(next_cursor(posts, 2)) == (
+        datetime(2025, 9, 14, 18, 50, 0, tzinfo=timezone.utc),
+        ObjectId('68c9c040619f5b84f887d6da'),
+    )
+
+@pytest.mark.asyncio
+async def test_toggle_like_post_uses_the_likes_collection():
+    collections = {'Likes': AsyncMock(), 'Posts': AsyncMock()}
+    collections['Posts'].find_one_and_update.return_value = {'likes': 3}
+    mock_db = MagicMock()
+    mock_db.__getitem__.side_effect = collections.__getitem__
+
+    repo = PostsRepo(mock_db)
+    result = await repo.toggle_like_post('68c70db5e711056c7db5e35c', '68c70db5e711056c7db5e35d')
+
+    assert result == {'liked': True, 'likes': 3}
+    collections['Likes'].insert_one.assert_awaited_once()
+    # only the counter is written to the post
+    update = collections['Posts'].find_one_and_update.call_args[0][1]
+    assert update == {'$inc': {'likes': 1}}
+
+@pytest.mark.asyncio
+async def test_toggle_like_post_not_found():
+    collections = {'Likes': AsyncMock(), 'Posts': AsyncMock()}
+    collections['Posts'].find_one_and_update.return_value = None
+    mock_db = MagicMock()
+    mock_db.__getitem__.side_effect = collections.__getitem__
+
+    repo = PostsRepo(mock_db)
+    with pytest.raises(PostNotFoundError):
+        await repo.toggle_like_post('68c70db5e711056c7db5e35c', '68c70db5e711056c7db5e35d')
+    # the like of a missing post is rolled back
+    collections['Likes'].delete_one.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_concurrent_toggles_keep_likes_consistent(live_mongo):
+    # needs a real MongoDB, the unique index on Likes decides the races
+    await reconcile_indexes(live_mongo, {'Likes': managed_indexes()['Likes']})
+    post_id = (await live_mongo['Posts'].insert_one({'likes': 0})).inserted_id
+    users = [str(ObjectId()) for _ in range(100)]
+    repo = PostsRepo(live_mongo)
+
+    # every user toggles 3 times in parallel with everybody else, so all of them end up liking the post
+    await asyncio.gather(*[repo.toggle_like_post(str(post_id), user) for user in users * 3])
+
+    post = await live_mongo['Posts'].find_one({'_id': post_id})
+    likes = await live_mongo['Likes'].count_documents({'target_id': post_id})
+    assert post['likes'] == likes == 100
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields('content, author,likes') == {'content', 'author', 'likes', 'created_at'}
+    with pytest.raises(InvalidFieldsError):
+        parse_fields('content,liked_by')
+
+def test_projection_keeps_author_id_only_for_the_author():
+    assert projection_stages({'content', 'likes', 'created_at'}) == [
+        {'$project': {'_id': {'$toString': '$_id'}, 'content': 1, 'likes': 1, 'created_at': 1}}
+    ]
+    assert projection_stages({'author', 'created_at'}) == [
+        {'$project': {'_id': {'$toString': '$_id'}, 'author_id': {'$toString': '$author_id'}, 'created_at': 1}}
+    ]
+
+@pytest.mark.asyncio
+async def test_get_post_list_resolves_authors_in_one_query():
+    authors = [ObjectId(), ObjectId()]
+    collections = {'Posts': MagicMock(), 'Users_cache': MagicMock()}
+    collections['Posts'].aggregate.return_value.to_list = AsyncMock(return_value=[
+        {'_id': str(ObjectId()), 'author_id': str(authors[i % 2]), 'created_at': datetime(2025, 9, 14)}
+        for i in range(6)
+    ])
+    collections['Users_cache'].find.return_value.to_list = AsyncMock(return_value=[
+        {'_id': authors[0], 'sql_user_id': 1, 'name': 'Ana', 'user_photo_url': None},
+    ])
+    mock_db = MagicMock()
+    mock_db.__getitem__.side_effect = collections.__getitem__
+
+    posts = await PostsRepo(mock_db).get_post_list(10)
+
+    # no join in the pipeline, one $in query for the distinct authors of the page
+    pipeline = collections['Posts'].aggregate.call_args[0][0]
+    assert not any('$lookup' in stage for stage in pipeline)
+    collections['Users_cache'].find.assert_called_once()
+    assert set(collections['Users_cache'].find.call_args[0][0]['_id']['$in']) == set(authors)
+    assert posts[0]['author'] == {'name': 'Ana', 'user_photo_url': None}
+    assert posts[1]['author'] == {'name': 'Usuário', 'user_photo_url': None}
+
+@pytest.mark.asyncio
+async def test_get_post_list_selected_fields(live_mongo):
+    author_id = (await live_mongo['Users_cache'].insert_one(
+        {'sql_user_id': 1, 'name': 'Ana', 'email': 'ana@example.com', 'user_photo_url': None}
+    )).inserted_id
+    await live_mongo['Posts'].insert_one({
+        'author_id': author_id, 'artist_id': 'a1', 'content': 'Test', 'images': [], 'likes': 2,
+        'liked_by': [ObjectId()], 'created_at': datetime.now(timezone.utc),
+    })
+    repo = PostsRepo(live_mongo)
+
+    [full] = await repo.get_post_list(10)
+    [partial] = await repo.get_post_list(10, fields=parse_fields('content,author'))
+
+    assert full['author_id'] == str(author_id)
+    assert full['author'] == {'name': 'Ana', 'user_photo_url': None}
+    assert 'liked_by' not in full
+    assert set(partial) == {'_id', 'content', 'author', 'created_at'}
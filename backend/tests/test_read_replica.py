@@ -0,0 +1,132 @@
+"""
+Testes do roteamento de sessões: rotas só de leitura na réplica, escritas no primário e
+read-your-writes. Primário e réplica são dois arquivos SQLite; a replicação é a função replicate()
+"""
+import sqlite3
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app import database, models_sql
+from app.database import base, create_db_engine, get_read_db, recent_writers
+from app.JWT_token import create_access_token
+from app.oauth2 import current_user_cache
+from main import app
+
+
+class Replication:
+    """Primário e réplica em arquivos SQLite; a réplica só muda quando replicate() é chamada"""
+
+    def __init__(self, directory):
+        self.primary_path = directory / "primary.db"
+        self.replica_path = directory / "replica.db"
+        self.engines = [create_db_engine(f"sqlite:///{self.primary_path}"), create_db_engine(f"sqlite:///{self.replica_path}")]
+        # no pool for aiosqlite: the connections belong to the event loop of the TestClient
+        self.async_engines = [
+            create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+            for path in (self.primary_path, self.replica_path)
+        ]
+        base.metadata.create_all(bind=self.engines[0])
+        self.replicate()
+
+    def primary(self):
+        return sessionmaker(bind=self.engines[0])()
+
+    def replicate(self):
+        source, target = sqlite3.connect(self.primary_path), sqlite3.connect(self.replica_path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+    def dispose(self):
+        for engine in self.engines:
+            engine.dispose()
+
+
+@pytest.fixture
+def replication(tmp_path, monkeypatch):
+    replication = Replication(tmp_path)
+    primary_engine, replica_engine = replication.engines
+    async_primary, async_replica = replication.async_engines
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=primary_engine, autoflush=False))
+    monkeypatch.setattr(database, "ReadSessionLocal", sessionmaker(bind=replica_engine, autoflush=False))
+    monkeypatch.setattr(database, "AsyncSessionLocal", async_sessionmaker(bind=async_primary, expire_on_commit=False))
+    monkeypatch.setattr(database, "AsyncReadSessionLocal", async_sessionmaker(bind=async_replica, expire_on_commit=False))
+    recent_writers.clear()
+    current_user_cache.clear()
+    with replication.primary() as db:
+        db.add_all([
+            models_sql.User(id=1, username="ana", nome="Ana", email="ana@socialjam.com", senha="x"),
+            models_sql.User(id=2, username="bruno", nome="Bruno", email="bruno@socialjam.com", senha="x"),
+        ])
+        db.commit()
+    replication.replicate()
+    yield replication
+    recent_writers.clear()
+    current_user_cache.clear()
+    replication.dispose()
+
+
+@pytest.fixture
+def api(replication):
+    with TestClient(app) as client:
+        yield client
+
+
+def auth(email):
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': email})}"}
+
+
+def test_read_only_routes_query_the_replica(replication, api):
+    with replication.primary() as db:
+        db.add(models_sql.User(username="carla", nome="Carla", email="carla@socialjam.com", senha="x"))
+        db.commit()
+
+    assert api.get("/user/carla").status_code == 404
+
+    replication.replicate()
+    assert api.get("/user/carla").status_code == 200
+
+
+def test_client_reads_its_own_writes_from_the_primary(replication, api):
+    response = api.put("/user/me/favorite-artist", json={"artist_name": "Djavan"}, headers=auth("ana@socialjam.com"))
+    assert response.status_code == 200
+
+    assert api.get("/user/ana", headers=auth("ana@socialjam.com")).json()["favorite_artist"] == "Djavan"
+    # the others still read the replica, which has not received the write
+    assert api.get("/user/ana").json()["favorite_artist"] is None
+
+    replication.replicate()
+    assert api.get("/user/ana").json()["favorite_artist"] == "Djavan"
+
+
+def test_async_read_routes_are_routed_too(replication, api):
+    assert api.post("/friends/request/2", headers=auth("ana@socialjam.com")).status_code == 201
+
+    assert len(api.get("/friends/requests/sent", headers=auth("ana@socialjam.com")).json()) == 1
+    assert api.get("/friends/requests", headers=auth("bruno@socialjam.com")).json() == []
+
+    replication.replicate()
+    assert len(api.get("/friends/requests", headers=auth("bruno@socialjam.com")).json()) == 1
+
+
+def test_stickiness_ends_after_the_window(replication, api, monkeypatch):
+    monkeypatch.setattr(recent_writers, "window", 0)
+
+    api.put("/user/me/favorite-artist", json={"artist_name": "Djavan"}, headers=auth("ana@socialjam.com"))
+
+    assert api.get("/user/ana", headers=auth("ana@socialjam.com")).json()["favorite_artist"] is None
+
+
+def test_read_session_does_not_write(replication):
+    dependency = get_read_db()
+    db = next(dependency)
+    db.add(models_sql.User(username="carla", nome="Carla", email="carla@socialjam.com", senha="x"))
+
+    with pytest.raises(InvalidRequestError):
+        db.commit()
+    dependency.close()
@@ -0,0 +1,45 @@
+"""
+Testes do pool de hash de senhas (bcrypt fora do event loop)
+"""
+import asyncio
+import threading
+import pytest
+from app.core.security import Hash, PasswordHashPool, HashPoolSaturatedError
+
+
+@pytest.mark.asyncio
+async def test_hash_async_and_verify_async():
+    hashed = await Hash.hash_async("senha123")
+
+    assert await Hash.verify_async("senha123", hashed)
+    assert not await Hash.verify_async("errada", hashed)
+
+
+@pytest.mark.asyncio
+async def test_hash_runs_outside_the_event_loop_thread():
+    pool = PasswordHashPool(workers=1, max_pending=4)
+
+    thread_name = await pool.run(lambda: threading.current_thread().name)
+
+    assert thread_name.startswith("password-hash")
+    assert pool.stats()["completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_rejects_above_max_pending():
+    pool = PasswordHashPool(workers=1, max_pending=2)
+    release = threading.Event()
+
+    # two slow hashes fill the pool, the third one is rejected right away
+    running = [asyncio.create_task(pool.run(release.wait)) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert pool.stats()["pending"] == 2
+    assert pool.stats()["queue_depth"] == 1
+
+    with pytest.raises(HashPoolSaturatedError):
+        await pool.run(release.wait)
+
+    release.set()
+    await asyncio.gather(*running)
+    assert pool.stats()["rejected"] == 1
+    assert pool.stats()["pending"] == 0
@@ -0,0 +1,182 @@
+"""
+Testes da agregação de álbuns dos artistas (/spotify/albums) contra o servidor local do Spotify
+"""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from app.models_sql import Artist, Album
+from app.repositories import spotify_albums_repository
+from app.repositories.spotify_albums_repository import get_all_albums_from_artists
+
+
+def add_artists(stub, db_session, count):
+    # every search returns the same Spotify artist, the albums are what matters here
+    stub.routes[("GET", "/v1/search")] = (200, {"artists": {"items": [{"id": "a1", "name": "Artist"}]}})
+    stub.routes[("GET", "/v1/artists/a1/albums")] = (200, {"items": [
+        {"id": "al1", "name": "Album 1", "release_date": "2020-05-01", "total_tracks": 10, "images": [{"url": "http://img/1"}]},
+        {"id": "al2", "name": "Album 2", "release_date": "2018", "total_tracks": 8, "images": []},
+    ]})
+    for i in range(count):
+        db_session.add(Artist(nome=f"Artist {i}", music_genre="Rock"))
+    db_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_get_all_albums_from_artists(spotify_stub, db_session):
+    add_artists(spotify_stub, db_session, 1)
+
+    albums = await get_all_albums_from_artists(db_session)
+
+    assert [album["album_name"] for album in albums] == ["Album 1", "Album 2"]
+    assert albums[0]["release_date"] == "2020-05-01"
+    assert albums[0]["image"] == "http://img/1"
+    assert albums[1]["release_date"] == "2018-01-01"
+    assert albums[1]["image"] is None
+
+
+@pytest.mark.asyncio
+async def test_albums_are_persisted_and_served_from_sql(spotify_stub, db_session):
+    add_artists(spotify_stub, db_session, 2)
+
+    first = await get_all_albums_from_artists(db_session)
+    spotify_calls = len(spotify_stub.requests)
+    spotify_albums_repository.albums_cache.clear()
+    second = await get_all_albums_from_artists(db_session)
+
+    assert db_session.query(Album).count() == 4
+    assert second == first
+    assert len(spotify_stub.requests) == spotify_calls
+
+
+@pytest.mark.asyncio
+async def test_refresh_replaces_stored_albums(spotify_stub, db_session):
+    add_artists(spotify_stub, db_session, 1)
+    await get_all_albums_from_artists(db_session)
+
+    spotify_stub.routes[("GET", "/v1/artists/a1/albums")] = (200, {"items": [{"id": "al3", "name": "New Album"}]})
+    albums = await get_all_albums_from_artists(db_session, refresh=True)
+
+    assert [album["album_name"] for album in albums] == ["New Album"]
+    assert db_session.query(Album).count() == 1
+
+
+@pytest.mark.asyncio
+async def test_artists_are_fetched_concurrently_up_to_the_limit(spotify_stub, db_session, monkeypatch):
+    monkeypatch.setattr(spotify_albums_repository, "SPOTIFY_ALBUMS_CONCURRENCY", 3)
+    monkeypatch.setattr(spotify_albums_repository, "_semaphores", {})
+    add_artists(spotify_stub, db_session, 6)
+    spotify_stub.delay = 0.05
+
+    albums = await get_all_albums_from_artists(db_session)
+
+    assert len(albums) == 12
+    assert spotify_stub.max_active == 3
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_the_lookups(spotify_stub, db_session):
+    add_artists(spotify_stub, db_session, 3)
+    spotify_stub.delay = 0.05
+
+    first, second = await asyncio.gather(
+        get_all_albums_from_artists(db_session),
+        get_all_albums_from_artists(db_session),
+    )
+
+    assert len(first) == len(second) == 6
+    assert spotify_stub.count("GET", "/v1/search") == 3
+
+
+@pytest.mark.asyncio
+async def test_partial_results_on_timeout(spotify_stub, db_session, monkeypatch):
+    monkeypatch.setattr(spotify_albums_repository, "SPOTIFY_ALBUMS_TIMEOUT", 0.05)
+    add_artists(spotify_stub, db_session, 2)
+    spotify_stub.delay = 0.2
+
+    albums = await get_all_albums_from_artists(db_session)
+    assert albums == []
+
+    # the late lookups finish in the background and fill the cache for the next request
+    await asyncio.sleep(1)
+    spotify_calls = len(spotify_stub.requests)
+    albums = await get_all_albums_from_artists(db_session)
+
+    assert len(albums) == 4
+    assert len(spotify_stub.requests) == spotify_calls
+
+
+@pytest.mark.asyncio
+async def test_spotify_id_found_by_search_is_stored(spotify_stub, db_session):
+    add_artists(spotify_stub, db_session, 1)
+
+    await get_all_albums_from_artists(db_session)
+    assert db_session.query(Artist).one().spotify_id == "a1"
+
+    # with the id stored the refresh goes straight to the albums
+    await get_all_albums_from_artists(db_session, refresh=True)
+    assert spotify_stub.count("GET", "/v1/search") == 1
+    assert spotify_stub.count("GET", "/v1/artists/a1/albums") == 2
+
+
+@pytest.mark.asyncio
+async def test_refresh_keeps_the_albums_created_by_hand(spotify_stub, db_session):
+    add_artists(spotify_stub, db_session, 1)
+    artist = db_session.query(Artist).one()
+    db_session.add(Album(artist_id=artist.id, artist_name=artist.nome, album_name="Ao Vivo"))
+    db_session.commit()
+
+    # the hand-made album does not count as fetched, the Spotify albums are still looked up
+    albums = await get_all_albums_from_artists(db_session)
+    assert [album["album_name"] for album in albums] == ["Ao Vivo", "Album 1", "Album 2"]
+
+    spotify_stub.routes[("GET", "/v1/artists/a1/albums")] = (200, {"items": [{"id": "al3", "name": "New Album"}]})
+    albums = await get_all_albums_from_artists(db_session, refresh=True)
+
+    assert [album["album_name"] for album in albums] == ["Ao Vivo", "New Album"]
+    assert db_session.query(Album).count() == 2
+
+
+@pytest.mark.asyncio
+async def test_artist_without_albums_is_not_fetched_again(spotify_stub, db_session):
+    add_artists(spotify_stub, db_session, 1)
+    spotify_stub.routes[("GET", "/v1/artists/a1/albums")] = (200, {"items": []})
+
+    assert await get_all_albums_from_artists(db_session) == []
+    spotify_calls = len(spotify_stub.requests)
+    spotify_albums_repository.albums_cache.clear()
+
+    assert await get_all_albums_from_artists(db_session) == []
+    assert len(spotify_stub.requests) == spotify_calls
+    assert db_session.query(Artist).one().albums_fetched_at is not None
+
+
+@pytest.mark.asyncio
+async def test_spotify_errors_are_not_stored_as_no_albums(spotify_stub, db_session):
+    add_artists(spotify_stub, db_session, 1)
+    spotify_stub.routes[("GET", "/v1/search")] = (429, {"error": {"status": 429, "message": "API rate limit exceeded"}})
+
+    assert await get_all_albums_from_artists(db_session) == []
+    assert db_session.query(Artist).one().albums_fetched_at is None
+
+    # nothing was cached, the next request asks Spotify again
+    spotify_stub.routes[("GET", "/v1/search")] = (200, {"artists": {"items": [{"id": "a1", "name": "Artist"}]}})
+    albums = await get_all_albums_from_artists(db_session)
+
+    assert [album["album_name"] for album in albums] == ["Album 1", "Album 2"]
+
+
+@pytest.mark.asyncio
+async def test_stored_albums_expire_after_the_ttl(spotify_stub, db_session):
+    add_artists(spotify_stub, db_session, 1)
+    await get_all_albums_from_artists(db_session)
+
+    artist = db_session.query(Artist).one()
+    artist.albums_fetched_at = datetime.now() - timedelta(seconds=spotify_albums_repository.SPOTIFY_ALBUMS_CACHE_TTL + 1)
+    db_session.commit()
+    spotify_albums_repository.albums_cache.clear()
+    spotify_stub.routes[("GET", "/v1/artists/a1/albums")] = (200, {"items": [{"id": "al3", "name": "New Album"}]})
+
+    albums = await get_all_albums_from_artists(db_session)
+
+    assert [album["album_name"] for album in albums] == ["New Album"]
+    assert db_session.query(Album).count() == 1
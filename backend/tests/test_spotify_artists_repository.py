@@ -0,0 +1,75 @@
+"""
+Testes da sincronização do top de artistas do Spotify com a tabela artist (upsert em lote),
+no SQLite e no PostgreSQL: o INSERT ... ON CONFLICT vem do dialeto
+"""
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from app.models_sql import Artist
+from app.repositories.spotify_artists_repository import sync_top_artists
+
+
+@pytest.fixture
+def db_session(sql_session):
+    return sql_session
+
+
+def payload(*artists):
+    return {"items": [{"name": name, "genres": genres} for name, genres in artists]}
+
+
+def payload_with_ids(*artists):
+    return {"items": [{"id": spotify_id, "name": name, "genres": []} for name, spotify_id in artists]}
+
+
+def test_sync_inserts_and_updates_artists(db_session):
+    db_session.add(Artist(nome="Existing", music_genre="Old"))
+    db_session.commit()
+
+    synced = sync_top_artists(payload(("New", ["pop"]), ("Existing", ["rock"]), ("No Genre", [])), db_session)
+
+    assert [artist.nome for artist in synced] == ["New", "Existing", "No Genre"]
+    genres = {artist.nome: artist.music_genre for artist in db_session.query(Artist).all()}
+    assert genres == {"Existing": "rock", "New": "pop", "No Genre": "Unknown"}
+
+
+def test_sync_runs_in_a_single_transaction(db_session):
+    commits = []
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    event.listen(db_session.get_bind(), "commit", on_commit)
+    try:
+        sync_top_artists(payload(*[(f"Artist {i}", ["pop"]) for i in range(50)]), db_session)
+        sync_top_artists(payload(*[(f"Artist {i}", ["rock"]) for i in range(50)]), db_session)
+    finally:
+        event.remove(db_session.get_bind(), "commit", on_commit)
+
+    assert len(commits) == 2
+    assert db_session.query(Artist).count() == 50
+
+
+def test_sync_ignores_repeated_and_empty_payloads(db_session):
+    assert sync_top_artists({}, db_session) == []
+
+    synced = sync_top_artists(payload(("Twice", ["pop"]), ("Twice", ["rock"])), db_session)
+
+    assert len(synced) == 1
+    assert synced[0].music_genre == "rock"
+
+
+def test_artist_name_is_unique(db_session):
+    db_session.add_all([Artist(nome="Same", music_genre="Rock"), Artist(nome="Same", music_genre="Pop")])
+
+    with pytest.raises(IntegrityError):
+        db_session.commit()
+    db_session.rollback()
+
+
+def test_sync_stores_spotify_ids_without_erasing_them(db_session):
+    sync_top_artists(payload_with_ids(("With Id", "sp1"), ("Later", None)), db_session)
+    sync_top_artists(payload_with_ids(("With Id", None), ("Later", "sp2")), db_session)
+
+    ids = {artist.nome: artist.spotify_id for artist in db_session.query(Artist).all()}
+    assert ids == {"With Id": "sp1", "Later": "sp2"}
@@ -0,0 +1,122 @@
+"""
+Testes dos serviços do Spotify contra um servidor local (fixture spotify_stub)
+"""
+import asyncio
+import pytest
+from app.services.spotify_auth_service import SpotifyAuthService, AppTokenCache, app_token_cache
+from app.services.spotify_service import spotify_service
+
+
+@pytest.mark.asyncio
+async def test_search_artists_uses_app_token(spotify_stub):
+    spotify_stub.routes[("GET", "/v1/search")] = (200, {"artists": {"items": [{"id": "a1", "name": "Artist 1"}]}})
+
+    artists = await SpotifyAuthService().search_artists("artist")
+
+    assert artists == [{"id": "a1", "name": "Artist 1"}]
+    search = [r for r in spotify_stub.requests if r["path"] == "/v1/search"][0]
+    assert search["headers"]["Authorization"] == "Bearer app-token"
+    assert "type=artist" in search["query"]
+
+
+@pytest.mark.asyncio
+async def test_get_artist_not_found_returns_none(spotify_stub):
+    assert await SpotifyAuthService().get_artist("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_validate_token(spotify_stub):
+    service = SpotifyAuthService()
+
+    assert await service.validate_token("user-token")
+
+    spotify_stub.routes[("GET", "/v1/me")] = (401, {"error": "invalid token"})
+    assert not await service.validate_token("user-token")
+
+
+@pytest.mark.asyncio
+async def test_calls_reuse_pooled_connections(spotify_stub):
+    spotify_stub.routes[("GET", "/v1/artists/a1")] = (200, {"id": "a1", "name": "Artist 1"})
+    service = SpotifyAuthService()
+
+    for _ in range(5):
+        await service.get_artist("a1")
+
+    # one token request + 5 artist requests over a single keep-alive connection
+    assert len(spotify_stub.requests) == 6
+    assert len(spotify_stub.connections) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_artist_info_renews_expired_token(spotify_stub):
+    spotify_stub.routes[("GET", "/v1/artists/a1")] = (401, {"error": "expired"})
+    app_token_cache.store("expired-token", 3600)
+
+    with pytest.raises(Exception):
+        await spotify_service.get_artist_info("a1")
+
+    # the second attempt used a fresh app token
+    artist_calls = [r for r in spotify_stub.requests if r["path"] == "/v1/artists/a1"]
+    assert [r["headers"]["Authorization"] for r in artist_calls] == ["Bearer expired-token", "Bearer app-token"]
+
+
+@pytest.mark.asyncio
+async def test_app_token_is_reused_until_expiry(spotify_stub):
+    spotify_stub.routes[("GET", "/v1/search")] = (200, {"artists": {"items": []}})
+    service = SpotifyAuthService()
+    hits, misses = app_token_cache.hits, app_token_cache.misses
+
+    for _ in range(3):
+        await service.search_artists("artist")
+
+    assert spotify_stub.count("POST", "/api/token") == 1
+    assert (app_token_cache.hits - hits, app_token_cache.misses - misses) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_fetch_a_single_token(spotify_stub):
+    spotify_stub.routes[("GET", "/v1/search")] = (200, {"artists": {"items": []}})
+    service = SpotifyAuthService()
+
+    await asyncio.gather(*[service.search_artists("artist") for _ in range(10)])
+
+    assert spotify_stub.count("POST", "/api/token") == 1
+    assert spotify_stub.count("GET", "/v1/search") == 10
+
+
+@pytest.mark.asyncio
+async def test_token_is_refreshed_before_it_expires():
+    cache = AppTokenCache(refresh_margin=60)
+    tokens = iter([("token-1", 30), ("token-2", 3600)])
+
+    async def fetch():
+        return next(tokens)
+
+    # token-1 expires within the refresh margin, so the next call already renews it
+    assert await cache.get(fetch) == "token-1"
+    assert await cache.get(fetch) == "token-2"
+    assert await cache.get(fetch) == "token-2"
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+@pytest.mark.asyncio
+async def test_rejected_app_token_is_renewed_once(spotify_stub):
+    spotify_stub.routes[("GET", "/v1/artists/a1")] = (401, {"error": "invalid token"})
+    app_token_cache.store("revoked-token", 3600)
+
+    with pytest.raises(Exception):
+        await SpotifyAuthService().get_artist("a1")
+
+    assert spotify_stub.count("POST", "/api/token") == 1
+    assert spotify_stub.count("GET", "/v1/artists/a1") == 2
+
+
+@pytest.mark.asyncio
+async def test_get_artist_albums_with_stored_id_skips_search(spotify_stub):
+    spotify_stub.routes[("GET", "/v1/artists/a1/albums")] = (200, {"items": [{"name": "Album 1"}]})
+
+    data = await SpotifyAuthService().get_artist_albums("Artist 1", spotify_id="a1")
+
+    assert data["artist_id"] == "a1"
+    assert [album["name"] for album in data["albums"]] == ["Album 1"]
+    assert spotify_stub.count("GET", "/v1/search") == 0
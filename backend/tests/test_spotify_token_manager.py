@@ -0,0 +1,159 @@
+"""
+Testes do gerenciador de tokens do Spotify dos usuários (expiração, renovação em 401 e em segundo plano)
+"""
+import asyncio
+import threading
+import pytest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy.orm import sessionmaker
+from app.models_sql import User
+from app.services.spotify_auth_service import SpotifyAuthService
+from app.services.spotify_token_manager import SpotifyTokenManager, SpotifyTokenError
+
+
+TOP_ARTISTS = {"items": [{"id": "a1", "name": "Artist 1"}]}
+
+
+def add_user(db_session, username, expires_in, access_token="user-token", refresh_token="refresh-token"):
+    user = User(
+        username=username,
+        email=f"{username}@example.com",
+        senha="x",
+        spotify_user_token=access_token,
+        spotify_refresh_token=refresh_token,
+        spotify_expires_at=datetime.now() + timedelta(seconds=expires_in),
+    )
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+@pytest.fixture
+def manager(db_session):
+    # the manager opens its own sessions, on the same test database as db_session
+    factory = sessionmaker(bind=db_session.get_bind())
+
+    @contextmanager
+    def session_factory():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+    return SpotifyTokenManager(session_factory=session_factory)
+
+
+def top_artists(access_token):
+    return SpotifyAuthService().get_top_artists(access_token, limit=50)
+
+
+@pytest.mark.asyncio
+async def test_fresh_token_is_used_without_validation(spotify_stub, db_session, manager):
+    spotify_stub.routes[("GET", "/v1/me/top/artists")] = (200, TOP_ARTISTS)
+    user = add_user(db_session, "fresh", expires_in=3600)
+
+    data = await manager.call(user.id, db_session, top_artists)
+
+    assert data == TOP_ARTISTS
+    # only the top artists request, no /me validation and no token refresh
+    assert [r["path"] for r in spotify_stub.requests] == ["/v1/me/top/artists"]
+
+
+@pytest.mark.asyncio
+async def test_expired_token_is_refreshed(spotify_stub, db_session, manager):
+    spotify_stub.routes[("GET", "/v1/me/top/artists")] = (200, TOP_ARTISTS)
+    user = add_user(db_session, "expired", expires_in=-10)
+
+    await manager.call(user.id, db_session, top_artists)
+
+    token_request = [r for r in spotify_stub.requests if r["path"] == "/api/token"][0]
+    assert "grant_type=refresh_token" in token_request["body"]
+    db_session.refresh(user)
+    assert user.spotify_user_token == "app-token"
+    assert user.spotify_refresh_token == "refresh-token"
+    assert user.spotify_expires_at > datetime.now()
+
+
+@pytest.mark.asyncio
+async def test_rejected_token_is_refreshed_and_retried(spotify_stub, db_session, manager):
+    def top_artists_route(request):
+        if request["headers"]["Authorization"] == "Bearer revoked-token":
+            return 401, {"error": "invalid token"}
+        return 200, TOP_ARTISTS
+    spotify_stub.routes[("GET", "/v1/me/top/artists")] = top_artists_route
+    user = add_user(db_session, "revoked", expires_in=3600, access_token="revoked-token")
+
+    data = await manager.call(user.id, db_session, top_artists)
+
+    assert data == TOP_ARTISTS
+    assert spotify_stub.count("POST", "/api/token") == 1
+    assert spotify_stub.count("GET", "/v1/me/top/artists") == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_of_a_user_are_coalesced(spotify_stub, db_session, manager):
+    spotify_stub.delay = 0.05
+    user = add_user(db_session, "burst", expires_in=-10)
+
+    tokens = await asyncio.gather(*[manager.get_access_token(user.id, db_session) for _ in range(5)])
+
+    assert tokens == ["app-token"] * 5
+    assert spotify_stub.count("POST", "/api/token") == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_tokens_raise(spotify_stub, db_session, manager):
+    user = add_user(db_session, "nospotify", expires_in=3600, access_token=None, refresh_token=None)
+
+    with pytest.raises(SpotifyTokenError):
+        await manager.get_access_token(user.id, db_session)
+
+
+@pytest.mark.asyncio
+async def test_background_refresh_only_touches_active_expiring_users(spotify_stub, db_session, manager):
+    expiring = add_user(db_session, "expiring", expires_in=60)
+    fresh = add_user(db_session, "fresh", expires_in=3600)
+    inactive = add_user(db_session, "inactive", expires_in=60)
+    for user in (expiring, fresh):
+        await manager.get_access_token(user.id, db_session)
+
+    refreshed = await manager.refresh_expiring()
+
+    assert refreshed == 1
+    db_session.refresh(expiring)
+    db_session.refresh(inactive)
+    assert expiring.spotify_user_token == "app-token"
+    assert inactive.spotify_user_token == "user-token"
+
+
+@pytest.mark.asyncio
+async def test_refresh_does_not_use_the_session_of_the_request(spotify_stub, db_session, manager):
+    spotify_stub.delay = 0.05
+    user_id = add_user(db_session, "closed", expires_in=-10).id
+
+    # the request that started the refresh ends before Spotify answers
+    first = asyncio.ensure_future(manager.get_access_token(user_id, db_session))
+    await asyncio.sleep(0.01)
+    db_session.close()
+
+    assert await first == "app-token"
+    assert db_session.get(User, user_id).spotify_user_token == "app-token"
+
+
+@pytest.mark.asyncio
+async def test_refresh_queries_run_off_the_event_loop(spotify_stub, db_session, manager):
+    user = add_user(db_session, "offloop", expires_in=-10)
+    threads = []
+    session_factory = manager.session_factory
+
+    def recording_factory():
+        threads.append(threading.current_thread())
+        return session_factory()
+    manager.session_factory = recording_factory
+
+    await manager.refresh(user.id)
+
+    # one session to read the refresh token, one to store the new tokens
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
@@ -0,0 +1,87 @@
+"""
+Planos de consulta (EXPLAIN QUERY PLAN do SQLite) das queries do repositório de amizades:
+nenhuma percorre uma tabela inteira
+"""
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app import models_sql
+from app.database import base, create_async_db_engine
+from app.repositories import friends
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    engine = create_async_db_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(base.metadata.create_all)
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as session:
+        session.add_all([
+            models_sql.User(id=1, username="ana", nome="Ana", email="ana@socialjam.com", senha="x"),
+            models_sql.User(id=2, username="bruno", nome="Bruno", email="bruno@socialjam.com", senha="x"),
+            models_sql.User(id=3, username="carla", nome="Carla", email="carla@socialjam.com", senha="x"),
+        ])
+        await session.commit()
+        request = await friends.send_friend_request(2, 1, session)
+        await friends.respond_to_friend_request(request.id, "Accepted", 1, session)
+        yield session
+    await engine.dispose()
+
+
+async def query_plans(db, call):
+    """Executa a chamada e devolve o plano de cada SELECT que ela fez"""
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    sync_engine = db.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", record)
+    try:
+        await call(db)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", record)
+
+    connection = await db.connection()
+    plans = []
+    for statement, parameters in statements:
+        rows = (await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)).all()
+        plans.append((statement, [row[-1] for row in rows]))
+    return plans
+
+
+# "SCAN friendship" reads the whole table, "SEARCH friendship USING INDEX ..." only the matching rows
+def full_scans(plan):
+    return [step for step in plan if step.startswith("SCAN")]
+
+
+REPOSITORY_QUERIES = {
+    "get_friends": lambda db: friends.get_friends(1, db),
+    "get_friend_ids": lambda db: friends.get_friend_ids(2, db),
+    "get_friend_requests": lambda db: friends.get_friend_requests(1, db),
+    "get_sent_friend_requests": lambda db: friends.get_sent_friend_requests(1, db),
+    "send_friend_request": lambda db: friends.send_friend_request(3, 1, db),
+    "get_user_notifications": lambda db: friends.get_user_notifications(1, db),
+    "get_friend_request_history": lambda db: friends.get_friend_request_history(1, db),
+    "remove_friend": lambda db: friends.remove_friend(1, 2, db),
+}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", REPOSITORY_QUERIES)
+async def test_repository_query_does_not_scan_the_table(db, name):
+    plans = await query_plans(db, REPOSITORY_QUERIES[name])
+
+    assert plans
+    for statement, plan in plans:
+        assert not full_scans(plan), f"{statement}\n{plan}"
+
+
+@pytest.mark.asyncio
+async def test_notifications_are_read_in_index_order(db):
+    [(statement, plan)] = await query_plans(db, REPOSITORY_QUERIES["get_user_notifications"])
+
+    # the index already has created_at after user_id, the rows come out sorted
+    assert not any("TEMP B-TREE" in step for step in plan), plan
@@ -0,0 +1,170 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from app.repositories import timeline_repository
+from app.repositories.timeline_repository import TimelineRepo
+
+POST_ID = '68c9c040619f5b84f887d6da'
+AUTHOR_ID = '68c70db5e711056c7db5e35c'
+
+class AsyncCursor:
+    # mimics a motor cursor: sort() returns itself and it can be consumed with "async for"
+    def __init__(self, items):
+        self.items = items
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def __aiter__(self):
+        self._iter = iter(self.items)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+@pytest.mark.asyncio
+async def test_fan_out_delivers_to_every_inbox():
+    mock_collection = AsyncMock()
+    # the author was not on fan-out on read
+    mock_collection.update_one.return_value = MagicMock(modified_count=0)
+
+    # create a mock object to make possibel to access using "db['Timelines']"
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+
+    repo = TimelineRepo(mock_db)
+
+    delivered = await repo.fan_out(POST_ID, AUTHOR_ID, datetime(2025, 9, 14), [1, 2, 3])
+
+    assert delivered is True
+    entries = mock_collection.insert_many.call_args[0][0]
+    assert [entry['user_id'] for entry in entries] == [1, 2, 3]
+    assert all(entry['post_id'] == ObjectId(POST_ID) for entry in entries)
+
+@pytest.mark.asyncio
+async def test_fan_out_above_limit_switches_to_fan_out_on_read(monkeypatch):
+    monkeypatch.setattr(timeline_repository, 'TIMELINE_FANOUT_LIMIT', 2)
+    mock_collection = AsyncMock()
+
+    # create a mock object to make possibel to access using "db['Users_cache']"
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+
+    repo = TimelineRepo(mock_db)
+
+    delivered = await repo.fan_out(POST_ID, AUTHOR_ID, datetime(2025, 9, 14), [1, 2, 3])
+
+    assert delivered is False
+    mock_collection.insert_many.assert_not_called()
+    mock_collection.update_one.assert_called_once_with(
+        {'_id': ObjectId(AUTHOR_ID)},
+        {'$set': {'timeline_fanout': 'read'}}
+    )
+
+def friendship_db(users, posts=()):
+    collections = {
+        'Users_cache': MagicMock(),
+        'Posts': MagicMock(),
+        'Timelines': AsyncMock(),
+    }
+    collections['Users_cache'].find.return_value = AsyncCursor(users)
+    collections['Posts'].find.return_value = AsyncCursor(list(posts))
+
+    # create a mock object to make possibel to access using "db['Users_cache']", "db['Posts']" and "db['Timelines']"
+    mock_db = MagicMock()
+    mock_db.__getitem__.side_effect = collections.__getitem__
+    return mock_db, collections
+
+@pytest.mark.asyncio
+async def test_fan_out_back_under_limit_delivers_the_pulled_posts():
+    pulled = ObjectId('68d4518661154a43266661b3')
+    mock_db, collections = friendship_db([], [{'_id': pulled, 'created_at': datetime(2025, 9, 13)}])
+    collections['Users_cache'] = AsyncMock()
+    collections['Users_cache'].update_one.return_value = MagicMock(modified_count=1)
+
+    delivered = await TimelineRepo(mock_db).fan_out(POST_ID, AUTHOR_ID, datetime(2025, 9, 14), [1, 2])
+
+    assert delivered is True
+    collections['Users_cache'].update_one.assert_called_once_with(
+        {'_id': ObjectId(AUTHOR_ID), 'timeline_fanout': 'read'},
+        {'$unset': {'timeline_fanout': ''}}
+    )
+    requests = collections['Timelines'].bulk_write.call_args[0][0]
+    assert [request._filter['user_id'] for request in requests] == [1, 2]
+    assert all(request._filter['post_id'] == pulled for request in requests)
+
+@pytest.mark.asyncio
+async def test_friendship_created_backfills_recent_posts():
+    post = ObjectId('68d4518661154a43266661b3')
+    mock_db, collections = friendship_db(
+        [
+            {'_id': ObjectId(AUTHOR_ID), 'sql_user_id': 1},
+            {'_id': ObjectId(), 'sql_user_id': 2, 'timeline_fanout': 'read'},
+        ],
+        [{'_id': post, 'created_at': datetime(2025, 9, 14)}],
+    )
+
+    await TimelineRepo(mock_db).on_friendship_created(1, 2)
+
+    # only user 1 is delivered, the posts of user 2 are pulled on read
+    collections['Posts'].find.assert_called_once()
+    assert collections['Posts'].find.call_args[0][0] == {'author_id': ObjectId(AUTHOR_ID)}
+    [request] = collections['Timelines'].bulk_write.call_args[0][0]
+    assert request._filter == {'user_id': 2, 'created_at': datetime(2025, 9, 14), 'post_id': post}
+    assert request._doc == {'$setOnInsert': {'author_id': ObjectId(AUTHOR_ID)}}
+
+@pytest.mark.asyncio
+async def test_friendship_removed_clears_both_inboxes():
+    friend_id = ObjectId()
+    mock_db, collections = friendship_db([
+        {'_id': ObjectId(AUTHOR_ID), 'sql_user_id': 1},
+        {'_id': friend_id, 'sql_user_id': 2},
+    ])
+    collections['Timelines'].delete_many.return_value = MagicMock(deleted_count=3)
+
+    assert await TimelineRepo(mock_db).on_friendship_removed(1, 2) == 3
+    collections['Timelines'].delete_many.assert_called_once_with({'$or': [
+        {'user_id': 1, 'author_id': friend_id},
+        {'user_id': 2, 'author_id': ObjectId(AUTHOR_ID)},
+    ]})
+
+@pytest.mark.asyncio
+async def test_get_timeline_merges_inbox_and_pulled_posts():
+    older = ObjectId('68c70db5e711056c7db5e35d')
+    newer = ObjectId('68c9c040619f5b84f887d6db')
+    pulled = ObjectId('68d4518661154a43266661b3')
+    collections = {
+        'Timelines': MagicMock(),
+        'Posts': MagicMock(),
+    }
+    collections['Timelines'].find.return_value = AsyncCursor([
+        {'post_id': newer, 'created_at': datetime(2025, 9, 14, 12)},
+        {'post_id': older, 'created_at': datetime(2025, 9, 14, 10)},
+    ])
+    collections['Posts'].find.return_value = AsyncCursor([
+        {'_id': pulled, 'created_at': datetime(2025, 9, 14, 11)},
+    ])
+
+    # create a mock object to make possibel to access using "db['Timelines']" and "db['Posts']"
+    mock_db = MagicMock()
+    mock_db.__getitem__.side_effect = collections.__getitem__
+
+    repo = TimelineRepo(mock_db)
+
+    post_ids = await repo.get_timeline_post_ids(1, 2, pull_author_ids=[ObjectId(AUTHOR_ID)])
+
+    assert post_ids == [str(newer), str(pulled)]
+
+@pytest.mark.asyncio
+async def test_on_post_deleted_wrong_id():
+    mock_db = MagicMock()
+
+    repo = TimelineRepo(mock_db)
+
+    with pytest.raises(InvalidId):
+        await repo.on_post_deleted('123')
@@ -0,0 +1,158 @@
+"""
+Testes do upload de imagens em blocos: limites de tamanho, validação por magic bytes e métricas
+"""
+import hashlib
+import io
+import os
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from starlette.datastructures import UploadFile
+from app.core import uploads
+from app.core.uploads import (
+    UploadSizeLimitMiddleware, UploadTooLargeError, UnsupportedImageError,
+    save_upload, save_uploads, sniff_image_type, upload_metrics,
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 100
+
+
+def upload(content: bytes, filename: str = "foto.png") -> UploadFile:
+    return UploadFile(io.BytesIO(content), filename=filename)
+
+
+def stored_files(directory) -> list:
+    # the shard directories stay, they are shared by other images
+    return [name for _, _, names in os.walk(directory) for name in names]
+
+
+@pytest.fixture
+def small_limits(monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 16)
+    monkeypatch.setattr(uploads, "UPLOAD_MAX_FILE_BYTES", 200)
+    monkeypatch.setattr(uploads, "UPLOAD_MAX_REQUEST_BYTES", 300)
+
+
+def test_sniff_image_type():
+    assert sniff_image_type(PNG) == ".png"
+    assert sniff_image_type(JPEG) == ".jpg"
+    assert sniff_image_type(b"GIF89a....") == ".gif"
+    assert sniff_image_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == ".webp"
+    assert sniff_image_type(b"<?php echo 1; ?>") is None
+
+
+@pytest.mark.asyncio
+async def test_save_upload_streams_to_disk(tmp_path, small_limits):
+    files = upload_metrics.files
+
+    # the extension comes from the content, not from the client
+    path = await save_upload(upload(JPEG, "../../evil.png"), str(tmp_path))
+
+    digest = hashlib.sha256(JPEG).hexdigest()
+    assert path == os.path.join(str(tmp_path), digest[:2], digest[2:4], f"{digest}.jpg")
+    with open(path, "rb") as f:
+        assert f.read() == JPEG
+    assert upload_metrics.files == files + 1
+    assert upload_metrics.stats()["throughput_mb_s"] is not None
+
+
+@pytest.mark.asyncio
+async def test_file_over_the_limit_is_aborted(tmp_path, small_limits):
+    with pytest.raises(UploadTooLargeError):
+        await save_upload(upload(PNG * 3), str(tmp_path))
+
+    # nothing is left behind, not even the partial copy
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_content_that_is_not_an_image_is_rejected(tmp_path):
+    with pytest.raises(UnsupportedImageError):
+        await save_upload(upload(b"MZ\x90\x00 not an image", "foto.jpg"), str(tmp_path))
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_request_limit_removes_the_images_already_saved(tmp_path, small_limits):
+    with pytest.raises(UploadTooLargeError):
+        await save_uploads([upload(PNG), upload(PNG), upload(PNG)], str(tmp_path))
+
+    assert stored_files(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_identical_images_are_stored_once(tmp_path):
+    deduplicated = upload_metrics.deduplicated
+
+    paths = await save_uploads([upload(PNG), upload(JPEG), upload(PNG, "copia.png")], str(tmp_path))
+
+    assert paths[0] == paths[2] != paths[1]
+    assert upload_metrics.deduplicated == deduplicated + 1
+    # the temporary copy of the duplicate is gone
+    assert len(stored_files(tmp_path)) == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_request_keeps_images_that_were_already_stored(tmp_path, small_limits):
+    existing = await save_upload(upload(JPEG), str(tmp_path))
+
+    with pytest.raises(UploadTooLargeError):
+        await save_uploads([upload(JPEG), upload(PNG * 3)], str(tmp_path))
+
+    # another post still uses it
+    assert os.path.exists(existing)
+
+
+@pytest.mark.asyncio
+async def test_middleware_rejects_by_content_length():
+    sent = []
+    called = []
+
+    async def app(scope, receive, send):
+        called.append(scope)
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = UploadSizeLimitMiddleware(app, max_bytes=1000)
+    scope = {"type": "http", "headers": [
+        (b"content-type", b"multipart/form-data; boundary=x"),
+        (b"content-length", str(10 * 1024 * 1024).encode()),
+    ]}
+    await middleware(scope, None, send)
+
+    assert sent[0]["status"] == 413
+    assert called == []
+
+    # requests within the limit go through untouched
+    scope["headers"][1] = (b"content-length", b"500")
+    await middleware(scope, None, send)
+    assert called == [scope]
+
+
+def test_upload_profile_picture(client: TestClient, sample_user_data):
+    client.post("/user/", json=sample_user_data)
+    login_data = {"username": sample_user_data["username"], "password": sample_user_data["senha"]}
+    token = client.post("/auth/login", data=login_data).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    digest = hashlib.sha256(PNG).hexdigest()
+    path = os.path.join(uploads.IMAGE_STORE_DIR, digest[:2], digest[2:4], f"{digest}.png")
+    existed = os.path.exists(path)
+
+    try:
+        response = client.post("/user/upload-photo", files={"file": ("foto.png", PNG, "image/png")}, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["filename"] == f"{digest}.png"
+        assert client.get("/user/me", headers=headers).json()["user_photo_url"] == f"backend/{path}"
+
+        # served with an immutable cache, the name changes with the content
+        response = client.get(f"/backend/{path}")
+        assert response.content == PNG
+        assert "immutable" in response.headers["cache-control"]
+
+        response = client.post("/user/upload-photo", files={"file": ("foto.png", b"not an image", "image/png")}, headers=headers)
+        assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    finally:
+        if not existed and os.path.exists(path):
+            os.remove(path)
@@ -63,28 +63,10 @@ const Home = () => {
         setPosts(prevPosts => 
           prevPosts.map(post => {
             if (post._id === postId || post.id === postId) {
-              const userIdStr = user.mongo_id || user.id?.toString();
-              const isLiked = result.liked;
-              
-              let newLikedBy = [...(post.liked_by || [])];
-              let newLikes = post.likes || 0;
-              
-              if (isLiked) {
-                // Adicionar like
-                if (!newLikedBy.includes(userIdStr)) {
-                  newLikedBy.push(userIdStr);
-                  newLikes += 1;
-                }
-              } else {
-                // Remover like
-                newLikedBy = newLikedBy.filter(id => id !== userIdStr);
-                newLikes = Math.max(0, newLikes - 1);
-              }
-              
               return {
                 ...post,
-                liked_by: newLikedBy,
-                likes: newLikes
+                liked_by_me: result.liked,
+                likes: result.likes
               };
             }
             return post;
@@ -100,9 +82,7 @@ const Home = () => {
   };
 
   const isPostLikedByUser = (post) => {
-    if (!user || !post.liked_by) return false;
-    const userIdStr = user.mongo_id || user.id?.toString();
-    return post.liked_by.includes(userIdStr);
+    return Boolean(user && post.liked_by_me);
   };
 
   if (loading) {
@@ -201,7 +181,7 @@ const Home = () => {
                       <img
                         src={
                           post.author?.user_photo_url
-                            ? `http://localhost:8000/${post.author.user_photo_url}`
+                            ? `http://localhost:8000/${post.author.user_photo_variants?.["160"] ?? post.author.user_photo_url}`
                             : "/assets/icons/profile-placeholder.svg"
                         }
                         alt={post.author?.name || "User"}
@@ -238,7 +218,7 @@ const Home = () => {
                       {post.images.map((image, index) => (
                         <img
                           key={index}
-                          src={`http://localhost:8000/${image}`}
+                          src={`http://localhost:8000/${post.image_variants?.[index]?.["640"] ?? image}`}
                           alt={`Post image ${index + 1}`}
                           className="w-full h-auto rounded-xl object-cover max-h-96"
                         />
@@ -451,15 +451,17 @@ export const createPost = async (artistId, content, images) => {
 
 /**
  * Busca posts de um artista específico
+ * Passe o nextCursor retornado para buscar a página seguinte
  */
-export const getPostsByArtist = async (artistId, pagination = 20) => {
+export const getPostsByArtist = async (artistId, pagination = 20, cursor = null) => {
   try {
     const response = await api.get(`/posts/artist/${artistId}`, {
-      params: { pagination },
+      params: cursor ? { pagination, cursor } : { pagination },
     });
     return {
       success: true,
       posts: response.data,
+      nextCursor: response.headers["x-next-cursor"] || null,
     };
   } catch (error) {
     console.error("Erro ao buscar posts do artista:", error);
@@ -499,6 +501,7 @@ export const toggleLikePost = async (postId) => {
     return {
       success: true,
       liked: response.data.liked,
+      likes: response.data.likes,
       message: response.data.message,
     };
   } catch (error) {